@@ -0,0 +1,46 @@
+"""add product search indexes
+
+Revision ID: 7c2f4a9e1b35
+Revises: 0266b6774cf4
+Create Date: 2026-10-19 10:12:41.503218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2f4a9e1b35'
+down_revision: Union[str, Sequence[str], None] = '0266b6774cf4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must stay identical to PG_SEARCH_DOCUMENT in src/products/ddl.py
+SEARCH_DOCUMENT = (
+    "(setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B'))"
+)
+
+INDEXES = {
+    "ix_product_search_document": f"ON product USING GIN ({SEARCH_DOCUMENT})",
+    "ix_product_name_trgm": "ON product USING GIN (name gin_trgm_ops)",
+    "ix_product_sku_trgm": "ON product USING GIN ((sku::text) gin_trgm_ops)",
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+    # CONCURRENTLY cannot run inside a transaction; builds without blocking writes
+    with op.get_context().autocommit_block():
+        for name, definition in INDEXES.items():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} {definition};")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name};")
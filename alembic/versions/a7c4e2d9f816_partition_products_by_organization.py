@@ -0,0 +1,237 @@
+"""partition products by organization
+
+Revision ID: a7c4e2d9f816
+Revises: f3a9d1e5b702
+Create Date: 2026-10-19 16:48:22.905316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c4e2d9f816'
+down_revision: Union[str, Sequence[str], None] = 'f3a9d1e5b702'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The existing table becomes the default organization's partition under a new
+# LIST-partitioned parent. Every index the parent needs is first built
+# CONCURRENTLY on the existing table, so ATTACH adopts them instead of building,
+# and a validated CHECK lets ATTACH skip its scan: the swap itself only takes
+# a short ACCESS EXCLUSIVE lock, however large the table is.
+
+# partition_name('default') in src/tenancy.py
+DEFAULT_PARTITION = "product_p_default_7505d64a"
+
+# Must stay identical to Product.__table_args__ (src/products/model.py)
+TENANT_INDEXES = {
+    "ux_product_sku": "UNIQUE INDEX {name} ON {table} (organization, sku)",
+    "ix_product_status_id": "INDEX {name} ON {table} (organization, status, id)",
+    "ix_product_status_sku": "INDEX {name} ON {table} (organization, status, sku)",
+    "ix_product_status_name": "INDEX {name} ON {table} (organization, status, name, id)",
+    "ix_product_name": "INDEX {name} ON {table} (organization, name, id)",
+    "ix_product_change_seq": "INDEX {name} ON {table} (organization, change_seq)",
+}
+# the same indexes before this revision, restored on downgrade
+PREVIOUS_INDEXES = {
+    "ux_product_sku": "UNIQUE INDEX {name} ON {table} (sku)",
+    "ix_product_status_id": "INDEX {name} ON {table} (status, id)",
+    "ix_product_status_sku": "INDEX {name} ON {table} (status, sku)",
+    "ix_product_status_name": "INDEX {name} ON {table} (status, name, id)",
+    "ix_product_name": "INDEX {name} ON {table} (name, id)",
+    "ix_product_change_seq": "INDEX {name} ON {table} (change_seq)",
+}
+
+# Must stay identical to PG_SEARCH_INDEXES in src/products/ddl.py (unchanged here)
+SEARCH_DOCUMENT = (
+    "(setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B'))"
+)
+SEARCH_INDEXES = {
+    "ix_product_search_document": f"ON product USING GIN ({SEARCH_DOCUMENT})",
+    "ix_product_name_trgm": "ON product USING GIN (name gin_trgm_ops)",
+    "ix_product_sku_trgm": "ON product USING GIN ((sku::text) gin_trgm_ops)",
+}
+
+TRIGGERS = {
+    "product_status_count_ai": "AFTER INSERT ON product REFERENCING NEW TABLE AS new_rows "
+                               "FOR EACH STATEMENT EXECUTE FUNCTION product_status_count_insert()",
+    "product_status_count_ad": "AFTER DELETE ON product REFERENCING OLD TABLE AS old_rows "
+                               "FOR EACH STATEMENT EXECUTE FUNCTION product_status_count_delete()",
+    "product_status_count_au": "AFTER UPDATE ON product REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows "
+                               "FOR EACH STATEMENT EXECUTE FUNCTION product_status_count_update()",
+    "product_change_stamp": "BEFORE INSERT OR UPDATE ON product FOR EACH ROW EXECUTE FUNCTION product_change_stamp()",
+    "product_change_tombstone": "AFTER DELETE ON product FOR EACH ROW EXECUTE FUNCTION product_change_tombstone()",
+}
+
+# Must stay identical to PG_STATUS_COUNT_DDL and product_change_tombstone in
+# PG_CHANGE_FEED_DDL (src/products/ddl.py)
+FUNCTIONS = [
+    """CREATE OR REPLACE FUNCTION product_status_count_insert() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO product_status_delta (organization, status, delta)
+        SELECT organization, status, count(*) FROM new_rows GROUP BY organization, status;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION product_status_count_delete() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO product_status_delta (organization, status, delta)
+        SELECT organization, status, -count(*) FROM old_rows GROUP BY organization, status;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION product_status_count_update() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO product_status_delta (organization, status, delta)
+        SELECT organization, status, sum(delta) FROM (
+            SELECT organization, status, count(*) AS delta FROM new_rows GROUP BY organization, status
+            UNION ALL
+            SELECT organization, status, -count(*) AS delta FROM old_rows GROUP BY organization, status
+        ) AS changes
+        GROUP BY organization, status HAVING sum(delta) <> 0;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION product_change_tombstone() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO product_tombstone (change_seq, organization, product_id, sku, deleted_at)
+        VALUES (nextval('product_change_seq'), OLD.organization, OLD.id, OLD.sku, clock_timestamp());
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+]
+
+# the functions as of f3a9d1e5b702, restored on downgrade
+PREVIOUS_FUNCTIONS = [
+    """CREATE OR REPLACE FUNCTION product_status_count_insert() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO product_status_delta (status, delta)
+        SELECT status, count(*) FROM new_rows GROUP BY status;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION product_status_count_delete() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO product_status_delta (status, delta)
+        SELECT status, -count(*) FROM old_rows GROUP BY status;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION product_status_count_update() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO product_status_delta (status, delta)
+        SELECT status, sum(delta) FROM (
+            SELECT status, count(*) AS delta FROM new_rows GROUP BY status
+            UNION ALL
+            SELECT status, -count(*) AS delta FROM old_rows GROUP BY status
+        ) AS changes
+        GROUP BY status HAVING sum(delta) <> 0;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION product_change_tombstone() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO product_tombstone (change_seq, product_id, sku, deleted_at)
+        VALUES (nextval('product_change_seq'), OLD.id, OLD.sku, clock_timestamp());
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+]
+
+
+def _staged(name: str) -> str:
+    # name of an index built on the old table ahead of the swap
+    return f"{DEFAULT_PARTITION}_{name}"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # constant defaults: catalog-only changes, existing rows read as 'default'
+    op.add_column('product', sa.Column('organization', sa.String(), server_default='default', nullable=False))
+    op.add_column('product_status_delta', sa.Column('organization', sa.String(), server_default='default', nullable=False))
+    op.add_column('product_tombstone', sa.Column('organization', sa.String(), server_default='default', nullable=False))
+    op.alter_column('product_status_delta', 'organization', server_default=None)
+    op.alter_column('product_tombstone', 'organization', server_default=None)
+    op.execute(
+        "ALTER TABLE product ADD CONSTRAINT product_organization_default "
+        "CHECK (organization = 'default') NOT VALID"
+    )
+
+    with op.get_context().autocommit_block():
+        # VALIDATE only takes SHARE UPDATE EXCLUSIVE: writes keep flowing
+        op.execute("ALTER TABLE product VALIDATE CONSTRAINT product_organization_default;")
+        op.execute(f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {_staged('pkey')} ON product (organization, id);")
+        for name, definition in TENANT_INDEXES.items():
+            statement = definition.format(name=f"IF NOT EXISTS {_staged(name)}", table="product")
+            op.execute(f"CREATE {statement.replace('INDEX', 'INDEX CONCURRENTLY', 1)};")
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_product_tombstone_organization ON product_tombstone (organization);")
+
+    # the swap: one short transaction, no scans and no index builds
+    op.execute("LOCK TABLE product IN ACCESS EXCLUSIVE MODE")
+    for trigger in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger} ON product")
+    op.execute(
+        f"ALTER TABLE product DROP CONSTRAINT product_pkey, "
+        f"ADD CONSTRAINT {_staged('pkey')} PRIMARY KEY USING INDEX {_staged('pkey')}"
+    )
+    for name in TENANT_INDEXES:
+        op.execute(f"DROP INDEX {name}")
+    for name in SEARCH_INDEXES:
+        op.execute(f"ALTER INDEX {name} RENAME TO {_staged(name)}")
+    op.execute(f"ALTER TABLE product RENAME TO {DEFAULT_PARTITION}")
+
+    op.execute(f"CREATE TABLE product (LIKE {DEFAULT_PARTITION} INCLUDING DEFAULTS, "
+               f"PRIMARY KEY (organization, id)) PARTITION BY LIST (organization)")
+    op.execute("ALTER SEQUENCE product_id_seq OWNED BY product.id")
+    # indexes on an empty parent are instant; ATTACH adopts the staged ones
+    for name, definition in TENANT_INDEXES.items():
+        op.execute(f"CREATE {definition.format(name=name, table='product')}")
+    for name, definition in SEARCH_INDEXES.items():
+        op.execute(f"CREATE INDEX {name} {definition}")
+    op.execute(f"ALTER TABLE product ATTACH PARTITION {DEFAULT_PARTITION} FOR VALUES IN ('default')")
+    op.execute(f"ALTER TABLE {DEFAULT_PARTITION} DROP CONSTRAINT product_organization_default")
+
+    for statement in FUNCTIONS:
+        op.execute(statement)
+    for trigger, definition in TRIGGERS.items():
+        op.execute(f"CREATE TRIGGER {trigger} {definition}")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    connection = op.get_bind()
+    others = connection.execute(sa.text(
+        "SELECT count(*) FROM pg_inherits WHERE inhparent = 'product'::regclass "
+        "AND inhrelid <> to_regclass(:partition)"
+    ), {"partition": DEFAULT_PARTITION}).scalar()
+    if others:
+        raise RuntimeError(f"{others} tenant partitions besides '{DEFAULT_PARTITION}' exist; drop them first")
+
+    with op.get_context().autocommit_block():
+        op.execute(f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {_staged('id')} ON {DEFAULT_PARTITION} (id);")
+        for name, definition in PREVIOUS_INDEXES.items():
+            statement = definition.format(name=f"IF NOT EXISTS {_staged('previous_' + name)}", table=DEFAULT_PARTITION)
+            op.execute(f"CREATE {statement.replace('INDEX', 'INDEX CONCURRENTLY', 1)};")
+
+    op.execute("LOCK TABLE product IN ACCESS EXCLUSIVE MODE")
+    for trigger in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger} ON product")
+    op.execute(f"ALTER TABLE product DETACH PARTITION {DEFAULT_PARTITION}")
+    op.execute(f"ALTER SEQUENCE product_id_seq OWNED BY {DEFAULT_PARTITION}.id")
+    op.execute("DROP TABLE product")  # the parent, now without partitions
+    op.execute(
+        f"ALTER TABLE {DEFAULT_PARTITION} DROP CONSTRAINT {_staged('pkey')}, "
+        f"ADD CONSTRAINT product_pkey PRIMARY KEY USING INDEX {_staged('id')}"
+    )
+    for name in PREVIOUS_INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {_staged(name)}")
+        op.execute(f"ALTER INDEX {_staged('previous_' + name)} RENAME TO {name}")
+    for name in SEARCH_INDEXES:
+        op.execute(f"ALTER INDEX {_staged(name)} RENAME TO {name}")
+    op.execute(f"ALTER TABLE {DEFAULT_PARTITION} RENAME TO product")
+    op.execute("ALTER TABLE product DROP COLUMN organization")
+
+    for statement in PREVIOUS_FUNCTIONS:
+        op.execute(statement)
+    for trigger, definition in TRIGGERS.items():
+        op.execute(f"CREATE TRIGGER {trigger} {definition}")
+    op.drop_index('ix_product_tombstone_organization', table_name='product_tombstone')
+    op.drop_column('product_tombstone', 'organization')
+    # deltas of one status from several tenants simply add up
+    op.drop_column('product_status_delta', 'organization')
@@ -0,0 +1,126 @@
+"""add product content hash and soft delete
+
+Revision ID: b2d8f4a6c931
+Revises: a7c4e2d9f816
+Create Date: 2026-10-19 18:10:37.442961
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2d8f4a6c931'
+down_revision: Union[str, Sequence[str], None] = 'a7c4e2d9f816'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must stay identical to PG_STATUS_COUNT_DDL and product_change_stamp in
+# PG_CHANGE_FEED_DDL (src/products/ddl.py)
+FUNCTIONS = [
+    """CREATE OR REPLACE FUNCTION product_status_count_insert() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO product_status_delta (organization, status, delta)
+        SELECT organization, status, count(*) FROM new_rows WHERE deleted_at IS NULL GROUP BY organization, status;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION product_status_count_delete() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO product_status_delta (organization, status, delta)
+        SELECT organization, status, -count(*) FROM old_rows WHERE deleted_at IS NULL GROUP BY organization, status;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION product_status_count_update() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO product_status_delta (organization, status, delta)
+        SELECT organization, status, sum(delta) FROM (
+            SELECT organization, status, count(*) AS delta FROM new_rows WHERE deleted_at IS NULL GROUP BY organization, status
+            UNION ALL
+            SELECT organization, status, -count(*) AS delta FROM old_rows WHERE deleted_at IS NULL GROUP BY organization, status
+        ) AS changes
+        GROUP BY organization, status HAVING sum(delta) <> 0;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION product_change_stamp() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND OLD.change_seq IS NOT NULL AND ROW(NEW.name, NEW.sku, NEW.description, NEW.status, NEW.deleted_at)
+                IS NOT DISTINCT FROM ROW(OLD.name, OLD.sku, OLD.description, OLD.status, OLD.deleted_at) THEN
+            NEW.change_seq := OLD.change_seq;
+            NEW.updated_at := OLD.updated_at;
+            NEW.version := OLD.version;
+            RETURN NEW;
+        END IF;
+        IF TG_OP = 'UPDATE' THEN
+            NEW.version := OLD.version + 1;
+        END IF;
+        NEW.change_seq := nextval('product_change_seq');
+        NEW.updated_at := clock_timestamp();
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql""",
+]
+
+# the functions as of a7c4e2d9f816, restored on downgrade
+PREVIOUS_FUNCTIONS = [
+    """CREATE OR REPLACE FUNCTION product_status_count_insert() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO product_status_delta (organization, status, delta)
+        SELECT organization, status, count(*) FROM new_rows GROUP BY organization, status;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION product_status_count_delete() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO product_status_delta (organization, status, delta)
+        SELECT organization, status, -count(*) FROM old_rows GROUP BY organization, status;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION product_status_count_update() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO product_status_delta (organization, status, delta)
+        SELECT organization, status, sum(delta) FROM (
+            SELECT organization, status, count(*) AS delta FROM new_rows GROUP BY organization, status
+            UNION ALL
+            SELECT organization, status, -count(*) AS delta FROM old_rows GROUP BY organization, status
+        ) AS changes
+        GROUP BY organization, status HAVING sum(delta) <> 0;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION product_change_stamp() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND OLD.change_seq IS NOT NULL AND ROW(NEW.name, NEW.sku, NEW.description, NEW.status)
+                IS NOT DISTINCT FROM ROW(OLD.name, OLD.sku, OLD.description, OLD.status) THEN
+            NEW.change_seq := OLD.change_seq;
+            NEW.updated_at := OLD.updated_at;
+            NEW.version := OLD.version;
+            RETURN NEW;
+        END IF;
+        IF TG_OP = 'UPDATE' THEN
+            NEW.version := OLD.version + 1;
+        END IF;
+        NEW.change_seq := nextval('product_change_seq');
+        NEW.updated_at := clock_timestamp();
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql""",
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # nullable columns without defaults: catalog-only on every partition. Rows
+    # without a hash count as changed, so the next ingest of each row stores one.
+    op.add_column('product', sa.Column('content_hash', sa.String(), nullable=True))
+    op.add_column('product', sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True))
+    for statement in FUNCTIONS:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # soft-deleted products would reappear without the column: delete them for
+    # real while the triggers still know they are not counted
+    op.execute("DELETE FROM product WHERE deleted_at IS NOT NULL")
+    for statement in PREVIOUS_FUNCTIONS:
+        op.execute(statement)
+    op.drop_column('product', 'deleted_at')
+    op.drop_column('product', 'content_hash')
@@ -0,0 +1,48 @@
+"""add unique product sku index
+
+Revision ID: b93d1e6a4c20
+Revises: 7c2f4a9e1b35
+Create Date: 2026-10-19 11:02:17.884512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b93d1e6a4c20'
+down_revision: Union[str, Sequence[str], None] = '7c2f4a9e1b35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    conn = op.get_bind()
+    duplicates = conn.execute(sa.text(
+        "SELECT count(*) FROM (SELECT sku FROM product GROUP BY sku HAVING count(*) > 1) AS d"
+    )).scalar()
+    if duplicates:
+        raise RuntimeError(
+            f"{duplicates} SKUs still have duplicate rows. Run the dedupe_product_skus "
+            "Celery task first, then re-run this migration."
+        )
+
+    with op.get_context().autocommit_block():
+        # a failed CONCURRENTLY build leaves an INVALID index behind; clear it first
+        invalid = conn.execute(sa.text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = 'ux_product_sku' AND NOT i.indisvalid"
+        )).scalar()
+        if invalid:
+            op.execute("DROP INDEX CONCURRENTLY IF EXISTS ux_product_sku;")
+        # sku is CITEXT, so uniqueness is case-insensitive
+        op.execute("CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ux_product_sku ON product (sku);")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ux_product_sku;")
@@ -0,0 +1,33 @@
+"""add product change horizon
+
+Revision ID: c6e9a2f4d187
+Revises: b2d8f4a6c931
+Create Date: 2026-10-19 21:42:18.905316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6e9a2f4d187'
+down_revision: Union[str, Sequence[str], None] = 'b2d8f4a6c931'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'product_change_horizon',
+        sa.Column('organization', sa.String(), nullable=False),
+        sa.Column('purged_seq', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('organization'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('product_change_horizon')
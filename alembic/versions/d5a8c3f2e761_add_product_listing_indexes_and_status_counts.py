@@ -0,0 +1,93 @@
+"""add product listing indexes and status counts
+
+Revision ID: d5a8c3f2e761
+Revises: b93d1e6a4c20
+Create Date: 2026-10-19 12:20:05.117903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a8c3f2e761'
+down_revision: Union[str, Sequence[str], None] = 'b93d1e6a4c20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    "ix_product_status_id": "ON product (status, id)",
+    "ix_product_status_sku": "ON product (status, sku)",
+    "ix_product_status_name": "ON product (status, name, id)",
+    "ix_product_name": "ON product (name, id)",
+}
+
+# Must stay identical to PG_STATUS_COUNT_DDL in src/products/ddl.py
+STATUS_COUNT_DDL = [
+    """CREATE OR REPLACE FUNCTION product_status_count_insert() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO product_status_delta (status, delta)
+        SELECT status, count(*) FROM new_rows GROUP BY status;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION product_status_count_delete() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO product_status_delta (status, delta)
+        SELECT status, -count(*) FROM old_rows GROUP BY status;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION product_status_count_update() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO product_status_delta (status, delta)
+        SELECT status, sum(delta) FROM (
+            SELECT status, count(*) AS delta FROM new_rows GROUP BY status
+            UNION ALL
+            SELECT status, -count(*) AS delta FROM old_rows GROUP BY status
+        ) AS changes
+        GROUP BY status HAVING sum(delta) <> 0;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    "CREATE OR REPLACE TRIGGER product_status_count_ai AFTER INSERT ON product "
+    "REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION product_status_count_insert()",
+    "CREATE OR REPLACE TRIGGER product_status_count_ad AFTER DELETE ON product "
+    "REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION product_status_count_delete()",
+    "CREATE OR REPLACE TRIGGER product_status_count_au AFTER UPDATE ON product "
+    "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION product_status_count_update()",
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'product_status_delta',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('delta', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    # creating the triggers locks out product writes until commit, so the seed
+    # below counts exactly the rows the triggers have not seen
+    for statement in STATUS_COUNT_DDL:
+        op.execute(statement)
+    op.execute(
+        "INSERT INTO product_status_delta (status, delta) "
+        "SELECT status, count(*) FROM product GROUP BY status"
+    )
+
+    with op.get_context().autocommit_block():
+        for name, definition in INDEXES.items():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} {definition};")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name};")
+    for trigger in ("product_status_count_ai", "product_status_count_ad", "product_status_count_au"):
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger} ON product;")
+    for function in ("product_status_count_insert", "product_status_count_delete", "product_status_count_update"):
+        op.execute(f"DROP FUNCTION IF EXISTS {function}();")
+    op.drop_table('product_status_delta')
@@ -0,0 +1,36 @@
+"""add ingest seen sku
+
+Revision ID: d9b4f7e2a513
+Revises: c6e9a2f4d187
+Create Date: 2026-10-19 22:16:04.227581
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9b4f7e2a513'
+down_revision: Union[str, Sequence[str], None] = 'c6e9a2f4d187'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # scratch rows of running snapshot ingests: not worth WAL or replication
+    op.create_table(
+        'ingest_seen_sku',
+        sa.Column('run_id', sa.String(), nullable=False),
+        sa.Column('sku', postgresql.CITEXT(), nullable=False),
+        sa.PrimaryKeyConstraint('run_id', 'sku'),
+        prefixes=['UNLOGGED'],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('ingest_seen_sku')
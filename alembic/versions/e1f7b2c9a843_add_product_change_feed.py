@@ -0,0 +1,89 @@
+"""add product change feed
+
+Revision ID: e1f7b2c9a843
+Revises: d5a8c3f2e761
+Create Date: 2026-10-19 14:05:41.306218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1f7b2c9a843'
+down_revision: Union[str, Sequence[str], None] = 'd5a8c3f2e761'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 5000
+
+# PG_CHANGE_FEED_DDL (src/products/ddl.py) as of this revision
+CHANGE_FEED_DDL = [
+    "CREATE SEQUENCE IF NOT EXISTS product_change_seq",
+    """CREATE OR REPLACE FUNCTION product_change_stamp() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND OLD.change_seq IS NOT NULL AND ROW(NEW.name, NEW.sku, NEW.description, NEW.status)
+                IS NOT DISTINCT FROM ROW(OLD.name, OLD.sku, OLD.description, OLD.status) THEN
+            NEW.change_seq := OLD.change_seq;
+            NEW.updated_at := OLD.updated_at;
+            RETURN NEW;
+        END IF;
+        NEW.change_seq := nextval('product_change_seq');
+        NEW.updated_at := clock_timestamp();
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION product_change_tombstone() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO product_tombstone (change_seq, product_id, sku, deleted_at)
+        VALUES (nextval('product_change_seq'), OLD.id, OLD.sku, clock_timestamp());
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    "CREATE OR REPLACE TRIGGER product_change_stamp BEFORE INSERT OR UPDATE ON product "
+    "FOR EACH ROW EXECUTE FUNCTION product_change_stamp()",
+    "CREATE OR REPLACE TRIGGER product_change_tombstone AFTER DELETE ON product "
+    "FOR EACH ROW EXECUTE FUNCTION product_change_tombstone()",
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # nullable column and a stable default: both are catalog-only changes
+    op.add_column('product', sa.Column('change_seq', sa.BigInteger(), nullable=True))
+    op.add_column('product', sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True))
+    op.create_table(
+        'product_tombstone',
+        sa.Column('change_seq', sa.BigInteger(), autoincrement=False, nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('sku', sa.String(), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('change_seq'),
+    )
+    for statement in CHANGE_FEED_DDL:
+        op.execute(statement)
+
+    with op.get_context().autocommit_block():
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_product_change_seq ON product (change_seq);")
+        # stamp existing rows in short transactions; the trigger treats an
+        # unstamped row as changed, and new writes are already stamped
+        connection = op.get_bind()
+        while connection.execute(sa.text(
+            "UPDATE product SET change_seq = NULL WHERE id IN "
+            "(SELECT id FROM product WHERE change_seq IS NULL LIMIT :batch)"
+        ), {"batch": BACKFILL_BATCH_SIZE}).rowcount:
+            pass
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS product_change_stamp ON product;")
+    op.execute("DROP TRIGGER IF EXISTS product_change_tombstone ON product;")
+    op.execute("DROP FUNCTION IF EXISTS product_change_stamp();")
+    op.execute("DROP FUNCTION IF EXISTS product_change_tombstone();")
+    op.execute("DROP SEQUENCE IF EXISTS product_change_seq;")
+    op.drop_table('product_tombstone')
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_product_change_seq;")
+    op.drop_column('product', 'updated_at')
+    op.drop_column('product', 'change_seq')
@@ -0,0 +1,63 @@
+"""add product version
+
+Revision ID: f3a9d1e5b702
+Revises: e1f7b2c9a843
+Create Date: 2026-10-19 15:32:10.584127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a9d1e5b702'
+down_revision: Union[str, Sequence[str], None] = 'e1f7b2c9a843'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must stay identical to product_change_stamp in PG_CHANGE_FEED_DDL (src/products/ddl.py)
+CHANGE_STAMP_FUNCTION = """CREATE OR REPLACE FUNCTION product_change_stamp() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND OLD.change_seq IS NOT NULL AND ROW(NEW.name, NEW.sku, NEW.description, NEW.status)
+                IS NOT DISTINCT FROM ROW(OLD.name, OLD.sku, OLD.description, OLD.status) THEN
+            NEW.change_seq := OLD.change_seq;
+            NEW.updated_at := OLD.updated_at;
+            NEW.version := OLD.version;
+            RETURN NEW;
+        END IF;
+        IF TG_OP = 'UPDATE' THEN
+            NEW.version := OLD.version + 1;
+        END IF;
+        NEW.change_seq := nextval('product_change_seq');
+        NEW.updated_at := clock_timestamp();
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql"""
+
+# the function as of e1f7b2c9a843, restored on downgrade
+PREVIOUS_CHANGE_STAMP_FUNCTION = """CREATE OR REPLACE FUNCTION product_change_stamp() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND OLD.change_seq IS NOT NULL AND ROW(NEW.name, NEW.sku, NEW.description, NEW.status)
+                IS NOT DISTINCT FROM ROW(OLD.name, OLD.sku, OLD.description, OLD.status) THEN
+            NEW.change_seq := OLD.change_seq;
+            NEW.updated_at := OLD.updated_at;
+            RETURN NEW;
+        END IF;
+        NEW.change_seq := nextval('product_change_seq');
+        NEW.updated_at := clock_timestamp();
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # constant default: a catalog-only change, existing rows read as version 1
+    op.add_column('product', sa.Column('version', sa.Integer(), server_default=sa.text('1'), nullable=False))
+    op.execute(CHANGE_STAMP_FUNCTION)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(PREVIOUS_CHANGE_STAMP_FUNCTION)
+    op.drop_column('product', 'version')
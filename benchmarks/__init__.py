@@ -0,0 +1,5 @@
+import os
+
+# benchmarks run in-process; without a configured server they use the in-memory Redis
+if not os.getenv("REDIS_URL") and not os.getenv("UPSTASH_REDIS_REST_URL"):
+    os.environ.setdefault("REDIS_BACKEND", "memory")
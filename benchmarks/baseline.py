@@ -0,0 +1,72 @@
+import json
+import platform
+from datetime import datetime
+from pathlib import Path
+
+BASELINE_FILE = Path(__file__).parent / "baselines.json"
+DEFAULT_TOLERANCE = 0.15   # 15% worse than baseline counts as a regression
+
+
+def metric(value: float, unit: str, higher_is_better: bool) -> dict:
+    return {"value": round(value, 4), "unit": unit, "higher_is_better": higher_is_better}
+
+
+def load_baselines(path: Path = BASELINE_FILE) -> dict:
+    if not path.exists():
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f).get("metrics", {})
+
+
+def save_baselines(metrics: dict, path: Path = BASELINE_FILE) -> None:
+    """Merge metrics into the stored baselines"""
+    stored = load_baselines(path)
+    stored.update(metrics)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "recorded_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "metrics": dict(sorted(stored.items())),
+        }, f, indent=2)
+        f.write("\n")
+
+
+def compare(current: dict, baselines: dict, tolerance: float = DEFAULT_TOLERANCE) -> list[dict]:
+    """
+    Compare current metrics against baselines. Each row carries the relative
+    change (positive = better) and a status of ok, improved, regressed or new.
+    """
+    rows = []
+    for name, result in sorted(current.items()):
+        baseline = baselines.get(name)
+        if baseline is None or not baseline["value"]:
+            rows.append({"metric": name, "current": result["value"], "baseline": None,
+                         "change": None, "unit": result["unit"], "status": "new"})
+            continue
+
+        change = (result["value"] - baseline["value"]) / baseline["value"]
+        if not result["higher_is_better"]:
+            change = -change
+
+        if change < -tolerance:
+            status = "regressed"
+        elif change > tolerance:
+            status = "improved"
+        else:
+            status = "ok"
+        rows.append({"metric": name, "current": result["value"], "baseline": baseline["value"],
+                     "change": change, "unit": result["unit"], "status": status})
+    return rows
+
+
+def format_report(rows: list[dict]) -> str:
+    lines = [f"{'metric':<48} {'baseline':>12} {'current':>12} {'change':>8}  status"]
+    for row in rows:
+        baseline = f"{row['baseline']:.2f}" if row["baseline"] is not None else "-"
+        change = f"{row['change'] * 100:+.1f}%" if row["change"] is not None else "-"
+        marker = "❌ " if row["status"] == "regressed" else ""
+        lines.append(f"{row['metric']:<48} {baseline:>12} {row['current']:>12.2f} {change:>8}  {marker}{row['status']}")
+    regressions = sum(1 for row in rows if row["status"] == "regressed")
+    lines.append(f"\n{regressions} regression(s) across {len(rows)} metric(s)")
+    return "\n".join(lines)
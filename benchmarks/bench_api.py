@@ -0,0 +1,68 @@
+import asyncio
+import itertools
+from urllib.parse import quote
+
+from sqlalchemy import insert
+
+from src.products.model import Product
+from src.webhooks.model import WebhookURL
+from benchmarks.baseline import metric
+from benchmarks.harness import sqlite_client, run_load
+
+SEED_PRODUCTS = 5_000
+SEED_WEBHOOKS = 200
+
+
+async def _seed(session_maker) -> None:
+    async with session_maker() as session:
+        await session.execute(insert(Product), [
+            {"sku": f"SKU-{i:08d}", "name": f"Product {i}", "description": "seeded", "status": "active"}
+            for i in range(SEED_PRODUCTS)
+        ])
+        await session.execute(insert(WebhookURL), [
+            {"url": f"https://hooks.example.com/{i}", "status": "active"}
+            for i in range(SEED_WEBHOOKS)
+        ])
+        await session.commit()
+
+
+def _scenarios(client):
+    """(name, send) pairs; send(i) issues the i-th request of the scenario"""
+    new_ids = itertools.count()  # writes need fresh keys across warm-up and measured runs
+    return [
+        ("GET /products/id/{sku}",
+         lambda i: client.get(f"/products/id/SKU-{i % SEED_PRODUCTS:08d}")),
+        ("GET /products/all?limit=100",
+         lambda i: client.get("/products/all", params={"limit": 100, "offset": (i * 100) % SEED_PRODUCTS})),
+        ("GET /products/all?limit=1000",
+         lambda i: client.get("/products/all", params={"limit": 1000, "offset": (i * 1000) % SEED_PRODUCTS})),
+        ("POST /products/new",
+         lambda i: client.post("/products/new", json={"sku": f"NEW-{next(new_ids):08d}", "name": "New", "description": "bench"})),
+        ("GET /webhooks/all",
+         lambda i: client.get("/webhooks/all")),
+        ("GET /webhooks/url/{url}",
+         lambda i: client.get(f"/webhooks/url/{quote(f'https://hooks.example.com/{i % SEED_WEBHOOKS}', safe='')}")),
+        ("POST /webhooks/new",
+         lambda i: client.post("/webhooks/new", json={"url": f"https://new.example.com/{next(new_ids)}"})),
+    ]
+
+
+async def run_api_benchmarks(requests: int = 500, concurrency: int = 20) -> dict:
+    """Throughput and latency of the hot endpoints under concurrent load"""
+    metrics = {}
+    async with sqlite_client() as (client, session_maker):
+        await _seed(session_maker)
+        for name, send in _scenarios(client):
+            await run_load(send, min(requests, 20), concurrency)  # warm-up
+            stats = await run_load(send, requests, concurrency)
+            prefix = f"api.{name}"
+            metrics[f"{prefix}.rps"] = metric(stats["rps"], "req/s", True)
+            metrics[f"{prefix}.p50"] = metric(stats["p50_ms"], "ms", False)
+            metrics[f"{prefix}.p99"] = metric(stats["p99_ms"], "ms", False)
+            print(f"  {name:<32} {stats['rps']:8.0f} req/s  p50 {stats['p50_ms']:6.1f}ms  "
+                  f"p99 {stats['p99_ms']:6.1f}ms  errors {stats['errors']}")
+    return metrics
+
+
+if __name__ == "__main__":
+    asyncio.run(run_api_benchmarks())
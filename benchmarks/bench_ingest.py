@@ -0,0 +1,60 @@
+import os
+import time
+import tempfile
+from pathlib import Path
+
+from sqlalchemy import text
+
+from benchmarks.baseline import metric
+from benchmarks.datagen import generate_products_csv
+from benchmarks.harness import sqlite_sync_engine
+
+from src.tasks import celery_worker, db
+from src.tasks.celery_worker import celery, process_csv_task
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+
+
+def _label(rows: int) -> str:
+    return f"{rows // 1_000_000}M" if rows >= 1_000_000 else f"{rows // 1_000}K"
+
+
+def run_ingest_benchmarks(sizes=DEFAULT_SIZES, seed: int = 42) -> dict:
+    """
+    Rows/sec of process_csv_task on seeded synthetic CSVs. The task runs eagerly
+    in this process against a SQLite file, so the number tracks the parsing and
+    batching code rather than the network.
+    """
+    celery.conf.update(result_backend="cache+memory://", task_always_eager=True)
+    celery_worker.INGEST_MAX_CONCURRENT = 0  # no Redis semaphore in-process
+    metrics = {}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in sizes:
+            db_path = os.path.join(workdir, f"ingest_{rows}.db")
+            engine = sqlite_sync_engine(db_path)
+            with engine.begin() as conn:
+                # the SQLite FTS5 search mirror costs more per row than everything
+                # under test here; Postgres maintains its GIN indexes separately
+                conn.execute(text("DROP TRIGGER product_search_ai"))
+            db.set_sync_engine(engine)
+            csv_path = generate_products_csv(Path(workdir) / "csv" / f"bench_{rows}.csv", rows, seed=seed)
+            try:
+                started = time.perf_counter()
+                result = process_csv_task.apply(args=(str(csv_path),))
+                elapsed = time.perf_counter() - started
+                if result.failed():
+                    raise RuntimeError(f"Ingest of {rows} rows failed: {result.result}")
+                inserted = result.result["total_inserted"]
+            finally:
+                db.set_sync_engine(None)
+                engine.dispose()
+
+            rate = rows / elapsed if elapsed > 0 else 0.0
+            metrics[f"ingest.process_csv_task.{_label(rows)}.rows_per_sec"] = metric(rate, "rows/s", True)
+            print(f"  process_csv_task {_label(rows):>4}: {rate:10.0f} rows/s  ({inserted:,} inserted in {elapsed:.1f}s)")
+    return metrics
+
+
+if __name__ == "__main__":
+    run_ingest_benchmarks()
@@ -0,0 +1,76 @@
+import os
+import random
+import asyncio
+import tempfile
+import time
+
+from sqlalchemy import text
+
+from benchmarks.baseline import metric
+from benchmarks.harness import sqlite_client, sqlite_sync_engine, run_load
+from src.products.model import Product
+
+DEFAULT_ROWS = 1_000_000
+SEED_CHUNK = 50_000
+
+
+def _label(rows: int) -> str:
+    return f"{rows // 1_000_000}M" if rows >= 1_000_000 else f"{rows // 1_000}K"
+
+
+def _seed(db_path: str, rows: int) -> None:
+    engine = sqlite_sync_engine(db_path)
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("DROP TRIGGER product_search_ai"))  # search index is not under test
+            for start in range(0, rows, SEED_CHUNK):
+                conn.execute(Product.__table__.insert(), [
+                    {"sku": f"SKU-{i:08d}", "name": f"Product {i}", "description": "seeded", "status": "active"}
+                    for i in range(start, min(start + SEED_CHUNK, rows))
+                ])
+    finally:
+        engine.dispose()
+
+
+async def _measure(db_path: str, rows: int, requests: int) -> dict:
+    rng = random.Random(7)
+    skus = [f"SKU-{rng.randrange(rows):08d}" for _ in range(requests)]
+    async with sqlite_client(db_path) as (client, _):
+        send = lambda i: client.get(f"/products/id/{skus[i]}")
+        await run_load(send, min(requests, 5), 1)  # warm-up
+        return await run_load(send, requests, 1)
+
+
+def run_lookup_benchmarks(rows: int = DEFAULT_ROWS, requests: int = 50) -> dict:
+    """
+    GET /products/id/{sku} latency on a table of `rows` products, without an
+    index on sku (the state before the unique-SKU migration) and with it.
+    """
+    metrics = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, "lookup.db")
+        started = time.perf_counter()
+        _seed(db_path, rows)
+        print(f"  seeded {rows:,} products in {time.perf_counter() - started:.1f}s")
+
+        engine = sqlite_sync_engine(db_path)
+        with engine.begin() as conn:
+            conn.execute(text("DROP INDEX ux_product_sku"))
+        engine.dispose()
+        unindexed = asyncio.run(_measure(db_path, rows, requests))
+
+        engine = sqlite_sync_engine(db_path)
+        unique_sku = next(index for index in Product.__table__.indexes if index.name == "ux_product_sku")
+        unique_sku.create(engine)
+        engine.dispose()
+        indexed = asyncio.run(_measure(db_path, rows, requests))
+
+    label = _label(rows)
+    for name, stats in (("unindexed", unindexed), ("indexed", indexed)):
+        metrics[f"lookup.sku.{label}.{name}.p50"] = metric(stats["p50_ms"], "ms", False)
+        print(f"  GET /products/id/{{sku}} {label} {name:<10} p50 {stats['p50_ms']:8.2f}ms  p99 {stats['p99_ms']:8.2f}ms")
+    return metrics
+
+
+if __name__ == "__main__":
+    run_lookup_benchmarks()
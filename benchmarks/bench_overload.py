@@ -0,0 +1,98 @@
+import time
+import asyncio
+from statistics import quantiles
+
+from sqlalchemy import insert
+
+from src.middlewares import admission
+from src.middlewares.admission import AdmissionController
+from src.products.model import Product
+from benchmarks.baseline import metric
+from benchmarks.harness import sqlite_client, run_load
+
+SEED_PRODUCTS = 5_000
+EXPENSIVE_EVERY = 5     # one list scan per four lookups
+
+
+async def _seed(session_maker) -> None:
+    async with session_maker() as session:
+        await session.execute(insert(Product), [
+            {"sku": f"SKU-{i:08d}", "name": f"Product {i}", "description": "seeded", "status": "active"}
+            for i in range(SEED_PRODUCTS)
+        ])
+        await session.commit()
+
+
+def _p99(samples: list[float]) -> float:
+    return quantiles(samples, n=100)[98] if len(samples) > 1 else (samples[0] if samples else 0.0)
+
+
+async def _overload(client, rate: float, seconds: float) -> dict:
+    """
+    Open-loop load: requests arrive at `rate` per second whether or not
+    earlier ones finished, as they do from many independent clients. Lookups
+    are mixed with 1000-row list scans.
+    """
+    latencies = {"lookup": [], "scan": []}
+    shed = 0
+
+    async def send(i):
+        nonlocal shed
+        kind = "scan" if i % EXPENSIVE_EVERY == 0 else "lookup"
+        started = time.perf_counter()
+        if kind == "scan":
+            response = await client.get("/products/all", params={"limit": 1000, "offset": (i * 1000) % SEED_PRODUCTS})
+        else:
+            response = await client.get(f"/products/id/SKU-{i % SEED_PRODUCTS:08d}")
+        if response.status_code == 503:
+            shed += 1
+        else:
+            latencies[kind].append((time.perf_counter() - started) * 1000)
+
+    total = int(rate * seconds)
+    in_flight = []
+    started = time.perf_counter()
+    for i in range(total):
+        delay = started + i / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        in_flight.append(asyncio.ensure_future(send(i)))
+    await asyncio.gather(*in_flight)
+    elapsed = time.perf_counter() - started
+
+    served = len(latencies["lookup"]) + len(latencies["scan"])
+    return {
+        "goodput": served / elapsed,
+        "lookup_p99_ms": _p99(latencies["lookup"]),
+        "scan_p99_ms": _p99(latencies["scan"]),
+        "shed_pct": 100 * shed / total,
+    }
+
+
+async def run_overload_benchmarks(rate: float = 400, seconds: float = 5) -> dict:
+    """Latency of served requests under overload, without and with admission control"""
+    metrics = {}
+    enabled = admission.ADMISSION_ENABLED
+    try:
+        async with sqlite_client() as (client, session_maker):
+            await _seed(session_maker)
+            for mode in ("off", "on"):
+                admission.ADMISSION_ENABLED = mode == "on"
+                admission.set_admission_controller(AdmissionController())
+                await run_load(lambda i: client.get(f"/products/id/SKU-{i:08d}"), 50, 10)  # warm-up
+                stats = await _overload(client, rate, seconds)
+                prefix = f"overload.admission_{mode}"
+                metrics[f"{prefix}.goodput"] = metric(stats["goodput"], "req/s", True)
+                metrics[f"{prefix}.lookup_p99"] = metric(stats["lookup_p99_ms"], "ms", False)
+                metrics[f"{prefix}.scan_p99"] = metric(stats["scan_p99_ms"], "ms", False)
+                print(f"  admission {mode:<3} served {stats['goodput']:6.0f} req/s  "
+                      f"lookup p99 {stats['lookup_p99_ms']:7.1f}ms  scan p99 {stats['scan_p99_ms']:7.1f}ms  "
+                      f"shed {stats['shed_pct']:.0f}%")
+    finally:
+        admission.ADMISSION_ENABLED = enabled
+        admission.set_admission_controller(None)
+    return metrics
+
+
+if __name__ == "__main__":
+    asyncio.run(run_overload_benchmarks())
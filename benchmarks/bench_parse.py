@@ -0,0 +1,39 @@
+import time
+import tempfile
+from pathlib import Path
+
+from benchmarks.baseline import metric
+from benchmarks.datagen import generate_products_csv
+from src.tasks.csv_reader import iter_product_batches_arrow, iter_product_batches_python
+
+DEFAULT_ROWS = 1_000_000
+
+
+def _drain(reader, path: str) -> tuple[float, int]:
+    started = time.perf_counter()
+    rows = sum(len(batch.rows) for batch in reader(path, 1000))
+    return time.perf_counter() - started, rows
+
+
+def run_parse_benchmarks(rows: int = DEFAULT_ROWS, seed: int = 42) -> dict:
+    """Parse + normalize throughput of the row-at-a-time and columnar CSV readers"""
+    with tempfile.TemporaryDirectory() as workdir:
+        path = str(generate_products_csv(Path(workdir) / "parse.csv", rows, seed=seed))
+        python_elapsed, python_rows = _drain(iter_product_batches_python, path)
+        arrow_elapsed, arrow_rows = _drain(iter_product_batches_arrow, path)
+
+    if python_rows != arrow_rows:
+        raise RuntimeError(f"Readers disagree: python={python_rows} arrow={arrow_rows}")
+
+    python_rate = rows / python_elapsed
+    arrow_rate = rows / arrow_elapsed
+    print(f"  python reader: {python_rate:10.0f} rows/s")
+    print(f"  arrow reader:  {arrow_rate:10.0f} rows/s  ({arrow_rate / python_rate:.1f}x)")
+    return {
+        "parse.python.rows_per_sec": metric(python_rate, "rows/s", True),
+        "parse.arrow.rows_per_sec": metric(arrow_rate, "rows/s", True),
+    }
+
+
+if __name__ == "__main__":
+    run_parse_benchmarks()
@@ -0,0 +1,50 @@
+import sys
+import json
+import subprocess
+from pathlib import Path
+from statistics import median
+
+from benchmarks.baseline import metric
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# Runs in a fresh interpreter: time `import main`, then the app's lifespan startup
+STARTUP_SCRIPT = """
+import asyncio, json, logging, time
+logging.disable(logging.CRITICAL)
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+async def startup():
+    async with main.app.router.lifespan_context(main.app):
+        return time.perf_counter()
+
+ready = asyncio.run(startup())
+print(json.dumps({"import_s": imported - started, "startup_s": ready - imported}))
+"""
+
+
+def run_startup_benchmarks(runs: int = 5) -> dict:
+    """Cold-start duration of the API process: module import plus lifespan startup"""
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT],
+            cwd=PROJECT_ROOT, capture_output=True, text=True, check=True,
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+
+    import_ms = median(sample["import_s"] for sample in samples) * 1000
+    startup_ms = median(sample["startup_s"] for sample in samples) * 1000
+    print(f"  import main:      {import_ms:8.1f}ms")
+    print(f"  lifespan startup: {startup_ms:8.1f}ms")
+    return {
+        "startup.import_main.ms": metric(import_ms, "ms", False),
+        "startup.lifespan.ms": metric(startup_ms, "ms", False),
+        "startup.cold_start.ms": metric(import_ms + startup_ms, "ms", False),
+    }
+
+
+if __name__ == "__main__":
+    run_startup_benchmarks()
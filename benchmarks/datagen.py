@@ -0,0 +1,35 @@
+import csv
+import random
+from pathlib import Path
+
+ADJECTIVES = ["Compact", "Heavy-Duty", "Wireless", "Organic", "Premium", "Portable", "Smart", "Classic", "Eco", "Ultra"]
+NOUNS = ["Drill", "Kettle", "Headset", "Backpack", "Lamp", "Blender", "Router", "Chair", "Bottle", "Charger"]
+WORDS = ["durable", "lightweight", "steel", "cotton", "rechargeable", "waterproof", "ergonomic", "modular", "quiet", "fast"]
+
+
+def generate_products_csv(path: Path, rows: int, seed: int = 42, invalid_ratio: float = 0.01) -> Path:
+    """
+    Write a deterministic product CSV with the columns process_csv_task expects.
+    The same (rows, seed, invalid_ratio) always produces byte-identical files.
+    A small share of rows is left without SKU or name to exercise the reject path.
+    """
+    rng = random.Random(seed)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(path, mode="w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["sku", "name", "description"])
+        for i in range(rows):
+            sku = f"sku-{i:08d}" if rng.random() < 0.5 else f" SKU-{i:08d} "
+            name = f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {rng.randint(1, 999)}"
+            description = " ".join(rng.choices(WORDS, k=rng.randint(0, 12)))
+
+            if rng.random() < invalid_ratio:
+                if rng.random() < 0.5:
+                    sku = "  "
+                else:
+                    name = ""
+            writer.writerow([sku, name, description])
+
+    return path
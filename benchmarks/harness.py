@@ -0,0 +1,84 @@
+import os
+import tempfile
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from statistics import quantiles
+
+from sqlmodel import SQLModel, create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+from httpx import ASGITransport, AsyncClient
+
+from src.database import get_session
+
+
+@asynccontextmanager
+async def sqlite_client(db_path: str | None = None):
+    """AsyncClient bound to the app with get_session pointed at a fresh SQLite file"""
+    from main import app
+
+    owns_file = db_path is None
+    if owns_file:
+        handle = tempfile.NamedTemporaryFile(delete=False, suffix=".db")
+        handle.close()
+        db_path = handle.name
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", echo=False)
+    session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    async def get_bench_session():
+        async with session_maker() as session:
+            yield session
+
+    app.dependency_overrides[get_session] = get_bench_session
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+            yield client, session_maker
+    finally:
+        app.dependency_overrides.clear()
+        await engine.dispose()
+        if owns_file and os.path.exists(db_path):
+            os.unlink(db_path)
+
+
+def sqlite_sync_engine(db_path: str):
+    """Sync engine with the schema created, for driving Celery tasks in-process"""
+    engine = create_engine(f"sqlite:///{db_path}", echo=False)
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+async def run_load(send, total: int, concurrency: int) -> dict:
+    """
+    Fire `total` calls of `send(i)` from `concurrency` workers and return
+    throughput and latency percentiles. `send` returns an httpx response.
+    """
+    latencies: list[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            response = await send(i)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 500:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    cuts = quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": cuts[49],
+        "p95_ms": cuts[94],
+        "p99_ms": cuts[98],
+    }
@@ -0,0 +1,82 @@
+"""
+Benchmark runner.
+
+    python -m benchmarks.run                         # everything, compare with baselines
+    python -m benchmarks.run --suite api --requests 1000 --concurrency 50
+    python -m benchmarks.run --suite ingest --sizes 10000,100000
+    python -m benchmarks.run --suite parse           # row-at-a-time vs columnar CSV reader
+    python -m benchmarks.run --suite startup         # API import + lifespan cold start
+    python -m benchmarks.run --suite lookup --lookup-rows 1000000   # SKU lookup without / with index
+    python -m benchmarks.run --suite overload --overload-rate 400   # p99 under overload, admission off / on
+    python -m benchmarks.run --save-baseline         # record current numbers as the new baseline
+
+Exits with status 1 when any metric regressed beyond the tolerance.
+"""
+import sys
+import asyncio
+import argparse
+import logging
+
+from benchmarks.baseline import DEFAULT_TOLERANCE, compare, format_report, load_baselines, save_baselines
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="API and ingest benchmarks")
+    parser.add_argument("--suite", choices=["api", "ingest", "parse", "startup", "lookup", "overload", "all"], default="all")
+    parser.add_argument("--requests", type=int, default=500, help="requests per API scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="comma separated ingest row counts")
+    parser.add_argument("--lookup-rows", type=int, default=1_000_000, help="table size for the lookup suite")
+    parser.add_argument("--overload-rate", type=float, default=400, help="arrivals per second for the overload suite")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.WARNING)
+    metrics = {}
+
+    if args.suite in ("api", "all"):
+        from benchmarks.bench_api import run_api_benchmarks
+        print("🚀 API benchmarks")
+        metrics.update(asyncio.run(run_api_benchmarks(args.requests, args.concurrency)))
+
+    if args.suite in ("ingest", "all"):
+        from benchmarks.bench_ingest import run_ingest_benchmarks
+        print("🚀 Ingest benchmarks")
+        sizes = [int(size) for size in args.sizes.split(",") if size]
+        metrics.update(run_ingest_benchmarks(sizes, seed=args.seed))
+
+    if args.suite in ("parse", "all"):
+        from benchmarks.bench_parse import run_parse_benchmarks
+        print("🚀 Parse benchmarks")
+        metrics.update(run_parse_benchmarks(seed=args.seed))
+
+    if args.suite in ("startup", "all"):
+        from benchmarks.bench_startup import run_startup_benchmarks
+        print("🚀 Startup benchmarks")
+        metrics.update(run_startup_benchmarks())
+
+    if args.suite in ("lookup", "all"):
+        from benchmarks.bench_lookup import run_lookup_benchmarks
+        print("🚀 Lookup benchmarks")
+        metrics.update(run_lookup_benchmarks(args.lookup_rows))
+
+    if args.suite in ("overload", "all"):
+        from benchmarks.bench_overload import run_overload_benchmarks
+        print("🚀 Overload benchmarks")
+        metrics.update(asyncio.run(run_overload_benchmarks(args.overload_rate)))
+
+    rows = compare(metrics, load_baselines(), args.tolerance)
+    print()
+    print(format_report(rows))
+
+    if args.save_baseline:
+        save_baselines(metrics)
+        print("\n📁 Baselines updated")
+        return 0
+    return 1 if any(row["status"] == "regressed" for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
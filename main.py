@@ -2,14 +2,21 @@ import os
 from fastapi import FastAPI, Response
 from contextlib import asynccontextmanager
 
-from orjson import dumps
 from dotenv import load_dotenv 
 import logging
-from src.database import create_db_and_tables, get_session
-from src.upstash_redis import init_upstash_redis  # Import Upstash Redis function
+from src.database import dispose_engine, get_session
+from src.redis import check_redis, close_redis
 from src.auth.router import router as auth_router
 from src.products.router import router as products_router
 from src.webhooks.router import router as webhooks_router
+from src.admin.router import router as admin_router
+from src.middlewares.profiling import ProfilingMiddleware
+from src.middlewares.recent_write import RecentWriteMiddleware
+from src.middlewares.admission import AdmissionMiddleware
+from src.middlewares.deadline import DeadlineMiddleware
+from src.deadlines import DeadlineExceeded, deadline_exceeded_response, database_error_response
+from sqlalchemy.exc import DBAPIError
+from src.responses import ORJSONResponse
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO)
@@ -20,19 +27,27 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
 
     print("Starting up...")
-    logger.info("Creating database and tables...")
-    await create_db_and_tables()
-    logger.info("Initializing Upstash Redis...")
-    init_upstash_redis()       # Initialize Upstash Redis connection
+    # Schema is managed by Alembic (`alembic upgrade head`), not at startup.
+    # The DB engine and Celery app are created on first use.
+    logger.info("Checking Redis...")
+    await check_redis()  # async, bounded by REDIS_HEALTHCHECK_TIMEOUT
     yield                        # app runs here
     print("Shutting down...")
+    await dispose_engine()
+    await close_redis()
 
-app = FastAPI(lifespan=lifespan)
-
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+app.add_middleware(RecentWriteMiddleware)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(AdmissionMiddleware)  # shed load before any other work
+app.add_middleware(DeadlineMiddleware)   # outermost: the budget includes the admission wait
+app.add_exception_handler(DeadlineExceeded, deadline_exceeded_response)
+app.add_exception_handler(DBAPIError, database_error_response)  # statement_timeout -> 504
 
 app.include_router(auth_router)
 app.include_router(products_router)
 app.include_router(webhooks_router)
+app.include_router(admin_router)
 @app.get("/")
 async def root():
     return {"message": "Hello World"}
\ No newline at end of file
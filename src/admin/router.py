@@ -0,0 +1,64 @@
+import os
+import hmac
+from fastapi import APIRouter, Depends, Header, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.database import get_session
+from src.middlewares.profiling import profile_buffer
+from src.middlewares.admission import get_admission_controller
+from src import deadlines
+from src.products.service import drop_tenant_catalog
+from src.products.cache import invalidate_organization
+from src.redis import get_redis
+from src.tenancy import validate_organization
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+
+def require_admin(x_admin_token: str | None = Header(default=None)) -> None:
+    """Checks the X-Admin-Token header; without ADMIN_TOKEN configured the admin API is off"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Admin API is disabled (set ADMIN_TOKEN)")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+# list recent request profiles, newest first
+@router.get("/profiles", summary="List recent request profiles", dependencies=[Depends(require_admin)])
+async def list_profiles(limit: int = 50) -> list[dict]:
+    """Endpoint to list captured request profiles"""
+    return [profile.summary() for profile in profile_buffer.list(limit)]
+
+
+# get a single profile with its SQL statements and sampled stacks
+@router.get("/profiles/{profile_id}", summary="Get request profile", dependencies=[Depends(require_admin)])
+async def get_profile(profile_id: int) -> dict:
+    """Endpoint to get a captured request profile by id"""
+    profile = profile_buffer.get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile.to_dict()
+
+
+# load-shedding and deadline counters since the process started
+@router.get("/metrics", summary="Admission and deadline metrics", dependencies=[Depends(require_admin)])
+async def get_metrics() -> dict:
+    """Endpoint to get admission queue state, rejections and 504s by route class"""
+    return {
+        "admission": get_admission_controller().stats(),
+        "deadlines": {"timeouts": dict(deadlines.timeouts), "defaults_ms": deadlines.REQUEST_TIMEOUT_MS},
+    }
+
+
+# drop one organization's whole product catalog (tenant offboarding)
+@router.delete("/tenants/{organization}/products", status_code=204, summary="Drop a tenant's catalog",
+               dependencies=[Depends(require_admin)])
+async def drop_tenant_products(organization: str, session: AsyncSession = Depends(get_session)) -> None:
+    """Endpoint to drop every product of an organization by detaching its partition"""
+    try:
+        validate_organization(organization)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await drop_tenant_catalog(session.bind, organization)
+    await invalidate_organization(get_redis(), organization)
@@ -1,25 +1,181 @@
 import logging
 import os
 import ssl
-from sqlmodel import Session, SQLModel, create_engine
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+import time
+from fastapi import Depends, Request
+from sqlmodel import SQLModel
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.dialects.postgresql import CITEXT
+from sqlalchemy.ext.compiler import compiles
 from dotenv import load_dotenv
+from src.deadlines import install_statement_timeout
 
 load_dotenv()
 
-ssl_context = ssl.create_default_context()
-ssl_context.check_hostname = False
-ssl_context.verify_mode = ssl.CERT_NONE
+logger = logging.getLogger(__name__)
+
+# SQLite (tests, local runs) has no CITEXT; a NOCASE text column behaves the same for lookups
+@compiles(CITEXT, "sqlite")
+def compile_citext_sqlite(type_, compiler, **kw):
+    return "TEXT COLLATE NOCASE"
 
 POSTGRES_SERVICE_URL = os.getenv("POSTGRES_SERVICE_URL")
-engine = create_async_engine(POSTGRES_SERVICE_URL,connect_args={"ssl": ssl_context}, echo=True)
-async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+# Optional read replica for GET routes (any async URL; two SQLite files work locally)
+POSTGRES_REPLICA_URL = os.getenv("POSTGRES_REPLICA_URL")
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))  # above this, reads go to the primary
+REPLICA_LAG_CHECK_SECONDS = float(os.getenv("REPLICA_LAG_CHECK_SECONDS", "1"))  # how long a lag reading is reused
+RECENT_WRITE_COOKIE = "recent_write"  # set after writes; pins the client's reads to the primary
+
+# The engine and session factory are built on first use, not at import, so
+# importing the app (API cold start, tests, tooling) never touches the driver.
+_engine: AsyncEngine | None = None
+_async_session: sessionmaker | None = None
+_replica_engine: AsyncEngine | None = None
+_replica_session: sessionmaker | None = None
+
+
+def _create_engine(url: str) -> AsyncEngine:
+    if not url.startswith("postgresql"):
+        return create_async_engine(url)
+    ssl_context = ssl.create_default_context()
+    ssl_context.check_hostname = False
+    ssl_context.verify_mode = ssl.CERT_NONE
+    return create_async_engine(url, connect_args={"ssl": ssl_context}, echo=True)
+
+
+def get_engine() -> AsyncEngine:
+    global _engine
+    if _engine is None:
+        if not POSTGRES_SERVICE_URL:
+            raise RuntimeError("POSTGRES_SERVICE_URL must be set")
+        _engine = _create_engine(POSTGRES_SERVICE_URL)
+    return _engine
+
+
+def get_sessionmaker() -> sessionmaker:
+    global _async_session
+    if _async_session is None:
+        _async_session = sessionmaker(get_engine(), class_=AsyncSession, expire_on_commit=False)
+    return _async_session
+
+
+def __getattr__(name):
+    # keeps `from src.database import engine, async_session` working, lazily
+    if name == "engine":
+        return get_engine()
+    if name == "async_session":
+        return get_sessionmaker()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_replica_sessionmaker() -> sessionmaker | None:
+    """Session factory for the read replica, or None when no replica is configured"""
+    global _replica_engine, _replica_session
+    if _replica_session is None:
+        if _replica_engine is None and POSTGRES_REPLICA_URL:
+            _replica_engine = _create_engine(POSTGRES_REPLICA_URL)
+        if _replica_engine is not None:
+            _replica_session = sessionmaker(_replica_engine, class_=AsyncSession, expire_on_commit=False)
+    return _replica_session
+
+
+def set_replica_engine(engine: AsyncEngine | None) -> None:
+    """Use `engine` as the read replica (tests, tooling); None goes back to POSTGRES_REPLICA_URL"""
+    global _replica_engine, _replica_session
+    _replica_engine = engine
+    _replica_session = None
+    replica_lag.reset()
+
+
+async def dispose_engine():
+    global _engine, _async_session, _replica_engine, _replica_session
+    for engine in (_engine, _replica_engine):
+        if engine is not None:
+            await engine.dispose()
+    _engine = None
+    _async_session = None
+    _replica_engine = None
+    _replica_session = None
+
 
 async def create_db_and_tables():
-    async with engine.begin() as conn:
+    """Create tables directly from the models; deployments use `alembic upgrade head`"""
+    async with get_engine().begin() as conn:
         await conn.run_sync(SQLModel.metadata.create_all)
 
 async def get_session():
-    async with async_session() as session:
+    async with get_sessionmaker()() as session:
+        install_statement_timeout(session)  # bounded by the request's deadline
+        yield session
+
+
+# Replica lag in seconds. A server that is not a standby (or SQLite) reports 0.
+PG_REPLICA_LAG_SQL = text("""
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+""")
+
+
+class ReplicaLag:
+    """
+    Cached replica lag reading: at most one probe per REPLICA_LAG_CHECK_SECONDS
+    no matter how many reads are in flight. An unreachable replica counts as
+    infinitely behind, so reads fail over to the primary.
+    """
+
+    def __init__(self, check_seconds: float):
+        self.check_seconds = check_seconds
+        self.reset()
+
+    def reset(self) -> None:
+        self._lag = 0.0
+        self._checked_at = float("-inf")
+
+    async def probe(self, session: AsyncSession) -> float:
+        if session.bind.dialect.name != "postgresql":
+            return 0.0
+        return float((await session.execute(PG_REPLICA_LAG_SQL)).scalar() or 0)
+
+    async def seconds(self, maker: sessionmaker) -> float:
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_seconds:
+            self._checked_at = now
+            try:
+                async with maker() as session:
+                    self._lag = await self.probe(session)
+            except Exception as e:
+                logger.warning(f"⚠️ Replica lag check failed, reading from primary: {e}")
+                self._lag = float("inf")
+        return self._lag
+
+
+replica_lag = ReplicaLag(REPLICA_LAG_CHECK_SECONDS)
+
+
+def wrote_recently(request: Request) -> bool:
+    """Whether the client wrote within the lag threshold, i.e. the replica may not have it yet"""
+    try:
+        written_at = float(request.cookies.get(RECENT_WRITE_COOKIE, ""))
+    except ValueError:
+        return False
+    return time.time() - written_at < REPLICA_MAX_LAG_SECONDS
+
+
+async def get_read_session(request: Request, session: AsyncSession = Depends(get_session)):
+    """
+    Session for read-only routes: the replica when one is configured, within
+    REPLICA_MAX_LAG_SECONDS, and the client has no recent write; else the
+    primary session (which opens no connection unless used).
+    """
+    maker = get_replica_sessionmaker()
+    if maker is None or wrote_recently(request) or await replica_lag.seconds(maker) > REPLICA_MAX_LAG_SECONDS:
         yield session
+        return
+    async with maker() as replica:
+        install_statement_timeout(replica)
+        yield replica
@@ -0,0 +1,88 @@
+import os
+import time
+import logging
+from collections import Counter
+from contextvars import ContextVar
+
+from dotenv import load_dotenv
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.responses import ORJSONResponse
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Request deadlines. Each request gets a budget (X-Request-Timeout-Ms, capped,
+# or its route class's default), and every transaction its session opens runs
+# with SET LOCAL statement_timeout = what is left of it.
+REQUEST_TIMEOUT_HEADER = "x-request-timeout-ms"
+REQUEST_TIMEOUT_MS = {
+    "cheap": float(os.getenv("REQUEST_TIMEOUT_CHEAP_MS", "2000")),
+    "standard": float(os.getenv("REQUEST_TIMEOUT_MS", "5000")),
+    "expensive": float(os.getenv("REQUEST_TIMEOUT_EXPENSIVE_MS", "15000")),
+}
+REQUEST_TIMEOUT_MAX_MS = float(os.getenv("REQUEST_TIMEOUT_MAX_MS", "30000"))
+
+PG_QUERY_CANCELED = "57014"   # statement_timeout (or a cancel) ended the statement
+
+request_deadline: ContextVar[float | None] = ContextVar("request_deadline", default=None)
+request_class: ContextVar[str | None] = ContextVar("request_class", default=None)
+
+# 504s by route class, exposed by GET /admin/metrics
+timeouts: Counter = Counter()
+
+
+class DeadlineExceeded(Exception):
+    """The request ran out of its time budget"""
+
+
+def request_budget_ms(header: str | None, route_class: str) -> float:
+    """The client's budget when it sent a valid one (capped), else the route class default"""
+    try:
+        requested = float(header) if header else 0
+    except ValueError:
+        requested = 0
+    if requested > 0:
+        return min(requested, REQUEST_TIMEOUT_MAX_MS)
+    return REQUEST_TIMEOUT_MS.get(route_class, REQUEST_TIMEOUT_MS["standard"])
+
+
+def remaining_ms() -> float | None:
+    deadline = request_deadline.get()
+    return None if deadline is None else (deadline - time.monotonic()) * 1000
+
+
+def _set_statement_timeout(session, transaction, connection) -> None:
+    left = remaining_ms()
+    if left is None:
+        return
+    if left <= 0:
+        raise DeadlineExceeded()
+    if connection.dialect.name == "postgresql":
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {max(1, int(left))}")
+
+
+def install_statement_timeout(session: AsyncSession) -> None:
+    """Bound every transaction `session` opens by the current request's deadline"""
+    event.listen(session.sync_session, "after_begin", _set_statement_timeout)
+
+
+def is_statement_timeout(error: DBAPIError) -> bool:
+    return getattr(error.orig, "sqlstate", None) == PG_QUERY_CANCELED
+
+
+async def deadline_exceeded_response(request: Request, exc: Exception) -> ORJSONResponse:
+    route_class = request_class.get() or "standard"
+    timeouts[route_class] += 1
+    logger.warning(f"⏱️ Deadline exceeded: {request.method} {request.url.path} ({route_class})")
+    return ORJSONResponse({"detail": "Request deadline exceeded"}, status_code=504)
+
+
+async def database_error_response(request: Request, exc: DBAPIError) -> ORJSONResponse:
+    """Statement timeouts become 504s; any other database error stays a server error"""
+    if is_statement_timeout(exc):
+        return await deadline_exceeded_response(request, exc)
+    raise exc
@@ -0,0 +1,238 @@
+import os
+import re
+import math
+import time
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Admission settings. ADMISSION_MAX_CONCURRENT matches the API engine's pool
+# (SQLAlchemy's default pool_size 5 + max_overflow 10): requests beyond it
+# would only wait inside get_session for a connection.
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "15"))
+ADMISSION_EXPENSIVE_LIMIT = int(os.getenv("ADMISSION_EXPENSIVE_LIMIT", "4"))   # of those, expensive routes
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "64"))           # requests waiting, all classes
+ADMISSION_MAX_WAIT_MS = float(os.getenv("ADMISSION_MAX_WAIT_MS", "1000"))     # deadline for getting a slot
+# CSV uploads mostly stream a body to disk, for as long as the client's link
+# takes: they get their own small limit instead of holding pool slots
+ADMISSION_UPLOAD_LIMIT = int(os.getenv("ADMISSION_UPLOAD_LIMIT", "2"))
+
+# never queued: docs and the root probe
+EXEMPT_PATHS = {"/", "/docs", "/redoc", "/openapi.json"}
+
+
+@dataclass
+class RouteClass:
+    """Requests sharing a concurrency limit; a lower priority is admitted first"""
+    name: str
+    priority: int
+    limit: int
+    pooled: bool = True             # counts against the controller's capacity (the DB pool)
+    active: int = 0
+    service_ms: float = 50.0        # moving average of how long a request holds its slot
+    waiters: deque = field(default_factory=deque)
+
+    def observe(self, elapsed_ms: float) -> None:
+        self.service_ms += (elapsed_ms - self.service_ms) * 0.1
+
+
+class Rejected(Exception):
+    """No slot within the deadline; retry_after is the client's back-off in seconds"""
+
+    def __init__(self, retry_after: int, reason: str):
+        super().__init__(reason)
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class AdmissionController:
+    """
+    A concurrency limit for the whole API plus one per route class, with a
+    bounded wait queue. A freed slot goes to the waiting request of the
+    lowest-priority-number class that is under its own limit, so cheap
+    lookups overtake queued list scans. A request whose estimated wait is
+    past the deadline is rejected at once instead of queueing. CSV uploads
+    are limited on their own, outside that capacity: they hold no pool slot
+    while their body streams to disk.
+    """
+
+    def __init__(self, capacity: int = ADMISSION_MAX_CONCURRENT, expensive_limit: int = ADMISSION_EXPENSIVE_LIMIT,
+                 queue_size: int = ADMISSION_QUEUE_SIZE, max_wait_ms: float = ADMISSION_MAX_WAIT_MS,
+                 upload_limit: int = ADMISSION_UPLOAD_LIMIT):
+        self.capacity = capacity
+        self.queue_size = queue_size
+        self.max_wait = max_wait_ms / 1000
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.cheap = RouteClass("cheap", 0, capacity)
+        self.standard = RouteClass("standard", 1, capacity)
+        self.expensive = RouteClass("expensive", 2, min(expensive_limit, capacity))
+        self.upload = RouteClass("upload", 3, upload_limit, pooled=False)
+        self.classes = [self.cheap, self.standard, self.expensive, self.upload]
+        # (methods, path) -> class; first match wins, anything else is standard
+        self.routes = [
+            ({"GET"}, re.compile(r"^/products/id/[^/]+$"), self.cheap),
+            ({"GET"}, re.compile(r"^/products/facets$"), self.cheap),
+            ({"GET"}, re.compile(r"^/webhooks/url/"), self.cheap),
+            ({"GET"}, re.compile(r"^/products/(all|search|changes)$"), self.expensive),
+            ({"GET"}, re.compile(r"^/webhooks/all$"), self.expensive),
+            ({"DELETE"}, re.compile(r"^/"), self.expensive),
+            ({"POST"}, re.compile(r"^/products/csv(/preview)?$"), self.upload),
+        ]
+
+    def classify(self, method: str, path: str) -> RouteClass:
+        for methods, pattern, route_class in self.routes:
+            if method in methods and pattern.match(path):
+                return route_class
+        return self.standard
+
+    def _can_admit(self, route_class: RouteClass) -> bool:
+        pool_free = self.active < self.capacity or not route_class.pooled
+        return pool_free and route_class.active < route_class.limit
+
+    def _admit(self, route_class: RouteClass) -> None:
+        self.active += route_class.pooled
+        route_class.active += 1
+
+    def _competing(self, route_class: RouteClass) -> list[RouteClass]:
+        """The classes whose waiters go before a new request of this one"""
+        if not route_class.pooled:
+            return [route_class]
+        return [other for other in self.classes if other.pooled and other.priority <= route_class.priority]
+
+    def estimated_wait(self, route_class: RouteClass) -> float:
+        """Seconds until a new request of this class would get a slot"""
+        ahead = sum(len(other.waiters) for other in self._competing(route_class))
+        slots = min(self.capacity, route_class.limit) if route_class.pooled else route_class.limit
+        return (ahead + 1) * route_class.service_ms / 1000 / slots
+
+    def _reject(self, route_class: RouteClass, reason: str) -> Rejected:
+        self.rejected += 1
+        return Rejected(max(1, math.ceil(self.estimated_wait(route_class))), reason)
+
+    async def acquire(self, route_class: RouteClass) -> None:
+        queued_ahead = any(other.waiters for other in self._competing(route_class))
+        if not queued_ahead and self._can_admit(route_class):
+            self._admit(route_class)
+            return
+        if self.waiting >= self.queue_size:
+            raise self._reject(route_class, "queue full")
+        if self.estimated_wait(route_class) > self.max_wait:
+            raise self._reject(route_class, "wait past deadline")
+
+        granted = asyncio.get_running_loop().create_future()
+        route_class.waiters.append(granted)
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(granted), self.max_wait)
+        except BaseException as e:
+            if granted.done() and not granted.cancelled():
+                if isinstance(e, asyncio.TimeoutError):
+                    return  # the slot arrived with the deadline
+                self.release(route_class, 0)  # the client went away holding a slot
+                raise
+            granted.cancel()
+            route_class.waiters.remove(granted)
+            self.waiting -= 1
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._reject(route_class, "deadline") from None
+            raise
+
+    def release(self, route_class: RouteClass, elapsed_ms: float) -> None:
+        self.active -= route_class.pooled
+        route_class.active -= 1
+        if elapsed_ms:
+            route_class.observe(elapsed_ms)
+        # hand free slots to waiters, cheapest class first; a class at its own
+        # limit does not hold up the classes behind it
+        for candidate in self.classes:
+            while candidate.waiters and self._can_admit(candidate):
+                granted = candidate.waiters.popleft()
+                self.waiting -= 1
+                self._admit(candidate)
+                granted.set_result(None)
+
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "active": self.active,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+            "classes": {
+                route_class.name: {
+                    "limit": route_class.limit,
+                    "active": route_class.active,
+                    "waiting": len(route_class.waiters),
+                    "service_ms": round(route_class.service_ms, 1),
+                }
+                for route_class in self.classes
+            },
+        }
+
+
+_controller: AdmissionController | None = None
+
+
+def get_admission_controller() -> AdmissionController:
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController()
+    return _controller
+
+
+def set_admission_controller(controller: AdmissionController | None) -> None:
+    """Use `controller` (tests, benchmarks); None goes back to the settings above"""
+    global _controller
+    _controller = controller
+
+
+class AdmissionMiddleware:
+    """
+    Load shedding in front of the routes: each HTTP request takes a slot of
+    its route class before it can reach get_session, and is answered 503 with
+    Retry-After when no slot frees up within ADMISSION_MAX_WAIT_MS.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ADMISSION_ENABLED or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        controller = get_admission_controller()
+        route_class = controller.classify(scope["method"], scope["path"])
+        try:
+            await controller.acquire(route_class)
+        except Rejected as rejected:
+            await self._unavailable(send, rejected)
+            return
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.release(route_class, (time.perf_counter() - started) * 1000)
+
+    @staticmethod
+    async def _unavailable(send, rejected: Rejected) -> None:
+        body = f'{{"detail":"Server busy ({rejected.reason}), retry later"}}'.encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(rejected.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
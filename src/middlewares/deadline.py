@@ -0,0 +1,36 @@
+import time
+
+from src.deadlines import REQUEST_TIMEOUT_HEADER, request_budget_ms, request_class, request_deadline
+from src.middlewares.admission import get_admission_controller
+
+
+class DeadlineMiddleware:
+    """
+    Starts each HTTP request's clock: the deadline (arrival + budget) is kept
+    in a context variable that sessions read whenever they begin a
+    transaction, so time spent queueing for admission counts too.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route_class = get_admission_controller().classify(scope["method"], scope["path"]).name
+        header = None
+        for name, value in scope.get("headers", []):
+            if name == REQUEST_TIMEOUT_HEADER.encode():
+                header = value.decode("latin-1")
+                break
+        budget_ms = request_budget_ms(header, route_class)
+
+        deadline_token = request_deadline.set(time.monotonic() + budget_ms / 1000)
+        class_token = request_class.set(route_class)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_deadline.reset(deadline_token)
+            request_class.reset(class_token)
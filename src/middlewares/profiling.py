@@ -0,0 +1,308 @@
+import os
+import sys
+import time
+import random
+import asyncio
+import logging
+import threading
+import itertools
+from collections import Counter, deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Profiling settings
+PROFILE_ENABLED = os.getenv("PROFILE_ENABLED", "true").lower() == "true"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0.01"))   # fraction of requests kept at random
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "1000"))           # requests slower than this are always kept
+PROFILE_BUFFER_SIZE = int(os.getenv("PROFILE_BUFFER_SIZE", "100"))      # profiles kept in memory
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "10"))     # stack sampling interval
+PROFILE_HEADER = "x-profile"                                            # "X-Profile: 1" forces a profile
+
+MAX_STATEMENTS = 200   # statements stored per profile (all are counted)
+MAX_STACK_DEPTH = 64
+TOP_STACKS = 25
+
+
+@dataclass
+class QueryLog:
+    """SQL statements executed while the log is active"""
+    statements: list = field(default_factory=list)
+    statement_count: int = 0
+    commits: int = 0
+    sql_ms: float = 0.0
+
+    @property
+    def round_trips(self) -> int:
+        return self.statement_count + self.commits
+
+    def to_dict(self) -> dict:
+        return {
+            "round_trips": self.round_trips,
+            "statement_count": self.statement_count,
+            "commits": self.commits,
+            "sql_ms": round(self.sql_ms, 3),
+            "statements": self.statements,
+        }
+
+
+@dataclass
+class RequestProfile:
+    method: str
+    path: str
+    forced: bool = False
+    id: int = 0
+    status_code: int | None = None
+    duration_ms: float = 0.0
+    started_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    queries: QueryLog = field(default_factory=QueryLog)
+    stacks: Counter = field(default_factory=Counter)
+    samples: int = 0
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status_code": self.status_code,
+            "duration_ms": round(self.duration_ms, 3),
+            "sql_ms": round(self.queries.sql_ms, 3),
+            "round_trips": self.queries.round_trips,
+            "samples": self.samples,
+            "forced": self.forced,
+            "started_at": self.started_at,
+        }
+
+    def to_dict(self) -> dict:
+        data = self.summary()
+        data["queries"] = self.queries.to_dict()
+        data["stacks"] = [
+            {"stack": stack, "samples": count}
+            for stack, count in self.stacks.most_common(TOP_STACKS)
+        ]
+        return data
+
+
+_current_queries: ContextVar[Optional[QueryLog]] = ContextVar("current_queries", default=None)
+
+
+# SQL capture: listeners on the Engine class see every engine, including the
+# sync engine behind create_async_engine, and only record while a log is active.
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_queries.get() is not None:
+        conn.info.setdefault("_profile_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    log = _current_queries.get()
+    if log is None:
+        return
+    started = conn.info.get("_profile_started")
+    if not started:
+        return
+    elapsed_ms = (time.perf_counter() - started.pop()) * 1000
+    log.statement_count += 1
+    log.sql_ms += elapsed_ms
+    if len(log.statements) < MAX_STATEMENTS:
+        log.statements.append({
+            "sql": statement,
+            "duration_ms": round(elapsed_ms, 3),
+            "executemany": executemany,
+        })
+
+
+@event.listens_for(Engine, "commit")
+def _on_commit(conn):
+    log = _current_queries.get()
+    if log is not None:
+        log.commits += 1
+
+
+class _QueryCapture:
+    def __init__(self, log: QueryLog):
+        self.log = log
+        self._token = None
+
+    def __enter__(self) -> QueryLog:
+        self._token = _current_queries.set(self.log)
+        return self.log
+
+    def __exit__(self, *exc):
+        _current_queries.reset(self._token)
+
+
+def capture_queries(log: QueryLog | None = None) -> _QueryCapture:
+    """Record SQL statements executed in the current context"""
+    return _QueryCapture(log or QueryLog())
+
+
+class ProfileBuffer:
+    """Bounded ring buffer of finished profiles, newest last"""
+
+    def __init__(self, maxlen: int):
+        self._items: deque[RequestProfile] = deque(maxlen=maxlen)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def add(self, profile: RequestProfile) -> None:
+        with self._lock:
+            profile.id = next(self._ids)
+            self._items.append(profile)
+
+    def list(self, limit: int = 50) -> list[RequestProfile]:
+        with self._lock:
+            items = list(self._items)
+        return items[::-1][:limit]
+
+    def get(self, profile_id: int) -> RequestProfile | None:
+        with self._lock:
+            for profile in self._items:
+                if profile.id == profile_id:
+                    return profile
+        return None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+profile_buffer = ProfileBuffer(PROFILE_BUFFER_SIZE)
+
+
+class StackSampler:
+    """
+    Samples the event loop thread's stack on a background thread while any
+    profiled request is in flight. Requests share the loop, so each sample is
+    credited to every request that was active when it was taken. Samples are
+    credited under the lock, and only while the request is active: once
+    stop() returns, the profile's stacks no longer change.
+    """
+
+    def __init__(self, interval_ms: float):
+        self.interval = interval_ms / 1000
+        self._active: dict[int, tuple[int, RequestProfile]] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._active[id(profile)] = (threading.get_ident(), profile)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def stop(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._active.pop(id(profile), None)
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                active = list(self._active.values())
+            if not active:
+                self._wakeup.clear()
+                self._wakeup.wait()
+                continue
+
+            frames = sys._current_frames()
+            collapsed: dict[int, str] = {}
+            for thread_id, _ in active:
+                if thread_id not in collapsed:
+                    frame = frames.get(thread_id)
+                    collapsed[thread_id] = _collapse(frame) if frame is not None else "<no frame>"
+            del frames
+            with self._lock:
+                for thread_id, profile in active:
+                    if id(profile) in self._active:
+                        profile.stacks[collapsed[thread_id]] += 1
+                        profile.samples += 1
+            time.sleep(self.interval)
+
+
+def _collapse(frame) -> str:
+    """Render a frame chain as a root-first 'file:function;...' string"""
+    parts = []
+    while frame is not None and len(parts) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    parts.reverse()
+    return ";".join(parts)
+
+
+stack_sampler = StackSampler(PROFILE_INTERVAL_MS)
+
+
+class ProfilingMiddleware:
+    """
+    Profiles HTTP requests. A configurable fraction of requests is sampled,
+    requests slower than PROFILE_SLOW_MS are always kept and an "X-Profile: 1"
+    header forces a profile for a single call. Kept profiles are stored in
+    profile_buffer and browsable under /admin/profiles.
+
+    Whether to sample is decided up front, so the stack sampler only runs for
+    sampled and forced requests; any other request has its SQL recorded and
+    its stacks sampled from the moment it passes PROFILE_SLOW_MS.
+    """
+
+    def __init__(self, app, enabled: bool = PROFILE_ENABLED, sample_rate: float = PROFILE_SAMPLE_RATE,
+                 slow_ms: float = PROFILE_SLOW_MS, buffer: ProfileBuffer = profile_buffer,
+                 sampler: StackSampler = stack_sampler):
+        self.app = app
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.buffer = buffer
+        self.sampler = sampler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        forced = any(
+            name == PROFILE_HEADER.encode() and value not in (b"", b"0", b"false")
+            for name, value in scope.get("headers", [])
+        )
+        profile = RequestProfile(method=scope["method"], path=scope["path"], forced=forced)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile.status_code = message["status"]
+            await send(message)
+
+        sampled = forced or random.random() < self.sample_rate
+        slow_timer = None
+        start = time.perf_counter()
+        if sampled:
+            self.sampler.start(profile)
+        else:
+            slow_timer = asyncio.get_running_loop().call_later(self.slow_ms / 1000, self.sampler.start, profile)
+        try:
+            with capture_queries(profile.queries):
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            if slow_timer is not None:
+                slow_timer.cancel()
+            self.sampler.stop(profile)
+            profile.duration_ms = (time.perf_counter() - start) * 1000
+            if sampled or profile.duration_ms >= self.slow_ms:
+                self.buffer.add(profile)
+                if profile.duration_ms >= self.slow_ms:
+                    logger.warning(
+                        f"🐢 Slow request {profile.method} {profile.path}: {profile.duration_ms:.0f}ms, "
+                        f"{profile.queries.round_trips} round trips, {profile.queries.sql_ms:.0f}ms in SQL "
+                        f"(profile {profile.id})"
+                    )
@@ -0,0 +1,31 @@
+import math
+import time
+
+from src.database import RECENT_WRITE_COOKIE, REPLICA_MAX_LAG_SECONDS
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+class RecentWriteMiddleware:
+    """
+    Marks clients that just wrote: a successful write response sets a cookie
+    holding the write time, and get_read_session sends that client's reads to
+    the primary until the replica is guaranteed to have caught up.
+    """
+
+    def __init__(self, app, max_lag_seconds: float = REPLICA_MAX_LAG_SECONDS):
+        self.app = app
+        self.max_age = max(1, math.ceil(max_lag_seconds))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in WRITE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                cookie = f"{RECENT_WRITE_COOKIE}={time.time():.3f}; Max-Age={self.max_age}; Path=/; HttpOnly; SameSite=Lax"
+                message["headers"] = [*message.get("headers", []), (b"set-cookie", cookie.encode())]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,132 @@
+import os
+import time
+import logging
+
+import orjson
+from dotenv import load_dotenv
+
+from src.products.model import Product
+from src.redis import RedisClient
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# SKU lookup cache in front of GET /products/id/{sku}. Each entry records
+# when the read behind it started ("as of"); writes stamp the SKU (single
+# product writes) or the whole tenant (ingest, delete-all, tenant drop) with
+# the time they committed, and an entry older than either stamp is a miss.
+# So a fill racing a write, or read from a lagging replica, can never be
+# served after the write. Stamps expire with the entry TTL, by which time
+# every entry they invalidate has expired too. Lookups also count per-SKU hits
+# in windows, which the post-ingest pre-warm ranks by. The API-side helpers
+# fail open: without Redis, lookups simply go to the database.
+SKU_CACHE_ENABLED = os.getenv("SKU_CACHE_ENABLED", "true").lower() == "true"
+SKU_CACHE_TTL_SECONDS = int(os.getenv("SKU_CACHE_TTL_SECONDS", "600"))
+SKU_ACCESS_WINDOW_SECONDS = int(os.getenv("SKU_ACCESS_WINDOW_SECONDS", "3600"))
+
+
+def _entry_key(organization: str, sku: str) -> str:
+    return f"sku:{organization}:{sku.lower()}"   # SKUs are case-insensitive (CITEXT / NOCASE)
+
+
+def _stamp_key(organization: str, sku: str | None = None) -> str:
+    return f"sku:written:{organization}" if sku is None else f"sku:written:{organization}:{sku.lower()}"
+
+
+def _hits_key(organization: str, window: int) -> str:
+    return f"sku:hits:{organization}:{window}"
+
+
+def _window() -> int:
+    return int(time.time() // SKU_ACCESS_WINDOW_SECONDS)
+
+
+def product_entry(product: Product) -> dict:
+    """The JSON the lookup endpoint returns for `product`"""
+    return product.model_dump(mode="json")
+
+
+def entry_etag(entry: dict) -> str:
+    return f'"{entry["id"]}.{entry["version"]}"'   # same as product_etag
+
+
+async def cached_product(redis: RedisClient, organization: str, sku: str) -> tuple[bool, dict | None]:
+    """
+    One round trip: the SKU's entry unless a write stamped after its read,
+    plus a hit on the access statistics. (False, None) when Redis is
+    unavailable, so the caller does not try to fill the cache either.
+    """
+    window = _window()
+    pipe = redis.pipeline()
+    pipe.mget([_entry_key(organization, sku), _stamp_key(organization), _stamp_key(organization, sku)])
+    pipe.zincrby(_hits_key(organization, window), 1, sku.lower())
+    pipe.expire(_hits_key(organization, window), 2 * SKU_ACCESS_WINDOW_SECONDS)
+    try:
+        (cached, *stamps), _, _ = await pipe.execute()
+    except Exception as e:
+        logger.warning(f"⚠️ SKU cache unavailable: {e}")
+        return False, None
+    if cached is None:
+        return True, None
+    cached = orjson.loads(cached)
+    if any(stamp is not None and cached["as_of"] <= float(stamp) for stamp in stamps):
+        return True, None
+    return True, cached["product"]
+
+
+async def cache_products(redis: RedisClient, organization: str, entries: list[dict], as_of: float) -> int:
+    """Store lookup entries read at `as_of` (epoch seconds) in one pipeline; returns how many"""
+    pipe = redis.pipeline()
+    for entry in entries:
+        value = orjson.dumps({"as_of": as_of, "product": entry}).decode()
+        pipe.set(_entry_key(organization, entry["sku"]), value, ex=SKU_CACHE_TTL_SECONDS)
+    return sum(await pipe.execute())
+
+
+async def fill_cache(redis: RedisClient, organization: str, entry: dict, as_of: float) -> None:
+    """Read-through fill after a miss"""
+    try:
+        await cache_products(redis, organization, [entry], as_of)
+    except Exception as e:
+        logger.warning(f"⚠️ SKU cache fill failed: {e}")
+
+
+async def _stamp(redis: RedisClient, organization: str, skus: tuple[str, ...]) -> None:
+    now = time.time()
+    pipe = redis.pipeline()
+    if skus:
+        pipe.delete(*(_entry_key(organization, sku) for sku in skus))
+    for key in [_stamp_key(organization, sku) for sku in skus] or [_stamp_key(organization)]:
+        pipe.set(key, now, ex=SKU_CACHE_TTL_SECONDS)
+    try:
+        await pipe.execute()
+    except Exception as e:
+        logger.warning(f"⚠️ SKU cache invalidation failed, entries expire in {SKU_CACHE_TTL_SECONDS}s: {e}")
+
+
+async def invalidate_skus(redis: RedisClient, organization: str, *skus: str) -> None:
+    """After a committed write of these SKUs"""
+    await _stamp(redis, organization, skus)
+
+
+async def invalidate_organization(redis: RedisClient, organization: str) -> None:
+    """After a committed write to any number of the tenant's products"""
+    await _stamp(redis, organization, ())
+
+
+async def hot_skus(redis: RedisClient, organization: str, limit: int) -> list[str]:
+    """
+    The tenant's most looked-up SKUs: hits in the current window plus half
+    the hits of the previous one, so the ranking does not reset on the hour.
+    """
+    window = _window()
+    pipe = redis.pipeline()
+    pipe.zrevrange(_hits_key(organization, window), 0, limit - 1, withscores=True)
+    pipe.zrevrange(_hits_key(organization, window - 1), 0, limit - 1, withscores=True)
+    current, previous = await pipe.execute()
+    scores: dict[str, float] = {}
+    for sku, hits in previous:
+        scores[sku] = hits / 2
+    for sku, hits in current:
+        scores[sku] = scores.get(sku, 0) + hits
+    return sorted(scores, key=scores.get, reverse=True)[:limit]
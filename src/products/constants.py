@@ -0,0 +1,37 @@
+import os
+from pathlib import Path
+
+# CSV uploads land here; the worker moves them to processed/ or errors/ next to it
+UPLOADS_DIR = Path(__file__).parent.parent.parent / "uploads" / "csv"
+PROCESSED_DIR = UPLOADS_DIR / "processed"
+
+# CSV preview: bytes read from the head of an upload, and sample rows returned
+CSV_PREVIEW_DEFAULT_KB = 64
+CSV_PREVIEW_MAX_KB = 1024
+CSV_PREVIEW_DEFAULT_SAMPLE = 10
+CSV_PREVIEW_MAX_SAMPLE = 100
+
+# Search
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+SEARCH_MAX_QUERY_LENGTH = 200
+
+# Listing: whitelisted sort keys ("-" prefix sorts descending)
+PRODUCT_SORT_KEYS = ("id", "sku", "name")
+
+# DELETE /products/all: rows deleted per transaction
+DELETE_ALL_BATCH_SIZE = int(os.getenv("DELETE_ALL_BATCH_SIZE", "5000"))
+
+# Change feed: rows younger than the settle window are held back, so a slow
+# transaction that took a lower seq cannot commit behind a client's cursor.
+# Seqs are stamped at write time, not commit time, so this only holds while
+# every transaction writing products commits within CHANGES_MAX_WRITE_SECONDS
+# of its first write: their statements run with statement_timeout set to what
+# is left of it (service.limit_write_transaction)
+CHANGES_SETTLE_SECONDS = float(os.getenv("CHANGES_SETTLE_SECONDS", "5"))
+CHANGES_MAX_WRITE_SECONDS = float(os.getenv("CHANGES_MAX_WRITE_SECONDS", "4"))
+if CHANGES_MAX_WRITE_SECONDS >= CHANGES_SETTLE_SECONDS:
+    raise ValueError("CHANGES_MAX_WRITE_SECONDS must be below CHANGES_SETTLE_SECONDS")
+CHANGES_DEFAULT_LIMIT = 10_000
+CHANGES_MAX_LIMIT = 100_000
+CHANGES_PAGE_SIZE = 1000  # rows fetched per query while streaming
@@ -0,0 +1,237 @@
+from sqlalchemy import DDL, PrimaryKeyConstraint, Table, event
+from sqlalchemy.ext.compiler import compiles
+
+from src.tenancy import DEFAULT_ORGANIZATION, partition_name, validate_organization
+
+# Tenant partitioning. On Postgres product is LIST-partitioned by organization,
+# one partition per tenant, so tenant queries prune to one partition and a
+# tenant's catalog is dropped by detaching its partition. Postgres requires the
+# partition key in the primary key; the ORM keeps identifying rows by id alone
+# (ids come from one sequence, so they stay unique across partitions).
+PARTITION_KEY = "organization"
+PG_PARTITION_BY = f"LIST ({PARTITION_KEY})"
+
+
+@compiles(PrimaryKeyConstraint, "postgresql")
+def compile_partitioned_primary_key_pg(constraint, compiler, **kw):
+    partition_key = constraint.table.info.get("partition_key")
+    ddl = compiler.visit_primary_key_constraint(constraint, **kw)
+    if not partition_key or partition_key in constraint.columns:
+        return ddl
+    return ddl.replace("PRIMARY KEY (", f"PRIMARY KEY ({compiler.preparer.quote(partition_key)}, ", 1)
+
+
+def create_partition_sql(organization: str) -> str:
+    """DDL for `organization`'s partition of product (idempotent)"""
+    validate_organization(organization)  # the value is inlined into the bound
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(organization)} "
+        f"PARTITION OF product FOR VALUES IN ('{organization}')"
+    )
+
+
+def register_partition_ddl(table: Table) -> None:
+    """Create the default organization's partition along with `table` (Postgres)"""
+    event.listen(table, "after_create", DDL(create_partition_sql(DEFAULT_ORGANIZATION)).execute_if(dialect="postgresql"))
+
+
+# Search document for Postgres full-text search. The GIN index is built on this
+# exact expression, so queries must use it verbatim for the planner to match it.
+PG_SEARCH_DOCUMENT = (
+    "(setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B'))"
+)
+
+# Index DDL shared by create_all and the Alembic migration (which adds CONCURRENTLY)
+PG_SEARCH_INDEXES = {
+    "ix_product_search_document": f"ON product USING GIN ({PG_SEARCH_DOCUMENT})",
+    "ix_product_name_trgm": "ON product USING GIN (name gin_trgm_ops)",
+    "ix_product_sku_trgm": "ON product USING GIN ((sku::text) gin_trgm_ops)",
+}
+
+# SQLite fallback: an external-content FTS5 table over product kept in sync by
+# triggers. The trigram tokenizer gives case-insensitive substring matching,
+# the closest local stand-in for tsvector plus pg_trgm.
+SQLITE_SEARCH_TABLE = "product_search"
+
+SQLITE_SEARCH_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_SEARCH_TABLE} USING fts5("
+    "name, sku, description, content='product', content_rowid='id', tokenize='trigram')",
+    f"""CREATE TRIGGER IF NOT EXISTS product_search_ai AFTER INSERT ON product BEGIN
+        INSERT INTO {SQLITE_SEARCH_TABLE}(rowid, name, sku, description)
+        VALUES (new.id, new.name, new.sku, new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS product_search_ad AFTER DELETE ON product BEGIN
+        INSERT INTO {SQLITE_SEARCH_TABLE}({SQLITE_SEARCH_TABLE}, rowid, name, sku, description)
+        VALUES ('delete', old.id, old.name, old.sku, old.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS product_search_au AFTER UPDATE OF name, sku, description ON product BEGIN
+        INSERT INTO {SQLITE_SEARCH_TABLE}({SQLITE_SEARCH_TABLE}, rowid, name, sku, description)
+        VALUES ('delete', old.id, old.name, old.sku, old.description);
+        INSERT INTO {SQLITE_SEARCH_TABLE}(rowid, name, sku, description)
+        VALUES (new.id, new.name, new.sku, new.description);
+    END""",
+]
+
+
+def register_search_ddl(table: Table) -> None:
+    """Create the search indexes (Postgres) or FTS5 table (SQLite) along with `table`"""
+    event.listen(table, "after_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"))
+    for name, definition in PG_SEARCH_INDEXES.items():
+        event.listen(table, "after_create", DDL(f"CREATE INDEX IF NOT EXISTS {name} {definition}").execute_if(dialect="postgresql"))
+    for statement in SQLITE_SEARCH_DDL:
+        event.listen(table, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+    event.listen(table, "before_drop", DDL(f"DROP TABLE IF EXISTS {SQLITE_SEARCH_TABLE}").execute_if(dialect="sqlite"))
+
+
+# Status facet counts. Triggers append signed deltas to product_status_delta and
+# readers sum them, so concurrent writers never queue on one hot counter row.
+# Soft-deleted products (deleted_at set) are not counted.
+# compact_status_counts() folds the deltas back to one row per tenant and status.
+STATUS_DELTA_TABLE = "product_status_delta"
+
+# Postgres: statement-level triggers with transition tables, one delta row per
+# tenant and status per statement (a 1000-row ingest batch adds one row, not 1000)
+PG_STATUS_COUNT_DDL = [
+    f"""CREATE OR REPLACE FUNCTION product_status_count_insert() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO {STATUS_DELTA_TABLE} (organization, status, delta)
+        SELECT organization, status, count(*) FROM new_rows WHERE deleted_at IS NULL GROUP BY organization, status;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    f"""CREATE OR REPLACE FUNCTION product_status_count_delete() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO {STATUS_DELTA_TABLE} (organization, status, delta)
+        SELECT organization, status, -count(*) FROM old_rows WHERE deleted_at IS NULL GROUP BY organization, status;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    f"""CREATE OR REPLACE FUNCTION product_status_count_update() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO {STATUS_DELTA_TABLE} (organization, status, delta)
+        SELECT organization, status, sum(delta) FROM (
+            SELECT organization, status, count(*) AS delta FROM new_rows WHERE deleted_at IS NULL GROUP BY organization, status
+            UNION ALL
+            SELECT organization, status, -count(*) AS delta FROM old_rows WHERE deleted_at IS NULL GROUP BY organization, status
+        ) AS changes
+        GROUP BY organization, status HAVING sum(delta) <> 0;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    "CREATE OR REPLACE TRIGGER product_status_count_ai AFTER INSERT ON product "
+    "REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION product_status_count_insert()",
+    "CREATE OR REPLACE TRIGGER product_status_count_ad AFTER DELETE ON product "
+    "REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION product_status_count_delete()",
+    "CREATE OR REPLACE TRIGGER product_status_count_au AFTER UPDATE ON product "
+    "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION product_status_count_update()",
+]
+
+# SQLite has a single writer, so each tenant and status simply keeps one running row
+_SQLITE_BUMP = (
+    f"INSERT INTO {STATUS_DELTA_TABLE} (id, organization, status, delta) "
+    f"SELECT (SELECT id FROM {STATUS_DELTA_TABLE} WHERE organization = {{row}}.organization AND status = {{row}}.status "
+    f"ORDER BY id LIMIT 1), {{row}}.organization, {{row}}.status, {{delta}} WHERE {{row}}.deleted_at IS NULL "
+    "ON CONFLICT (id) DO UPDATE SET delta = delta + excluded.delta;"
+)
+SQLITE_STATUS_COUNT_DDL = [
+    f"""CREATE TRIGGER IF NOT EXISTS product_status_count_ai AFTER INSERT ON product BEGIN
+        {_SQLITE_BUMP.format(row="new", delta=1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS product_status_count_ad AFTER DELETE ON product BEGIN
+        {_SQLITE_BUMP.format(row="old", delta=-1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS product_status_count_au AFTER UPDATE OF status, organization, deleted_at ON product
+    WHEN old.status IS NOT new.status OR old.organization IS NOT new.organization OR old.deleted_at IS NOT new.deleted_at BEGIN
+        {_SQLITE_BUMP.format(row="old", delta=-1)}
+        {_SQLITE_BUMP.format(row="new", delta=1)}
+    END""",
+]
+
+
+def register_status_count_ddl(table: Table) -> None:
+    """Install the status facet triggers along with `table`"""
+    for statement in PG_STATUS_COUNT_DDL:
+        event.listen(table, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+    for statement in SQLITE_STATUS_COUNT_DDL:
+        event.listen(table, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
+
+# Change feed. Every insert, real update and delete of a product takes the next
+# value of one change sequence: products carry it in change_seq, deletes leave a
+# tombstone with it. updated_at is the write's wall-clock time (not the
+# transaction start), so seq order and updated_at order agree. Updates that
+# change no content column keep their stamp, so re-ingesting an unchanged feed
+# adds nothing to the change feed; a soft delete (deleted_at) is a change. The same triggers bump product.version,
+# which backs ETags and If-Match compare-and-swap updates.
+TOMBSTONE_TABLE = "product_tombstone"
+# per tenant, the highest change_seq whose tombstone was purged (see purge_tombstones)
+CHANGE_HORIZON_TABLE = "product_change_horizon"
+# per ingest run, the SKUs a full snapshot listed (see CsvIngest)
+INGEST_SEEN_TABLE = "ingest_seen_sku"
+CHANGE_SEQUENCE = "product_change_seq"
+PRODUCT_CONTENT_COLUMNS = ("name", "sku", "description", "status", "deleted_at")
+
+PG_CHANGE_FEED_DDL = [
+    f"CREATE SEQUENCE IF NOT EXISTS {CHANGE_SEQUENCE}",
+    f"""CREATE OR REPLACE FUNCTION product_change_stamp() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND OLD.change_seq IS NOT NULL AND ROW({", ".join(f"NEW.{c}" for c in PRODUCT_CONTENT_COLUMNS)})
+                IS NOT DISTINCT FROM ROW({", ".join(f"OLD.{c}" for c in PRODUCT_CONTENT_COLUMNS)}) THEN
+            NEW.change_seq := OLD.change_seq;
+            NEW.updated_at := OLD.updated_at;
+            NEW.version := OLD.version;
+            RETURN NEW;
+        END IF;
+        IF TG_OP = 'UPDATE' THEN
+            NEW.version := OLD.version + 1;
+        END IF;
+        NEW.change_seq := nextval('{CHANGE_SEQUENCE}');
+        NEW.updated_at := clock_timestamp();
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql""",
+    f"""CREATE OR REPLACE FUNCTION product_change_tombstone() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO {TOMBSTONE_TABLE} (change_seq, organization, product_id, sku, deleted_at)
+        VALUES (nextval('{CHANGE_SEQUENCE}'), OLD.organization, OLD.id, OLD.sku, clock_timestamp());
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    "CREATE OR REPLACE TRIGGER product_change_stamp BEFORE INSERT OR UPDATE ON product "
+    "FOR EACH ROW EXECUTE FUNCTION product_change_stamp()",
+    "CREATE OR REPLACE TRIGGER product_change_tombstone AFTER DELETE ON product "
+    "FOR EACH ROW EXECUTE FUNCTION product_change_tombstone()",
+]
+
+# SQLite cannot assign NEW in a trigger and has no sequences: a one-row counter
+# table stands in for the sequence and AFTER triggers stamp the row in place
+SQLITE_CHANGE_COUNTER = "product_change_counter"
+_SQLITE_NEXT_SEQ = f"UPDATE {SQLITE_CHANGE_COUNTER} SET value = value + 1;"
+_SQLITE_CURRENT_SEQ = f"(SELECT value FROM {SQLITE_CHANGE_COUNTER})"
+_SQLITE_NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+_SQLITE_STAMP = (
+    f"UPDATE product SET change_seq = {_SQLITE_CURRENT_SEQ}, updated_at = {_SQLITE_NOW}{{version}} WHERE id = new.id;"
+)
+SQLITE_CHANGE_FEED_DDL = [
+    f"CREATE TABLE IF NOT EXISTS {SQLITE_CHANGE_COUNTER} (value INTEGER NOT NULL)",
+    f"INSERT INTO {SQLITE_CHANGE_COUNTER} (value) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM {SQLITE_CHANGE_COUNTER})",
+    f"""CREATE TRIGGER IF NOT EXISTS product_change_ai AFTER INSERT ON product BEGIN
+        {_SQLITE_NEXT_SEQ}
+        {_SQLITE_STAMP.format(version="")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS product_change_au AFTER UPDATE OF {", ".join(PRODUCT_CONTENT_COLUMNS)} ON product
+    WHEN {" OR ".join(f"old.{c} IS NOT new.{c}" for c in PRODUCT_CONTENT_COLUMNS)} BEGIN
+        {_SQLITE_NEXT_SEQ}
+        {_SQLITE_STAMP.format(version=", version = old.version + 1")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS product_change_ad AFTER DELETE ON product BEGIN
+        {_SQLITE_NEXT_SEQ}
+        INSERT INTO {TOMBSTONE_TABLE} (change_seq, organization, product_id, sku, deleted_at)
+        VALUES ({_SQLITE_CURRENT_SEQ}, old.organization, old.id, old.sku, {_SQLITE_NOW});
+    END""",
+]
+
+
+def register_change_feed_ddl(table: Table) -> None:
+    """Install the change sequence, stamping and tombstone triggers along with `table`"""
+    for statement in PG_CHANGE_FEED_DDL:
+        event.listen(table, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+    for statement in SQLITE_CHANGE_FEED_DDL:
+        event.listen(table, "after_create", DDL(statement.replace("%", "%%")).execute_if(dialect="sqlite"))
+    event.listen(table, "before_drop", DDL(f"DROP TABLE IF EXISTS {SQLITE_CHANGE_COUNTER}").execute_if(dialect="sqlite"))
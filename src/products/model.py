@@ -1,13 +1,88 @@
+from datetime import datetime
 from sqlmodel import SQLModel, Field
-from sqlalchemy import Column
+from sqlalchemy import BigInteger, Column, DateTime, Index, func, text
 from sqlalchemy.dialects.postgresql import CITEXT
+from src.products.ddl import (
+    CHANGE_HORIZON_TABLE, INGEST_SEEN_TABLE, PARTITION_KEY, PG_PARTITION_BY, STATUS_DELTA_TABLE, TOMBSTONE_TABLE,
+    register_change_feed_ddl, register_partition_ddl, register_search_ddl, register_status_count_ddl,
+)
+from src.tenancy import DEFAULT_ORGANIZATION
 class Product(SQLModel, table=True):
+    __table_args__ = (
+        # case-insensitive (CITEXT) SKU, unique per tenant; ingest upserts on it
+        Index("ux_product_sku", "organization", "sku", unique=True),
+        # listing filters / sort keys (see PRODUCT_SORT_KEYS), tenant first
+        Index("ix_product_status_id", "organization", "status", "id"),
+        Index("ix_product_status_sku", "organization", "status", "sku"),
+        Index("ix_product_status_name", "organization", "status", "name", "id"),
+        Index("ix_product_name", "organization", "name", "id"),
+        Index("ix_product_change_seq", "organization", "change_seq"),
+        {"postgresql_partition_by": PG_PARTITION_BY, "info": {"partition_key": PARTITION_KEY}},
+    )
 
     id: int | None = Field(default=None, primary_key=True)
+    # tenant and partition key (see src/tenancy.py); writers that predate
+    # tenancy land in the default organization
+    organization: str = Field(default=DEFAULT_ORGANIZATION, sa_column_kwargs={"server_default": DEFAULT_ORGANIZATION})
     name: str
     sku: str = Field(sa_column=Column(CITEXT, unique=False))
     description: str | None = None
     status: str = "active"  # e.g., active, inactive
+    # change feed: stamped by database triggers on every real insert/update
+    updated_at: datetime | None = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), server_default=func.now())
+    )
+    change_seq: int | None = Field(default=None, sa_column=Column(BigInteger))
+    # bumped by the same triggers on every content change; the ETag is built from it
+    version: int = Field(default=1, sa_column_kwargs={"server_default": text("1")})
+    # hash of the upserted fields (see product_content_hash); ingest skips rows whose hash matches
+    content_hash: str | None = None
+    # set when a full-snapshot ingest no longer lists the SKU; hidden from reads until re-imported
+    deleted_at: datetime | None = Field(default=None, sa_column=Column(DateTime(timezone=True)))
 
 
+# Status facet counts as signed deltas, written only by triggers on product
+class ProductStatusDelta(SQLModel, table=True):
+    __tablename__ = STATUS_DELTA_TABLE
 
+    id: int | None = Field(default=None, primary_key=True)
+    organization: str = DEFAULT_ORGANIZATION
+    status: str
+    delta: int
+
+
+# Deleted products, written only by the delete trigger; change_seq shares the
+# sequence with Product.change_seq so the feed can merge both in order
+class ProductTombstone(SQLModel, table=True):
+    __tablename__ = TOMBSTONE_TABLE
+
+    change_seq: int = Field(sa_column=Column(BigInteger, primary_key=True, autoincrement=False))
+    organization: str = Field(default=DEFAULT_ORGANIZATION, index=True)
+    product_id: int
+    sku: str
+    deleted_at: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False))
+
+
+# Written only by the tombstone purge: a change-feed cursor below purged_seq
+# may have missed deletes that no longer exist, so its client must resync
+class ProductChangeHorizon(SQLModel, table=True):
+    __tablename__ = CHANGE_HORIZON_TABLE
+
+    organization: str = Field(primary_key=True)
+    purged_seq: int = Field(sa_column=Column(BigInteger, nullable=False))
+
+
+# Scratch rows of a running snapshot ingest, one per SKU the file lists, so the
+# soft delete of the rest is a join in the database; removed when the run ends
+class IngestSeenSku(SQLModel, table=True):
+    __tablename__ = INGEST_SEEN_TABLE
+
+    run_id: str = Field(primary_key=True)
+    sku: str = Field(sa_column=Column(CITEXT, primary_key=True))
+
+
+# full-text / fuzzy search indexes (Postgres) or FTS5 table (SQLite)
+register_partition_ddl(Product.__table__)
+register_search_ddl(Product.__table__)
+register_status_count_ddl(Product.__table__)
+register_change_feed_ddl(Product.__table__)
@@ -1,18 +1,44 @@
 from datetime import datetime
-from fastapi import APIRouter, Depends,WebSocket, WebSocketDisconnect,HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends,WebSocket, WebSocketDisconnect,HTTPException, UploadFile, File, Header, Query, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from sqlmodel import Session
 from pathlib import Path
 import os
 import aiofiles
 import asyncio
 import json
-from src.database import get_session
-from src.products.schemas import ReceiveNumber, ResponseId
+import uuid
+import time
+import orjson
+from src.database import REPLICA_MAX_LAG_SECONDS, get_read_session, get_session, wrote_recently
+from src.tenancy import get_organization
+from src.products.schemas import ReceiveNumber, ResponseId, ProductSearchPage, CsvPreview, CsvPreviewReject
 from .model import Product
-from celery.result import AsyncResult
-from src.tasks.celery_worker import create_task, celery, process_csv_task# Import the Celery task
+from .constants import (
+    UPLOADS_DIR, PROCESSED_DIR, SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT, SEARCH_MAX_QUERY_LENGTH, PRODUCT_SORT_KEYS,
+    CHANGES_DEFAULT_LIMIT, CHANGES_MAX_LIMIT,
+    CSV_PREVIEW_DEFAULT_KB, CSV_PREVIEW_MAX_KB, CSV_PREVIEW_DEFAULT_SAMPLE, CSV_PREVIEW_MAX_SAMPLE,
+)
+from . import constants
+from src.tasks.rejects import rejects_file_path
+from src.tasks.csv_reader import sample_csv
+from src.tasks.throughput import recent_ingest_throughput
+from src.redis import get_redis
+from src.products import cache
+from src.tasks.client import enqueue_ingest  # Celery is imported on first use
+from src.responses import ORJSONResponse, RowsResponse, etag_matches
 from src.products.service import (
-    get_all_products as get_all_products_service,
+    PRODUCT_COLUMNS,
+    product_etag,
+    product_rows_etag,
+    get_all_product_rows as get_all_product_rows_service,
+    product_filters,
+    count_products as count_products_service,
+    get_status_counts as get_status_counts_service,
+    search_products as search_products_service,
+    CHANGE_COLUMNS,
+    get_product_changes as get_product_changes_service,
+    get_change_horizon,
     get_product_by_sku as get_product_by_sku_service,
     create_product as create_product_service,
     delete_product_by_sku as delete_product_by_sku_service,
@@ -25,7 +51,9 @@ router = APIRouter(prefix="/products", tags=["Products"])
 @router.post("/csv", response_model=ResponseId, summary="Upload large CSV file")
 async def upload_products_csv(
     file: UploadFile = File(...),  #  Use UploadFile for proper file handling
-    session: Session = Depends(get_session)
+    snapshot: bool = False,  # the file is the full catalog: SKUs it does not list are soft-deleted
+    dry_run: bool = False,   # validate and count what would change, write nothing
+    organization: str = Depends(get_organization),
 ) -> ResponseId:
     """Upload large CSV file (up to 200MB) for product processing"""
     
@@ -46,8 +74,7 @@ async def upload_products_csv(
             )
         
         # Setup file paths
-        project_root = Path(__file__).parent.parent.parent
-        uploads_dir = project_root / "uploads" / "csv"
+        uploads_dir = UPLOADS_DIR
         uploads_dir.mkdir(parents=True, exist_ok=True)
         
         #  Generate unique filename
@@ -84,8 +111,9 @@ async def upload_products_csv(
                 detail=f"File size mismatch. Expected: {total_size}, Got: {saved_size}"
             )
         
-        #  Start Celery task for processing
-        task = process_csv_task.delay(str(file_path))
+        #  Start Celery task for processing (interactive uploads get priority over scheduled imports)
+        task = enqueue_ingest(str(file_path), organization=organization, interactive=True, snapshot=snapshot,
+                              dry_run=dry_run)
         
         print(f"🚀 Started processing task: {task.id}")
         
@@ -112,38 +140,214 @@ async def upload_products_csv(
 
 
 
+# check a CSV before uploading it: parse only its head and estimate the full run
+@router.post("/csv/preview", response_model=CsvPreview, summary="Preview a CSV file before ingest")
+async def preview_products_csv(
+    file: UploadFile = File(...),
+    max_kb: int = Query(CSV_PREVIEW_DEFAULT_KB, ge=1, le=CSV_PREVIEW_MAX_KB),
+    sample: int = Query(CSV_PREVIEW_DEFAULT_SAMPLE, ge=0, le=CSV_PREVIEW_MAX_SAMPLE),
+    file_size: int | None = Query(None, ge=0),  # full size when only the head of the file is sent
+) -> CsvPreview:
+    """Endpoint to validate the header, detect encoding/delimiter and sample rows of the first max_kb of a CSV"""
+    limit = max_kb * 1024
+    data = await file.read(limit)
+    file_bytes = file_size if file_size is not None else file.size
+    complete = len(data) < limit or (file_bytes is not None and file_bytes <= len(data))
+    if complete:
+        file_bytes = len(data)
+    result = sample_csv(data, complete, sample_size=sample)
+
+    estimated_rows = None
+    if complete:
+        estimated_rows = result.total_rows
+    elif file_bytes and result.total_bytes:
+        estimated_rows = round(result.total_rows * file_bytes / result.total_bytes)
+    try:
+        rows_per_second = await recent_ingest_throughput(get_redis())
+    except Exception as e:
+        print(f"⚠️ Ingest throughput unavailable: {e}")
+        rows_per_second = None
+    estimated_seconds = None
+    if estimated_rows is not None and rows_per_second:
+        estimated_seconds = round(estimated_rows / rows_per_second, 1)
+
+    return CsvPreview(
+        valid=not result.problems,
+        problems=result.problems,
+        encoding=result.encoding,
+        delimiter=result.delimiter,
+        header=result.header,
+        missing_columns=result.missing_columns,
+        unknown_columns=result.unknown_columns,
+        suggestions=result.suggestions,
+        sample_rows=result.rows,
+        sample_rejects=[CsvPreviewReject(row=r.row, reason=r.reason, values=r.values) for r in result.rejects],
+        rejects_by_reason=result.rejects_by_reason,
+        sampled_rows=result.total_rows,
+        sampled_bytes=result.total_bytes,
+        file_bytes=file_bytes,
+        estimated_rows=estimated_rows,
+        rows_per_second=round(rows_per_second, 1) if rows_per_second else None,
+        estimated_seconds=estimated_seconds,
+    )
+
+
+# download the rows an ingest task rejected
+@router.get("/csv/{task_id}/rejects", summary="Download rejected CSV rows")
+async def download_rejects(task_id: str) -> FileResponse:
+    """Endpoint to download the rejected rows (with reason codes) of an ingest task"""
+    try:
+        uuid.UUID(task_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid task id")
+
+    path = rejects_file_path(PROCESSED_DIR, task_id)
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="No rejected rows for this task")
+    return FileResponse(path, media_type="text/csv", filename=f"rejects_{task_id}.csv")
+
 
 # i want to get req to get all products with limit and offset using get request 
 @router.get("/all", response_model=list[Product],summary="Get all products with pagination",)
 async def get_all_products(
     limit: int = 10,
     offset: int = 0,
+    status: str | None = None,
+    sku_prefix: str | None = None,
+    name_contains: str | None = None,
+    sort: str = "id",
+    exact_count: bool = False,
+    if_none_match: str | None = Header(default=None),
+    organization: str = Depends(get_organization),
+    session: Session = Depends(get_read_session)
+) -> RowsResponse:
+    """
+    Endpoint to get all products with pagination, filters and sorting.
+    X-Total-Count carries the total (approximate unless exact_count=true;
+    X-Total-Count-Exact says which). Pages carry a weak ETag; a matching
+    If-None-Match gets 304 without a body.
+    """
+    if sort.lstrip("-") not in PRODUCT_SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"Invalid sort key. Allowed: {', '.join(PRODUCT_SORT_KEYS)} (prefix - for descending)")
+
+    filters = product_filters(organization, status, sku_prefix, name_contains)
+    # row tuples go straight to orjson; response_model only documents the shape
+    rows = await get_all_product_rows_service(session, filters, limit, offset, sort)
+    etag = product_rows_etag(rows)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    total, exact = await count_products_service(session, organization, exact_count, status, sku_prefix, name_contains)
+    return RowsResponse(
+        [column.name for column in PRODUCT_COLUMNS], rows,
+        headers={"X-Total-Count": str(total), "X-Total-Count-Exact": str(exact).lower(), "ETag": etag},
+    )
+
+# status facet counts, maintained incrementally by triggers
+@router.get("/facets", summary="Product counts per status")
+async def get_product_facets(
+    organization: str = Depends(get_organization),
+    session: Session = Depends(get_read_session)
+) -> dict:
+    """Endpoint to get product counts per status"""
+
+    return {"status": await get_status_counts_service(session, organization)}
+
+# search products by name, description and sku (ranked, fuzzy)
+@router.get("/search", response_model=ProductSearchPage, summary="Search products")
+async def search_products(
+    q: str = Query(..., min_length=1, max_length=SEARCH_MAX_QUERY_LENGTH),
+    limit: int = Query(SEARCH_DEFAULT_LIMIT, ge=1, le=SEARCH_MAX_LIMIT),
+    cursor: str | None = None,
+    organization: str = Depends(get_organization),
+    session: Session = Depends(get_read_session)
+) -> ProductSearchPage:
+    """Endpoint to search products; pass next_cursor back as cursor for the next page"""
+
+    rows, next_cursor = await search_products_service(session, organization, q, limit, cursor)
+    return ProductSearchPage(items=[row._asdict() for row in rows], next_cursor=next_cursor)
+
+# change feed for incremental sync: one JSON object per line, in seq order
+@router.get("/changes", summary="Stream product changes since a sequence number")
+async def get_product_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(CHANGES_DEFAULT_LIMIT, ge=1, le=CHANGES_MAX_LIMIT),
+    organization: str = Depends(get_organization),
+    # the primary: a lagging replica may be missing rows below the seqs it already
+    # has, and a client whose cursor passed them would never see them
     session: Session = Depends(get_session)
-) -> list[Product]:
-    """Endpoint to get all products with pagination"""
+) -> StreamingResponse:
+    """
+    Endpoint to stream inserts, updates and deletes after `since` as NDJSON.
+    Each line has op "upsert" or "delete" and its seq; pass the last seq seen
+    as `since` next time. Fewer than `limit` lines means the client is caught up.
+    410 when deletes after `since` were already purged: resync from a full listing.
+    """
+    # since=0 holds no state a purged delete could have left stale
+    if since and since < await get_change_horizon(session, organization):
+        raise HTTPException(status_code=410, detail="Changes after this seq were purged; resync and start over")
+
+    async def stream():
+        after, remaining = since, limit
+        while remaining:
+            rows = await get_product_changes_service(
+                session, organization, after, min(remaining, constants.CHANGES_PAGE_SIZE), constants.CHANGES_SETTLE_SECONDS
+            )
+            for row in rows:
+                yield orjson.dumps(dict(zip(CHANGE_COLUMNS, row))) + b"\n"
+            if len(rows) < constants.CHANGES_PAGE_SIZE:
+                break
+            after, remaining = rows[-1].seq, remaining - len(rows)
 
-    products = await get_all_products_service(session, limit, offset)
-    return products
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
 
 #get product by sku 
 @router.get("/id/{sku}", response_model=Product,summary="Get product by SKU",)
 async def get_product_by_sku_id(
     sku: str,
-    session: Session = Depends(get_session)
+    request: Request,
+    response: Response,
+    if_none_match: str | None = Header(default=None),
+    organization: str = Depends(get_organization),
+    session: Session = Depends(get_read_session),
+    primary: Session = Depends(get_session),  # the same session get_read_session falls back to
 ) -> Product:
-    """Endpoint to get product by SKU"""
+    """Endpoint to get product by SKU; a matching If-None-Match gets 304"""
+
+    # a client that just wrote reads from the primary, so not from the cache either
+    use_cache = cache.SKU_CACHE_ENABLED and not wrote_recently(request)
+    fill = False
+    if use_cache:
+        fill, entry = await cache.cached_product(get_redis(), organization, sku)
+        if entry is not None:
+            etag = cache.entry_etag(entry)
+            if etag_matches(if_none_match, etag):
+                return Response(status_code=304, headers={"ETag": etag})
+            return ORJSONResponse(entry, headers={"ETag": etag})
 
-    product = await get_product_by_sku_service(session, sku)
+    # a replica may be up to REPLICA_MAX_LAG_SECONDS behind what it returns
+    as_of = time.time() - (0 if session is primary else REPLICA_MAX_LAG_SECONDS)
+    product = await get_product_by_sku_service(session, organization, sku)
+    if fill:
+        await cache.fill_cache(get_redis(), organization, cache.product_entry(product), as_of)
+    etag = product_etag(product)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
     return product
 #update product 
 @router.put("/id/{sku}", response_model=Product,summary="Update product by SKU",)
 async def update_product_by_sku(
     sku: str,
     updated_product: Product,
+    response: Response,
+    if_match: str | None = Header(default=None),
+    organization: str = Depends(get_organization),
     session: Session = Depends(get_session)
 ) -> Product:
-    """Endpoint to update product by SKU"""
-    product = await update_product_by_sku_service(session, sku, updated_product)
+    """Endpoint to update product by SKU; with If-Match, 412 if it changed since that ETag"""
+    product = await update_product_by_sku_service(session, organization, sku, updated_product, if_match)
+    await cache.invalidate_skus(get_redis(), organization, sku)
+    response.headers["ETag"] = product_etag(product)
     return product
 
 
@@ -151,33 +355,41 @@ async def update_product_by_sku(
 @router.post("/new", response_model=Product,summary="Create a new product",)
 async def create_product(
     product: Product,
+    response: Response,
+    organization: str = Depends(get_organization),
     session: Session = Depends(get_session)
 ) -> Product:
     """Endpoint to create a new product"""
    
 
-    new_product = await create_product_service(session, product)
+    new_product = await create_product_service(session, organization, product)
+    await cache.invalidate_skus(get_redis(), organization, new_product.sku)  # an upsert may have changed it
+    response.headers["ETag"] = product_etag(new_product)
     return new_product
 
 #delete product by sku
 @router.delete("/id/{sku}", summary="Delete product by SKU",)
 async def delete_product_by_sku(
     sku: str,
+    organization: str = Depends(get_organization),
     session: Session = Depends(get_session)
 ) -> dict:
     """Endpoint to delete product by SKU"""
 
-    await delete_product_by_sku_service(session, sku)
+    await delete_product_by_sku_service(session, organization, sku)
+    await cache.invalidate_skus(get_redis(), organization, sku)
     return {"detail": "Product deleted successfully"}
 
 #delete all products
 @router.delete("/all", summary="Delete all products",)
 async def delete_all_products(
+    organization: str = Depends(get_organization),
     session: Session = Depends(get_session)
 ) -> dict:
     """Endpoint to delete all products"""
   
-    await delete_all_products_service(session)
+    await delete_all_products_service(session.bind, organization)
+    await cache.invalidate_organization(get_redis(), organization)
     return {"detail": "All products deleted successfully"}
 
 
@@ -9,3 +9,40 @@ class ReceiveNumber(SQLModel):
 class ResponseId(SQLModel):
     task_id:str
 
+
+class CsvPreviewReject(SQLModel):
+    row: int | None = None
+    reason: str
+    values: dict
+
+class CsvPreview(SQLModel):
+    valid: bool                      # ingest would accept the file as it is
+    problems: list[str]
+    encoding: str
+    delimiter: str
+    header: list[str]
+    missing_columns: list[str]
+    unknown_columns: list[str]       # ignored by ingest
+    suggestions: dict[str, str]      # expected column -> header column that looks like it
+    sample_rows: list[dict]
+    sample_rejects: list[CsvPreviewReject]
+    rejects_by_reason: dict[str, int]
+    sampled_rows: int
+    sampled_bytes: int
+    file_bytes: int | None = None
+    estimated_rows: int | None = None
+    rows_per_second: float | None = None    # recent ingest throughput
+    estimated_seconds: float | None = None
+
+
+class ProductSearchResult(SQLModel):
+    id: int
+    name: str
+    sku: str
+    description: str | None = None
+    status: str
+    rank: float
+
+class ProductSearchPage(SQLModel):
+    items: list[ProductSearchResult]
+    next_cursor: str | None = None
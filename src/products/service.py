@@ -1,82 +1,459 @@
-# get all products 
-import sqlmodel
-from src.products.model import Product
+from src.deadlines import remaining_ms
+from src.products import constants
+from src.products.model import Product, ProductChangeHorizon, ProductStatusDelta, ProductTombstone
+from src.responses import model_columns, weak_etag
+from src.products.ddl import PG_SEARCH_DOCUMENT, SQLITE_SEARCH_TABLE, create_partition_sql
+from src.tenancy import partition_name
 
 from sqlmodel import select
+from sqlalchemy import Text, and_, case, cast, delete, false, func, literal, null, or_, text, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+from datetime import datetime, timedelta, timezone
+import base64
+import hashlib
+import orjson
+import re
+import time
 
 from fastapi import HTTPException
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
 
-#get all products depending upon limit and offset
-async def get_all_products(session: AsyncSession, limit: int = 10, offset: int = 0) -> list[Product]:
+PRODUCT_COLUMNS = model_columns(Product)
+_ID_INDEX = PRODUCT_COLUMNS.index(Product.__table__.c.id)
+_VERSION_INDEX = PRODUCT_COLUMNS.index(Product.__table__.c.version)
 
-    result = await session.execute(select(Product).limit(limit).offset(offset))
-    products = result.scalars().all()
-    return products
+
+# strong ETag of one product: its id and content version
+def product_etag(product: Product) -> str:
+    return f'"{product.id}.{product.version}"'
+
+# weak ETag of a listing page built from PRODUCT_COLUMNS rows
+def product_rows_etag(rows: list[tuple]) -> str:
+    return weak_etag((row[_ID_INDEX], row[_VERSION_INDEX]) for row in rows)
+
+
+def _like_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+# listing filters; the tenant comes first (partition pruning, index prefix) and
+# ILIKE on Postgres is served by the pg_trgm GIN indexes
+def product_filters(organization: str, status: str | None = None, sku_prefix: str | None = None,
+                    name_contains: str | None = None) -> list:
+    filters = [Product.organization == organization, Product.deleted_at.is_(None)]
+    if status:
+        filters.append(Product.status == status)
+    if sku_prefix:
+        filters.append(cast(Product.sku, Text).ilike(f"{_like_escape(sku_prefix)}%", escape="\\"))
+    if name_contains:
+        filters.append(Product.name.ilike(f"%{_like_escape(name_contains)}%", escape="\\"))
+    return filters
+
+
+def product_order_by(sort: str) -> list:
+    """ORDER BY for a whitelisted sort key; id breaks ties so pages are stable"""
+    column = {"id": Product.id, "sku": Product.sku, "name": Product.name}[sort.lstrip("-")]
+    descending = sort.startswith("-")
+    order = [column.desc() if descending else column.asc()]
+    if column is not Product.id and column is not Product.sku:
+        order.append(Product.id.desc() if descending else Product.id.asc())
+    return order
+
+
+# rows for the list endpoint: plain tuples in Product field order
+async def get_all_product_rows(session: AsyncSession, filters: list, limit: int = 10, offset: int = 0,
+                               sort: str = "id") -> list[tuple]:
+    statement = select(*PRODUCT_COLUMNS).where(*filters).order_by(*product_order_by(sort))
+    result = await session.execute(statement.limit(limit).offset(offset))
+    return result.all()
+
+# status facet counts, summed from the trigger-maintained deltas
+async def get_status_counts(session: AsyncSession, organization: str) -> dict[str, int]:
+    statement = (
+        select(ProductStatusDelta.status, func.sum(ProductStatusDelta.delta))
+        .where(ProductStatusDelta.organization == organization)
+        .group_by(ProductStatusDelta.status)
+        .having(func.sum(ProductStatusDelta.delta) != 0)
+    )
+    result = await session.execute(statement)
+    return {status: int(count) for status, count in result.all()}
+
+# EXPLAIN (FORMAT JSON) of a select whose values stay bound parameters
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return f"EXPLAIN (FORMAT JSON) {compiler.process(element.statement, **kw)}"
+
+# total for a listing: (count, exact). Approximate mode answers from the facet
+# counters when only status is filtered, else from the Postgres planner estimate.
+async def count_products(session: AsyncSession, organization: str, exact: bool = False, status: str | None = None,
+                         sku_prefix: str | None = None, name_contains: str | None = None) -> tuple[int, bool]:
+    filters = product_filters(organization, status, sku_prefix, name_contains)
+    if not exact and not sku_prefix and not name_contains:
+        counts = await get_status_counts(session, organization)
+        return (counts.get(status, 0) if status else sum(counts.values())), True
+
+    statement = select(Product.id).where(*filters)
+    if not exact and session.bind.dialect.name == "postgresql":
+        plan = (await session.execute(Explain(statement))).scalar()
+        return int(plan[0]["Plan"]["Plan Rows"]), False
+
+    result = await session.execute(select(func.count()).select_from(statement.subquery()))
+    return result.scalar_one(), True
+
+# fold the facet deltas back into one row per tenant and status (run periodically)
+async def compact_status_counts(session: AsyncSession) -> int:
+    table = ProductStatusDelta.__table__
+    async with session.begin():
+        if session.bind.dialect.name == "postgresql":
+            # block the triggers' inserts for the swap; readers are not blocked
+            await session.execute(text(f"LOCK TABLE {table.name} IN EXCLUSIVE MODE"))
+        result = await session.execute(
+            select(table.c.organization, table.c.status, func.sum(table.c.delta), func.count())
+            .group_by(table.c.organization, table.c.status)
+        )
+        totals = result.all()
+        await session.execute(table.delete())
+        rows = [
+            {"organization": organization, "status": status, "delta": total}
+            for organization, status, total, _ in totals if total
+        ]
+        if rows:
+            await session.execute(table.insert(), rows)
+    return sum(count for *_, count in totals) - len(rows)
+
+# change feed: upserts and tombstones after `since`, in change_seq order
+CHANGE_COLUMNS = ("seq", "op", "id", "sku", "name", "description", "status", "updated_at")
+
+
+async def get_product_changes(session: AsyncSession, organization: str, since: int, limit: int,
+                              settle_seconds: float = 0) -> list[tuple]:
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settle_seconds)
+    upserts = select(
+        # a soft-deleted product is reported as a delete
+        Product.change_seq.label("seq"), case((Product.deleted_at.is_(None), "upsert"), else_="delete").label("op"),
+        Product.id, Product.sku,
+        Product.name, Product.description, Product.status, Product.updated_at,
+    ).where(Product.organization == organization, Product.change_seq > since, Product.updated_at < cutoff)
+    deletes = select(
+        ProductTombstone.change_seq, literal("delete"), ProductTombstone.product_id, ProductTombstone.sku,
+        null(), null(), null(), ProductTombstone.deleted_at,
+    ).where(
+        ProductTombstone.organization == organization,
+        ProductTombstone.change_seq > since,
+        ProductTombstone.deleted_at < cutoff,
+    )
+    changes = union_all(upserts, deletes).subquery()
+    result = await session.execute(select(changes).order_by(changes.c.seq).limit(limit))
+    return result.all()
+
+
+async def get_change_horizon(session: AsyncSession, organization: str) -> int:
+    """The highest seq whose tombstone was purged; a cursor below it may have missed deletes"""
+    statement = select(ProductChangeHorizon.purged_seq).where(ProductChangeHorizon.organization == organization)
+    return (await session.execute(statement)).scalar() or 0
+
+# a tenant's product by SKU, unless it is soft-deleted
+def _live_product(organization: str, sku: str) -> list:
+    return [Product.organization == organization, Product.sku == sku, Product.deleted_at.is_(None)]
 
 # get product by sku
-async def get_product_by_sku(session: AsyncSession, sku: str) -> Product:
-    statement = select(Product).where(Product.sku == sku)
+async def get_product_by_sku(session: AsyncSession, organization: str, sku: str) -> Product:
+    statement = select(Product).where(*_live_product(organization, sku))
     result = await session.execute(statement)
     product = result.scalars().first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     return product
 
-# create product
-async def create_product(session: AsyncSession, product: Product) -> Product:
+# Hash of the fields an upsert overwrites. Every writer stores it, so ingest can
+# tell unchanged rows apart without comparing the columns themselves.
+PRODUCT_HASH_COLUMNS = ("name", "description", "status")
 
-    product.id = None  # Ensure ID is None for auto-generation
-    # if sku already exists  then update that with its name and descripton
-    statement = select(Product).where(Product.sku == product.sku)
-    result = await session.execute(statement)
-    existing_product = result.scalars().first()
-    if existing_product:
-        existing_product.name = product.name
-        existing_product.description = product.description
-        existing_product.status = product.status
-        session.add(existing_product)
-        await session.commit()
-        await session.refresh(existing_product)
-        return existing_product
-
-    session.add(product)
+
+def product_content_hash(name: str, description: str | None, status: str) -> str:
+    return hashlib.blake2b(orjson.dumps([name, description, status]), digest_size=16).hexdigest()
+
+# upsert keyed on the tenant's unique SKU: a known SKU takes the new name,
+# description and status and is revived if soft-deleted (single-product create
+# and every ingest batch). skip_unchanged leaves rows with the same hash alone.
+def product_insert(dialect: str = "postgresql", skip_unchanged: bool = False):
+    insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+    statement = insert(Product)
+    table = Product.__table__
+    return statement.on_conflict_do_update(
+        index_elements=[Product.organization, Product.sku],
+        set_={
+            "name": statement.excluded.name,
+            "description": statement.excluded.description,
+            "status": statement.excluded.status,
+            "content_hash": statement.excluded.content_hash,
+            "deleted_at": None,
+        },
+        where=or_(
+            table.c.content_hash.is_distinct_from(statement.excluded.content_hash),
+            table.c.deleted_at.is_not(None),
+        ) if skip_unchanged else None,
+    )
+
+# SQLite evaluates RETURNING before its AFTER triggers stamp the row, so the
+# stamped columns are read back there (in-process, no network round trip)
+TRIGGER_STAMPED_COLUMNS = ["change_seq", "updated_at", "version"]
+
+
+# Change feed: a transaction writing products must commit within
+# CHANGES_MAX_WRITE_SECONDS of its first write, so each of its statements runs
+# with statement_timeout = what is left of that (or of budget_ms, if sooner)
+def limit_write_transaction(conn, started: float, budget_ms: float | None = None) -> None:
+    """Bound the next statement of the product-writing transaction begun at `started` (monotonic)"""
+    if conn.dialect.name != "postgresql":
+        return
+    left = (constants.CHANGES_MAX_WRITE_SECONDS - (time.monotonic() - started)) * 1000
+    if budget_ms is not None:
+        left = min(left, budget_ms)
+    conn.exec_driver_sql(f"SET LOCAL statement_timeout = {max(1, int(left))}")
+
+
+async def _limit_writes(session: AsyncSession) -> None:
+    if session.bind.dialect.name == "postgresql":
+        connection = await session.connection()
+        await connection.run_sync(limit_write_transaction, time.monotonic(), remaining_ms())
+
+
+async def _returning_product(session: AsyncSession, statement) -> Product | None:
+    result = await session.scalars(statement.returning(Product), execution_options={"populate_existing": True})
+    product = result.first()
+    if product is not None and session.bind.dialect.name == "sqlite":
+        await session.refresh(product, TRIGGER_STAMPED_COLUMNS)
+    return product
+
+# create product, or update the existing one with the same sku
+async def create_product(session: AsyncSession, organization: str, product: Product) -> Product:
+    await ensure_partition(session.bind, organization)
+    await _limit_writes(session)
+    statement = product_insert(session.bind.dialect.name).values(
+        organization=organization, name=product.name, sku=product.sku,
+        description=product.description, status=product.status,
+        content_hash=product_content_hash(product.name, product.description, product.status),
+    )
+    product = await _returning_product(session, statement)
     await session.commit()
-    await session.refresh(product)
     return product
 
 # delete product by sku
-async def delete_product_by_sku(session: AsyncSession, sku: str) -> None:
-    statement = select(Product).where(Product.sku == sku)
-    result = await session.execute(statement)
-    product = result.scalars().first()
-    if not product:
+async def delete_product_by_sku(session: AsyncSession, organization: str, sku: str) -> None:
+    await _limit_writes(session)
+    statement = delete(Product).where(*_live_product(organization, sku))
+    result = await session.execute(statement.returning(Product.id))
+    if result.first() is None:
+        await session.rollback()
         raise HTTPException(status_code=404, detail="Product not found")
-    await session.delete(product)
     await session.commit()
 
-# update product by sku
-async def update_product_by_sku(session: AsyncSession, sku: str, updated_product: Product) -> Product:
-    statement = select(Product).where(Product.sku == sku)
-    result = await session.execute(statement)
-    product = result.scalars().first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    
-    product.name = updated_product.name
-    product.description = updated_product.description
-    product.status = updated_product.status
-    
-    session.add(product)
+# ETag versions an If-Match header accepts: None for "*", else (id, version) pairs
+def parse_product_etags(header: str) -> list[tuple[int, int]] | None:
+    if header.strip() == "*":
+        return None
+    candidates = []
+    for etag in header.split(","):
+        match = re.fullmatch(r'"(\d+)\.(\d+)"', etag.strip())  # weak ETags never match If-Match
+        if match:
+            candidates.append((int(match[1]), int(match[2])))
+    return candidates
+
+# update product by sku; with if_match, only if the product is still at that ETag
+async def update_product_by_sku(session: AsyncSession, organization: str, sku: str, updated_product: Product,
+                                if_match: str | None = None) -> Product:
+    statement = update(Product).where(*_live_product(organization, sku)).values(
+        name=updated_product.name,
+        description=updated_product.description,
+        status=updated_product.status,
+        content_hash=product_content_hash(updated_product.name, updated_product.description, updated_product.status),
+    )
+    candidates = parse_product_etags(if_match) if if_match is not None else None
+    if candidates is not None:
+        # compare-and-swap: the version check runs inside the UPDATE itself
+        statement = statement.where(or_(false(), *(
+            and_(Product.id == id, Product.version == version) for id, version in candidates
+        )))
+
+    await _limit_writes(session)
+    product = await _returning_product(session, statement)
+    if product is None:
+        await session.rollback()
+        # failure path only: tell a missing product from a stale ETag
+        exists = select(Product.id).where(*_live_product(organization, sku))
+        if candidates is None or not await session.scalar(exists):
+            raise HTTPException(status_code=404, detail="Product not found")
+        raise HTTPException(status_code=412, detail="Product has changed; fetch it again and retry")
     await session.commit()
-    await session.refresh(product)
     return product
 
-# delete all products
-async def delete_all_products(session: AsyncSession) -> None:
-    statement = select(Product)
-    result = await session.execute(statement)
-    products = result.scalars().all()
-    for product in products:
-        await session.delete(product)
-    await session.commit()
\ No newline at end of file
+# delete all of a tenant's products (change-feed clients get a tombstone for
+# each), DELETE_ALL_BATCH_SIZE rows per short transaction of its own: no single
+# statement grows with the catalog, so neither the request deadline nor the
+# write limit caps the catalog size it can delete; returns the rows deleted
+async def delete_all_products(engine: AsyncEngine, organization: str) -> int:
+    batch_size = constants.DELETE_ALL_BATCH_SIZE
+    batch = select(Product.id).where(Product.organization == organization).limit(batch_size)
+    statement = delete(Product).where(Product.organization == organization, Product.id.in_(batch))
+    deleted = 0
+    while True:
+        async with engine.begin() as conn:
+            await conn.run_sync(limit_write_transaction, time.monotonic())
+            count = (await conn.execute(statement)).rowcount
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+# Postgres partitions this process has already made sure exist
+_known_partitions: set[str] = set()
+
+
+def _create_partition(conn, organization: str) -> None:
+    try:
+        with conn.begin_nested():
+            conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+            conn.execute(text(create_partition_sql(organization)))
+    except DBAPIError:
+        # lost a creation race with another process: fine if the partition is there now
+        if conn.execute(text("SELECT to_regclass(:name)"), {"name": partition_name(organization)}).scalar() is None:
+            raise
+
+
+# create the tenant's partition on its first write, in a short transaction of its own
+async def ensure_partition(engine: AsyncEngine, organization: str) -> None:
+    if engine.dialect.name != "postgresql" or organization in _known_partitions:
+        return
+    async with engine.begin() as conn:
+        await conn.run_sync(_create_partition, organization)
+    _known_partitions.add(organization)
+
+
+def ensure_partition_sync(engine: Engine, organization: str) -> None:
+    if engine.dialect.name != "postgresql" or organization in _known_partitions:
+        return
+    with engine.begin() as conn:
+        _create_partition(conn, organization)
+    _known_partitions.add(organization)
+
+# Drop a tenant's whole catalog (offboarding). On Postgres its partition is
+# detached and dropped: no row scan, no per-row triggers or WAL. An interrupted
+# run leaves the detach pending; rerunning finishes it. No tombstones are
+# written, so this is not a substitute for DELETE /products/all.
+async def drop_tenant_catalog(engine: AsyncEngine, organization: str) -> None:
+    if engine.dialect.name == "postgresql":
+        name = partition_name(organization)
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            attached = await conn.scalar(text(
+                "SELECT i.inhdetachpending FROM pg_inherits AS i WHERE i.inhrelid = to_regclass(:name)"
+            ), {"name": name})
+            if attached is not None:
+                finalize = "FINALIZE" if attached else "CONCURRENTLY"
+                await conn.execute(text(f"ALTER TABLE product DETACH PARTITION {name} {finalize}"))
+            await conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+        _known_partitions.discard(organization)
+        await ensure_partition(engine, organization)  # empty again, ready for new writes
+    else:
+        async with engine.begin() as conn:
+            await conn.execute(delete(Product).where(Product.organization == organization))
+
+    async with engine.begin() as conn:
+        await conn.execute(delete(ProductStatusDelta).where(ProductStatusDelta.organization == organization))
+        await conn.execute(delete(ProductTombstone).where(ProductTombstone.organization == organization))
+
+# search: ranked full-text + fuzzy matches, paged by (rank, id) keyset
+PG_SEARCH_SQL = f"""
+SELECT id, name, sku, description, status, rank FROM (
+    SELECT id, name, sku, description, status,
+           (ts_rank_cd({PG_SEARCH_DOCUMENT}, query)
+            + greatest(similarity(name, :q), similarity(sku::text, :q)))::float8 AS rank
+    FROM product, websearch_to_tsquery('english', :q) AS query
+    WHERE organization = :organization AND deleted_at IS NULL
+      AND ({PG_SEARCH_DOCUMENT} @@ query OR name % :q OR sku::text % :q)
+) AS ranked
+{{keyset}}
+ORDER BY rank DESC, id
+LIMIT :limit
+"""
+
+SQLITE_SEARCH_SQL = f"""
+SELECT id, name, sku, description, status, rank FROM (
+    SELECT p.id, p.name, p.sku, p.description, p.status,
+           -bm25({SQLITE_SEARCH_TABLE}, 10.0, 10.0, 1.0) AS rank
+    FROM {SQLITE_SEARCH_TABLE} JOIN product AS p ON p.id = {SQLITE_SEARCH_TABLE}.rowid
+    WHERE {SQLITE_SEARCH_TABLE} MATCH :match AND p.organization = :organization AND p.deleted_at IS NULL
+) AS ranked
+{{keyset}}
+ORDER BY rank DESC, id
+LIMIT :limit
+"""
+
+# trigram FTS5 cannot match terms shorter than 3 characters; those use a prefix scan
+SQLITE_SHORT_SEARCH_SQL = """
+SELECT id, name, sku, description, status, rank FROM (
+    SELECT id, name, sku, description, status, 0.0 AS rank
+    FROM product WHERE organization = :organization AND deleted_at IS NULL AND (sku LIKE :prefix ESCAPE '\\' OR name LIKE :prefix ESCAPE '\\')
+) AS ranked
+{keyset}
+ORDER BY rank DESC, id
+LIMIT :limit
+"""
+
+KEYSET_SQL = "WHERE rank < :after_rank OR (rank = :after_rank AND id > :after_id)"
+
+
+def encode_search_cursor(rank: float, id: int) -> str:
+    return base64.urlsafe_b64encode(orjson.dumps([rank, id])).decode()
+
+
+def decode_search_cursor(cursor: str) -> tuple[float, int]:
+    try:
+        rank, id = orjson.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(rank), int(id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _sqlite_match(q: str) -> str | None:
+    terms = [term for term in re.findall(r"\w+", q) if len(term) >= 3]
+    return " ".join(f'"{term}"' for term in terms) or None
+
+
+async def search_products(session: AsyncSession, organization: str, q: str, limit: int = 20,
+                          cursor: str | None = None) -> tuple[list, str | None]:
+    params = {"organization": organization, "q": q, "limit": limit + 1}
+    keyset = ""
+    if cursor:
+        params["after_rank"], params["after_id"] = decode_search_cursor(cursor)
+        keyset = KEYSET_SQL
+
+    if session.bind.dialect.name == "postgresql":
+        sql = PG_SEARCH_SQL
+    else:
+        match = _sqlite_match(q)
+        if match:
+            sql = SQLITE_SEARCH_SQL
+            params["match"] = match
+        else:
+            sql = SQLITE_SHORT_SEARCH_SQL
+            params["prefix"] = f"{_like_escape(q.strip())}%"
+
+    result = await session.execute(text(sql.format(keyset=keyset)), params)
+    rows = result.all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_search_cursor(rows[-1].rank, rows[-1].id)
+    return rows, next_cursor
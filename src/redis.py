@@ -1,8 +1,526 @@
-import redis.asyncio as aioredis
 import os
-from typing import Optional
+import time
+import fnmatch
+import asyncio
+import logging
+import threading
+from typing import Any, Callable, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
 
 JTI_EXPIRY_SECONDS = 3600  # 1 hour
-token_blocklist=aioredis.from_url(url=os.getenv("REDIS_URL"))
 
-#jti to blocklist 
+# One async client for caching, queues and coordination. Backends:
+#   resp     - native Redis protocol (redis.asyncio), REDIS_URL or a redis:// broker
+#   upstash  - Upstash REST API, UPSTASH_REDIS_REST_URL / UPSTASH_REDIS_REST_TOKEN
+#   memory   - in-process stand-in for tests and local runs; only with REDIS_BACKEND=memory,
+#              since per-process state breaks the cross-worker semaphore and cache stamps
+# Every backend takes a list of commands and answers them in one round trip,
+# so pipelines and multi-key commands (MGET) cost a single request.
+REDIS_BACKEND = os.getenv("REDIS_BACKEND")
+# Workers fall back to the Celery broker when it is a Redis server
+REDIS_URL = os.getenv("REDIS_URL") or (
+    os.getenv("CELERY_BROKER_URL") if os.getenv("CELERY_BROKER_URL", "").startswith(("redis://", "rediss://")) else None
+)
+UPSTASH_REDIS_REST_URL = os.getenv("UPSTASH_REDIS_REST_URL")
+UPSTASH_REDIS_REST_TOKEN = os.getenv("UPSTASH_REDIS_REST_TOKEN")
+REDIS_TIMEOUT = float(os.getenv("REDIS_TIMEOUT", "2"))
+REDIS_HEALTHCHECK_TIMEOUT = float(os.getenv("REDIS_HEALTHCHECK_TIMEOUT", "2"))
+
+
+class RedisCommandError(Exception):
+    """A command inside a pipeline failed on the server"""
+
+
+class Script:
+    """
+    A Lua script plus an equivalent Python function for the memory backend.
+    `local(backend, keys, args)` gets the MemoryBackend and must mirror the Lua.
+    """
+
+    def __init__(self, lua: str, local: Callable):
+        self.lua = lua
+        self.local = local
+
+
+# --- backends ---------------------------------------------------------------
+
+class RespBackend:
+    """Native Redis protocol over redis.asyncio"""
+
+    def __init__(self, url: str):
+        import redis.asyncio as aioredis
+
+        options = {"ssl_cert_reqs": None} if url.startswith("rediss://") else {}
+        self.client = aioredis.from_url(
+            url, decode_responses=True, socket_timeout=REDIS_TIMEOUT, socket_connect_timeout=REDIS_TIMEOUT, **options
+        )
+
+    async def execute(self, commands: list[tuple]) -> list:
+        if len(commands) == 1:
+            return [await self.client.execute_command(*commands[0])]
+        async with self.client.pipeline(transaction=False) as pipe:
+            for command in commands:
+                pipe.execute_command(*command)
+            return await pipe.execute(raise_on_error=True)
+
+    async def eval(self, script: Script, keys: list, args: list):
+        return await self.client.execute_command("EVAL", script.lua, len(keys), *keys, *args)
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+class UpstashBackend:
+    """Upstash REST API; pipelines go to the /pipeline endpoint as one HTTP request"""
+
+    def __init__(self, url: str, token: str):
+        import httpx
+
+        self.url = url.rstrip("/")
+        self.http = httpx.AsyncClient(headers={"Authorization": f"Bearer {token}"}, timeout=REDIS_TIMEOUT)
+
+    async def execute(self, commands: list[tuple]) -> list:
+        body = [[str(part) for part in command] for command in commands]
+        if len(body) == 1:
+            response = await self.http.post(self.url, json=body[0])
+            replies = [response.json()]
+        else:
+            response = await self.http.post(f"{self.url}/pipeline", json=body)
+            replies = response.json()
+        if isinstance(replies, dict) and "error" in replies:
+            raise RedisCommandError(replies["error"])
+        for reply in replies:
+            if "error" in reply:
+                raise RedisCommandError(reply["error"])
+        return [reply.get("result") for reply in replies]
+
+    async def eval(self, script: Script, keys: list, args: list):
+        return (await self.execute([("EVAL", script.lua, len(keys), *keys, *args)]))[0]
+
+    async def close(self) -> None:
+        await self.http.aclose()
+
+
+class MemoryBackend:
+    """
+    In-process stand-in implementing the commands this project uses. Values
+    are stored as strings like a decode_responses Redis client returns them.
+    """
+
+    def __init__(self):
+        self.data: dict[str, Any] = {}
+        self.expires: dict[str, float] = {}
+        self.round_trips = 0
+
+    def _alive(self, key: str) -> bool:
+        expires = self.expires.get(key)
+        if expires is not None and expires <= time.time():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def _get(self, key: str, default=None):
+        return self.data[key] if self._alive(key) else default
+
+    async def execute(self, commands: list[tuple]) -> list:
+        self.round_trips += 1
+        return [self._run(command) for command in commands]
+
+    async def eval(self, script: Script, keys: list, args: list):
+        self.round_trips += 1
+        return script.local(self, keys, args)
+
+    async def close(self) -> None:
+        pass
+
+    def _run(self, command: tuple):
+        name, *args = command
+        handler = getattr(self, f"_cmd_{name.lower()}", None)
+        if handler is None:
+            raise RedisCommandError(f"ERR unknown command '{name}' for memory backend")
+        return handler(*args)
+
+    # strings
+    def _cmd_ping(self):
+        return "PONG"
+
+    def _cmd_get(self, key):
+        return self._get(key)
+
+    def _cmd_set(self, key, value, *options):
+        options = [str(option).upper() for option in options]
+        if "NX" in options and self._alive(key):
+            return None
+        if "XX" in options and not self._alive(key):
+            return None
+        self.data[key] = str(value)
+        self.expires.pop(key, None)
+        if "EX" in options:
+            self.expires[key] = time.time() + float(options[options.index("EX") + 1])
+        if "PX" in options:
+            self.expires[key] = time.time() + float(options[options.index("PX") + 1]) / 1000
+        return "OK"
+
+    def _cmd_mget(self, *keys):
+        return [self._get(key) for key in keys]
+
+    def _cmd_del(self, *keys):
+        removed = 0
+        for key in keys:
+            if self._alive(key):
+                removed += 1
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return removed
+
+    def _cmd_exists(self, *keys):
+        return sum(1 for key in keys if self._alive(key))
+
+    def _cmd_incrby(self, key, amount):
+        value = int(self._get(key, 0)) + int(amount)
+        self.data[key] = str(value)
+        return value
+
+    def _cmd_incr(self, key):
+        return self._cmd_incrby(key, 1)
+
+    def _cmd_expire(self, key, seconds):
+        if not self._alive(key):
+            return 0
+        self.expires[key] = time.time() + float(seconds)
+        return 1
+
+    def _cmd_ttl(self, key):
+        if not self._alive(key):
+            return -2
+        expires = self.expires.get(key)
+        return -1 if expires is None else int(expires - time.time())
+
+    def _cmd_keys(self, pattern):
+        return [key for key in list(self.data) if self._alive(key) and fnmatch.fnmatchcase(key, pattern)]
+
+    # lists
+    def _cmd_lpush(self, key, *values):
+        items = self._get(key, [])
+        for value in values:
+            items.insert(0, str(value))
+        self.data[key] = items
+        return len(items)
+
+    def _cmd_ltrim(self, key, start, stop):
+        items = self._get(key, [])
+        stop = int(stop)
+        self.data[key] = items[int(start): None if stop == -1 else stop + 1]
+        return "OK"
+
+    def _cmd_lrange(self, key, start, stop):
+        items = self._get(key, [])
+        stop = int(stop)
+        return items[int(start): None if stop == -1 else stop + 1]
+
+    # sorted sets
+    def _zset(self, key) -> dict:
+        zset = self._get(key)
+        if zset is None:
+            zset = {}
+            self.data[key] = zset
+        return zset
+
+    def _cmd_zadd(self, key, *pairs):
+        zset = self._zset(key)
+        added = 0
+        for score, member in zip(pairs[0::2], pairs[1::2]):
+            added += member not in zset
+            zset[str(member)] = float(score)
+        return added
+
+    def _cmd_zincrby(self, key, amount, member):
+        zset = self._zset(key)
+        zset[str(member)] = zset.get(str(member), 0.0) + float(amount)
+        return zset[str(member)]
+
+    def _cmd_zscore(self, key, member):
+        return self._get(key, {}).get(str(member))
+
+    def _cmd_zcard(self, key):
+        return len(self._get(key, {}))
+
+    def _cmd_zrem(self, key, *members):
+        zset = self._get(key, {})
+        return sum(1 for member in members if zset.pop(str(member), None) is not None)
+
+    def _cmd_zremrangebyscore(self, key, low, high):
+        zset = self._get(key, {})
+        low, high = float(low), float(high)
+        doomed = [member for member, score in zset.items() if low <= score <= high]
+        for member in doomed:
+            del zset[member]
+        return len(doomed)
+
+    def _cmd_zrevrange(self, key, start, stop, *options):
+        zset = self._get(key, {})
+        ordered = sorted(zset.items(), key=lambda item: (item[1], item[0]), reverse=True)
+        stop = int(stop)
+        ordered = ordered[int(start): None if stop == -1 else stop + 1]
+        if options and str(options[0]).upper() == "WITHSCORES":
+            return [part for member, score in ordered for part in (member, score)]
+        return [member for member, _ in ordered]
+
+
+# --- client -----------------------------------------------------------------
+
+def _to_bool(reply) -> bool:
+    return bool(reply) and reply != 0
+
+
+def _to_int(reply) -> int:
+    return int(reply or 0)
+
+
+def _to_float(reply) -> float | None:
+    return None if reply is None else float(reply)
+
+
+def _to_pairs(reply) -> list[tuple[str, float]]:
+    reply = list(reply or [])
+    return [(member, float(score)) for member, score in zip(reply[0::2], reply[1::2])]
+
+
+def _identity(reply):
+    return reply
+
+
+class _Commands:
+    """Command builders shared by the client and its pipelines"""
+
+    def _queue(self, command: tuple, convert: Callable):
+        raise NotImplementedError
+
+    def ping(self):
+        return self._queue(("PING",), lambda reply: reply in ("PONG", True))
+
+    def get(self, key: str):
+        return self._queue(("GET", key), _identity)
+
+    def set(self, key: str, value, ex: int | None = None, nx: bool = False):
+        command = ["SET", key, value]
+        if ex:
+            command += ["EX", int(ex)]
+        if nx:
+            command.append("NX")
+        return self._queue(tuple(command), _to_bool)
+
+    def mget(self, keys: list[str]):
+        return self._queue(("MGET", *keys), lambda reply: list(reply or []))
+
+    def delete(self, *keys: str):
+        return self._queue(("DEL", *keys), _to_int)
+
+    def exists(self, *keys: str):
+        return self._queue(("EXISTS", *keys), _to_int)
+
+    def incr(self, key: str, amount: int = 1):
+        return self._queue(("INCRBY", key, amount), _to_int)
+
+    def expire(self, key: str, seconds: int):
+        return self._queue(("EXPIRE", key, int(seconds)), _to_bool)
+
+    def lpush(self, key: str, *values):
+        return self._queue(("LPUSH", key, *values), _to_int)
+
+    def ltrim(self, key: str, start: int, stop: int):
+        return self._queue(("LTRIM", key, start, stop), _to_bool)
+
+    def lrange(self, key: str, start: int, stop: int):
+        return self._queue(("LRANGE", key, start, stop), lambda reply: list(reply or []))
+
+    def zadd(self, key: str, mapping: dict):
+        pairs = [part for member, score in mapping.items() for part in (score, member)]
+        return self._queue(("ZADD", key, *pairs), _to_int)
+
+    def zincrby(self, key: str, amount: float, member: str):
+        return self._queue(("ZINCRBY", key, amount, member), _to_float)
+
+    def zscore(self, key: str, member: str):
+        return self._queue(("ZSCORE", key, member), _to_float)
+
+    def zcard(self, key: str):
+        return self._queue(("ZCARD", key), _to_int)
+
+    def zrem(self, key: str, *members: str):
+        return self._queue(("ZREM", key, *members), _to_int)
+
+    def zremrangebyscore(self, key: str, low, high):
+        return self._queue(("ZREMRANGEBYSCORE", key, low, high), _to_int)
+
+    def zrevrange(self, key: str, start: int, stop: int, withscores: bool = False):
+        if withscores:
+            return self._queue(("ZREVRANGE", key, start, stop, "WITHSCORES"), _to_pairs)
+        return self._queue(("ZREVRANGE", key, start, stop), lambda reply: list(reply or []))
+
+
+class Pipeline(_Commands):
+    """Queues commands and sends them in one round trip on execute()"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._commands: list[tuple] = []
+        self._converters: list[Callable] = []
+
+    def _queue(self, command: tuple, convert: Callable):
+        self._commands.append(command)
+        self._converters.append(convert)
+        return self
+
+    def __len__(self) -> int:
+        return len(self._commands)
+
+    async def execute(self) -> list:
+        if not self._commands:
+            return []
+        replies = await self.backend.execute(self._commands)
+        results = [convert(reply) for convert, reply in zip(self._converters, replies)]
+        self._commands, self._converters = [], []
+        return results
+
+
+class RedisClient(_Commands):
+    """
+    Async Redis client used by everything in src/. Each method is one round
+    trip; pipeline() batches any number of commands into one.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    async def _run(self, command: tuple, convert: Callable):
+        return convert((await self.backend.execute([command]))[0])
+
+    def _queue(self, command: tuple, convert: Callable):
+        return self._run(command, convert)
+
+    def pipeline(self) -> Pipeline:
+        return Pipeline(self.backend)
+
+    async def mset(self, mapping: dict, ex: int | None = None) -> None:
+        """Set many keys (optionally with a TTL) in one round trip"""
+        pipe = self.pipeline()
+        for key, value in mapping.items():
+            pipe.set(key, value, ex=ex)
+        await pipe.execute()
+
+    async def eval(self, script: Script, keys: list, args: list):
+        return await self.backend.eval(script, keys, args)
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+
+def create_backend(kind: str | None = None):
+    kind = kind or REDIS_BACKEND
+    if kind is None:
+        if REDIS_URL:
+            kind = "resp"
+        elif UPSTASH_REDIS_REST_URL and UPSTASH_REDIS_REST_TOKEN:
+            kind = "upstash"
+        else:
+            raise ValueError(
+                "No Redis configured: set REDIS_URL or UPSTASH_REDIS_REST_URL/TOKEN "
+                "(REDIS_BACKEND=memory for tests and local runs)"
+            )
+
+    if kind == "resp":
+        if not REDIS_URL:
+            raise ValueError("REDIS_URL must be set for the resp Redis backend")
+        return RespBackend(REDIS_URL)
+    if kind == "upstash":
+        if not UPSTASH_REDIS_REST_URL or not UPSTASH_REDIS_REST_TOKEN:
+            raise ValueError("UPSTASH_REDIS_REST_URL and UPSTASH_REDIS_REST_TOKEN must be set")
+        return UpstashBackend(UPSTASH_REDIS_REST_URL, UPSTASH_REDIS_REST_TOKEN)
+    if kind == "memory":
+        logger.warning("⚠️ Using in-memory Redis: state is per process (tests and local runs only)")
+        return MemoryBackend()
+    raise ValueError(f"Unknown REDIS_BACKEND: {kind}")
+
+
+# Global Redis client
+redis_client: Optional[RedisClient] = None
+
+
+def get_redis() -> RedisClient:
+    """Get the process-wide Redis client, created on first use"""
+    global redis_client
+    if redis_client is None:
+        redis_client = RedisClient(create_backend())
+    return redis_client
+
+
+def set_redis(client: RedisClient | None) -> None:
+    """Install a client for this process (tests use the memory backend)"""
+    global redis_client
+    redis_client = client
+
+
+async def close_redis() -> None:
+    global redis_client
+    if redis_client is not None:
+        await redis_client.close()
+    redis_client = None
+
+
+async def check_redis(timeout: float = REDIS_HEALTHCHECK_TIMEOUT) -> bool:
+    """Startup health check; never holds startup longer than `timeout`. A missing configuration raises."""
+    client = get_redis()
+    try:
+        await asyncio.wait_for(client.ping(), timeout=timeout)
+        logger.info("✅ Redis connection established successfully")
+        return True
+    except asyncio.TimeoutError:
+        logger.error(f"❌ Redis health check timed out after {timeout}s")
+    except Exception as e:
+        logger.error(f"❌ Redis connection failed: {e}")
+    return False
+
+
+#jti to blocklist
+async def add_jti_to_blocklist(jti: str) -> None:
+    await get_redis().set(f"blocklist:{jti}", "1", ex=JTI_EXPIRY_SECONDS)
+
+
+async def token_in_blocklist(jti: str) -> bool:
+    return await get_redis().exists(f"blocklist:{jti}") > 0
+
+
+# FastAPI dependency
+def get_redis_dependency() -> RedisClient:
+    """FastAPI dependency to get the Redis client"""
+    return get_redis()
+
+
+# Sync callers (Celery tasks) run Redis coroutines on one background loop per
+# process, so the async client stays bound to a single event loop.
+_sync_loop: asyncio.AbstractEventLoop | None = None
+_sync_loop_pid: int | None = None
+_sync_loop_lock = threading.Lock()
+
+
+def _get_sync_loop() -> asyncio.AbstractEventLoop:
+    global _sync_loop, _sync_loop_pid, redis_client
+    with _sync_loop_lock:
+        if _sync_loop is None or _sync_loop_pid != os.getpid():
+            if _sync_loop_pid is not None and _sync_loop_pid != os.getpid():
+                redis_client = None  # never reuse a client inherited across fork
+            _sync_loop = asyncio.new_event_loop()
+            _sync_loop_pid = os.getpid()
+            threading.Thread(target=_sync_loop.run_forever, name="redis-sync", daemon=True).start()
+    return _sync_loop
+
+
+def run_sync(coro, timeout: float | None = None):
+    """Run a Redis coroutine from sync code and return its result"""
+    future = asyncio.run_coroutine_threadsafe(coro, _get_sync_loop())
+    return future.result(timeout)
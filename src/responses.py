@@ -0,0 +1,52 @@
+import hashlib
+from typing import Any, Iterable, Sequence
+
+import orjson
+from fastapi.responses import Response
+from sqlmodel import SQLModel
+
+
+class ORJSONResponse(Response):
+    """JSON response rendered with orjson (same compact output as JSONResponse)"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+
+class RowsResponse(Response):
+    """
+    Serializes plain row tuples straight to a JSON array of objects. List
+    endpoints select columns instead of ORM objects and return this, which
+    skips ORM loading, response_model validation and the stdlib encoder.
+    """
+    media_type = "application/json"
+
+    def __init__(self, columns: Sequence[str], rows: Iterable[Sequence], **kwargs):
+        super().__init__(content=(columns, rows), **kwargs)
+
+    def render(self, content) -> bytes:
+        columns, rows = content
+        return orjson.dumps([dict(zip(columns, row)) for row in rows])
+
+
+def model_columns(model: type[SQLModel]) -> list:
+    """Table columns of a model in field order, i.e. the keys its JSON uses"""
+    table = model.__table__
+    return [table.c[name] for name in model.model_fields if name in table.c]
+
+
+def weak_etag(values: Iterable) -> str:
+    """Weak ETag over the values that identify a representation (e.g. id, version pairs)"""
+    digest = hashlib.blake2b(repr(list(values)).encode(), digest_size=16).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(header: str | None, etag: str) -> bool:
+    """Whether an If-None-Match header matches `etag` (weak comparison; "*" matches anything)"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
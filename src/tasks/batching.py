@@ -0,0 +1,89 @@
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Adaptive ingest batching. The upsert statement size and the rows per
+# transaction start at CsvIngest.BATCH_SIZE / COMMIT_FREQUENCY and move within
+# these bounds; every transaction is also held under the lock and WAL budgets.
+INGEST_ADAPTIVE_BATCHING = os.getenv("INGEST_ADAPTIVE_BATCHING", "true").lower() == "true"
+INGEST_BATCH_MIN = int(os.getenv("INGEST_BATCH_MIN", "200"))
+INGEST_BATCH_MAX = int(os.getenv("INGEST_BATCH_MAX", "10000"))
+INGEST_COMMIT_MIN = int(os.getenv("INGEST_COMMIT_MIN", "1000"))
+INGEST_COMMIT_MAX = int(os.getenv("INGEST_COMMIT_MAX", "100000"))
+INGEST_TXN_MAX_SECONDS = float(os.getenv("INGEST_TXN_MAX_SECONDS", "2"))   # row locks held per transaction
+INGEST_TXN_MAX_MB = float(os.getenv("INGEST_TXN_MAX_MB", "64"))            # WAL written per transaction
+
+# Rough WAL cost of one upserted row beyond its values: tuple header, the
+# product indexes and the trigger-maintained change-feed columns
+ROW_WAL_OVERHEAD = 200
+
+
+def row_wal_bytes(row: dict) -> int:
+    """Estimated WAL bytes of writing one row"""
+    return ROW_WAL_OVERHEAD + sum(len(value) for value in row.values() if isinstance(value, str))
+
+
+class AdaptiveBatcher:
+    """
+    Picks the statement size (rows per upsert) and the commit size (rows per
+    transaction) of one ingest from what the writes measure:
+
+    - statement size hill-climbs on rows/sec: it keeps stepping the same way
+      while throughput improves and turns around when it drops;
+    - commit size grows toward the transaction budgets (fewer commit flushes)
+      and shrinks back under them as soon as a transaction overshoots.
+
+    should_commit() is the hard stop: a transaction is committed once it
+    reaches the commit size or either budget, whatever the estimates said.
+    """
+
+    STEP = 1.5          # statement size factor per move
+    TOLERANCE = 0.05    # throughput changes smaller than this are noise
+    HEADROOM = 0.8      # commit size aims at this share of the budgets
+
+    def __init__(self, batch_size: int, commit_size: int, adaptive: bool | None = None):
+        self.adaptive = INGEST_ADAPTIVE_BATCHING if adaptive is None else adaptive
+        # the starting sizes always lie within the bounds
+        self.min_batch = min(INGEST_BATCH_MIN, batch_size)
+        self.max_batch = max(INGEST_BATCH_MAX, batch_size)
+        self.min_commit = min(INGEST_COMMIT_MIN, commit_size)
+        self.max_commit = max(INGEST_COMMIT_MAX, commit_size)
+        self.max_seconds = INGEST_TXN_MAX_SECONDS
+        self.max_bytes = INGEST_TXN_MAX_MB * 1024 * 1024
+        self.batch_size = batch_size
+        self.commit_size = commit_size
+        self.rate: float | None = None      # rows/sec of the last statement
+        self._direction = 1
+
+    def statement(self, rows: int, seconds: float) -> None:
+        """Feed back one upsert statement (lookup included) of `rows` rows"""
+        if not self.adaptive or rows < self.batch_size or seconds <= 0:
+            return  # a short, final batch says nothing about the size
+        rate = rows / seconds
+        if self.rate is not None and rate < self.rate * (1 - self.TOLERANCE):
+            self._direction = -self._direction
+        self.rate = rate
+        size = self.batch_size * self.STEP if self._direction > 0 else self.batch_size / self.STEP
+        self.batch_size = self._clamp(round(size), self.min_batch, min(self.max_batch, self.commit_size))
+
+    def commit(self, rows: int, nbytes: int, seconds: float) -> None:
+        """Feed back one committed transaction of `rows` rows and ~`nbytes` WAL bytes held for `seconds`"""
+        if not self.adaptive or rows <= 0:
+            return
+        load = max(seconds / self.max_seconds, nbytes / self.max_bytes)
+        if load > 0:
+            # rows that fit the budgets at this transaction's cost per row
+            target = rows * self.HEADROOM / load
+            self.commit_size = self._clamp(round(min(target, self.commit_size * 2)), self.min_commit, self.max_commit)
+        self.batch_size = min(self.batch_size, self.commit_size)
+
+    def should_commit(self, rows: int, nbytes: int, seconds: float) -> bool:
+        return rows >= self.commit_size or nbytes >= self.max_bytes or seconds >= self.max_seconds
+
+    def sizes(self) -> dict:
+        return {"batch_size": self.batch_size, "commit_size": self.commit_size}
+
+    @staticmethod
+    def _clamp(value: int, low: int, high: int) -> int:
+        return max(low, min(high, value))
@@ -2,17 +2,29 @@ import os
 import time 
 import csv
 import asyncio
-import asyncpg
+import json
 from datetime import datetime
 from pathlib import Path
 from typing import List, Dict, Any
 from dotenv import load_dotenv
 from sqlalchemy.orm import sessionmaker
 from celery import Celery
+from celery.schedules import crontab
+from celery.signals import celeryd_init, worker_process_init, worker_process_shutdown
+from kombu import Queue
 from sqlmodel import Session, SQLModel, create_engine,select
 from sqlalchemy import text 
-from sqlalchemy.dialects.postgresql import insert
-from src.products.model import Product
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.tasks import db
+from src.tasks.ingest import CsvIngest
+from src.tasks.memory import INGEST_MEMORY_LIMIT_MB
+from src.tasks import maintenance, prewarm
+from src.products.constants import PROCESSED_DIR, UPLOADS_DIR
+from src.products.service import compact_status_counts
+from src.tasks.dedupe import dedupe_skus
+from src.redis import get_redis, run_sync
+from src.tasks.semaphore import RedisSemaphore
+from src.tenancy import DEFAULT_ORGANIZATION
 import ssl 
 load_dotenv()
 import logging
@@ -26,12 +38,40 @@ celery=Celery(__name__)
 # Get URLs from environment
 broker_url = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
 result_backend = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/0")
-POSTGRES_SERVICE_URL = os.getenv("POSTGRES_SERVICE_URL")
-sync_postgres_url = POSTGRES_SERVICE_URL.replace("postgresql+asyncpg://", "postgresql://")
-# PostgreSQL connection string
-# Configure Celery with SSL settings for Upstash Redis
-# async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False) use similar for sync session
-sync_engine = create_engine(sync_postgres_url, connect_args={"sslmode": "require"}, echo=False)  
+# Database pools are per worker process (see src/tasks/db.py): created in
+# worker_process_init after the prefork fork, never in the parent
+
+# Queues: heavy CSV ingests, short tasks and webhook delivery never share a queue,
+# so a burst of large uploads cannot starve the light work.
+# Run one worker pool per queue, e.g.
+#   celery -A src.tasks.celery_worker.celery worker -Q ingest -c 2
+#   celery -A src.tasks.celery_worker.celery worker -Q light -c 8
+INGEST_QUEUE = "ingest"
+LIGHT_QUEUE = "light"
+WEBHOOK_QUEUE = "webhooks"
+QUEUE_SETTINGS = {
+    INGEST_QUEUE: {"prefetch_multiplier": 1, "acks_late": True},    # one big file per process at a time
+    LIGHT_QUEUE: {"prefetch_multiplier": 8, "acks_late": False},
+    WEBHOOK_QUEUE: {"prefetch_multiplier": 4, "acks_late": True},   # redeliver if a worker dies mid-call
+}
+
+# Priorities (Redis transport: 0 runs first). Interactive uploads jump ahead of
+# scheduled imports; TENANT_PRIORITIES='{"acme": 1}' pins a tenant's priority.
+# An upload's tenant comes from the X-Organization header, which anyone can
+# set, so for uploads a pin can only demote: no header gets ahead of the rest.
+PRIORITY_INTERACTIVE = 2
+PRIORITY_SCHEDULED = 7
+TENANT_PRIORITIES = json.loads(os.getenv("TENANT_PRIORITIES", "{}"))
+
+# Global cap on concurrent ingests across all workers, so the DB is not overrun
+INGEST_MAX_CONCURRENT = int(os.getenv("INGEST_MAX_CONCURRENT", "4"))   # 0 disables the cap
+INGEST_LEASE_SECONDS = int(os.getenv("INGEST_LEASE_SECONDS", "900"))   # slot held without heartbeat
+INGEST_RETRY_SECONDS = int(os.getenv("INGEST_RETRY_SECONDS", "30"))    # wait before retrying for a slot
+INGEST_MAX_WAIT_SECONDS = int(os.getenv("INGEST_MAX_WAIT_SECONDS", "3600"))  # then the ingest fails
+
+# Celery beat: run `celery -A src.tasks.celery_worker.celery beat` next to the workers
+ARCHIVE_PRUNE_SECONDS = int(os.getenv("ARCHIVE_PRUNE_SECONDS", "3600"))
+MAINTENANCE_HOUR = int(os.getenv("MAINTENANCE_HOUR", "3"))   # UTC hour of the nightly database maintenance
 
 celery.conf.update(
 
@@ -62,146 +102,201 @@ celery.conf.update(
     broker_connection_retry=True,
     broker_connection_max_retries=10,
     result_expires=3600,
+
+    # Queue routing and priorities
+    task_queues=[Queue(name) for name in QUEUE_SETTINGS],
+    task_default_queue=LIGHT_QUEUE,
+    task_routes={
+        'process_csv_task': {'queue': INGEST_QUEUE},
+        'dedupe_product_skus': {'queue': INGEST_QUEUE},
+        'maintenance.database': {'queue': INGEST_QUEUE},   # VACUUM can take a while
+        'webhooks.*': {'queue': WEBHOOK_QUEUE},
+    },
+    task_default_priority=5,
+    broker_transport_options={
+        'priority_steps': list(range(10)),
+        'sep': ':',
+        'queue_order_strategy': 'priority',
+    },
+    worker_prefetch_multiplier=1,
+
+    # replace a child whose RSS is still above the ingest memory ceiling after a task (KiB)
+    worker_max_memory_per_child=INGEST_MEMORY_LIMIT_MB * 1024 or None,
+
+    # Periodic maintenance; expired task results are removed by Redis itself (result_expires)
+    beat_schedule={
+        'prune-upload-archives': {
+            'task': 'maintenance.prune_archives',
+            'schedule': ARCHIVE_PRUNE_SECONDS,
+        },
+        'database-maintenance': {
+            'task': 'maintenance.database',
+            'schedule': crontab(hour=MAINTENANCE_HOUR, minute=0),
+        },
+    },
 )
 
-@celery.task(name='create_task',bind=True)
+
+@celeryd_init.connect
+def apply_queue_settings(sender=None, conf=None, options=None, **kwargs):
+    """Give a worker the prefetch and ack settings of the queues it consumes"""
+    queues = (options or {}).get("queues") or list(QUEUE_SETTINGS)
+    if isinstance(queues, str):
+        queues = queues.split(",")
+    settings = [QUEUE_SETTINGS[name] for name in queues if name in QUEUE_SETTINGS]
+    if not settings:
+        return
+    # a worker serving several queues takes the most conservative settings
+    conf.worker_prefetch_multiplier = min(s["prefetch_multiplier"] for s in settings)
+    conf.task_acks_late = any(s["acks_late"] for s in settings)
+    logger.info(f"⚙️ Worker queues {queues}: prefetch={conf.worker_prefetch_multiplier}, acks_late={conf.task_acks_late}")
+
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    """Give each prefork child its own warmed-up connection pools"""
+    db.init_process_pools()
+
+
+@worker_process_shutdown.connect
+def shutdown_worker_process(**kwargs):
+    db.dispose_process_pools()
+
+
+def ingest_priority(organization: str | None = None, interactive: bool = True) -> int:
+    """
+    Broker priority for an ingest. A tenant override wins over the default for
+    scheduled imports, but never lifts an interactive upload above the rest.
+    """
+    default = PRIORITY_INTERACTIVE if interactive else PRIORITY_SCHEDULED
+    if not organization or organization not in TENANT_PRIORITIES:
+        return default
+    pinned = int(TENANT_PRIORITIES[organization])
+    return max(pinned, default) if interactive else pinned
+
+
+def enqueue_ingest(file_path: str, organization: str = DEFAULT_ORGANIZATION, interactive: bool = True,
+                   snapshot: bool = False, dry_run: bool = False):
+    """Queue a CSV ingest of one tenant's products on the ingest queue with its tenant priority"""
+    return process_csv_task.apply_async(
+        args=(file_path,),
+        kwargs={"organization": organization, "snapshot": snapshot, "dry_run": dry_run, "interactive": interactive},
+        priority=ingest_priority(organization, interactive),
+    )
+
+
+_ingest_semaphore: RedisSemaphore | None = None
+
+def get_ingest_semaphore() -> RedisSemaphore:
+    global _ingest_semaphore
+    if _ingest_semaphore is None:
+        _ingest_semaphore = RedisSemaphore(get_redis(), "ingest", INGEST_MAX_CONCURRENT, INGEST_LEASE_SECONDS)
+    return _ingest_semaphore
+
+@celery.task(name='create_task',bind=True, acks_late=False)
 def create_task(self, a,b,c):
     time.sleep(a)
     print(f"Task completed: a={a}, b={b}, c={c}, b+c={b+c} ", self.request.id)
     return b+c
 
-@celery.task(name='process_csv_task', bind=True)
-def process_csv_task(self, file_path: str):
+@celery.task(name='process_csv_task', bind=True, acks_late=True, reject_on_worker_lost=True)
+def process_csv_task(self, file_path: str, organization: str = DEFAULT_ORGANIZATION, snapshot: bool = False,
+                     dry_run: bool = False, interactive: bool = True):
     """
-    Bulk insert: Add all products without duplicate checking
+    Bulk upsert into one organization's catalog: new SKUs are inserted, changed
+    SKUs take the row's values and unchanged ones are not written. A snapshot
+    file is the whole catalog: SKUs it does not list are soft-deleted. A dry
+    run reports all of that without writing.
     """
-    start_time = datetime.now()
-    logger.info(f"🚀 Starting bulk CSV insert: {file_path}")
-    
-    # Performance settings
-    BATCH_SIZE = 1000          # Insert 1000 records at once
-    COMMIT_FREQUENCY = 5000    # Commit every 5000 records
-    total_inserted = 0
-    batch_products = []
-    
+    # Wait for a free ingest slot, at most INGEST_MAX_WAIT_SECONDS, at the
+    # priority the ingest was queued with; the task id is the token so a
+    # redelivered task picks its own slot back up
+    semaphore = get_ingest_semaphore() if INGEST_MAX_CONCURRENT > 0 else None
+    if semaphore and not run_sync(semaphore.acquire(self.request.id)):
+        logger.info(f"⏳ {semaphore.limit} ingests already running, retrying in {INGEST_RETRY_SECONDS}s")
+        raise self.retry(countdown=INGEST_RETRY_SECONDS,
+                         max_retries=max(1, INGEST_MAX_WAIT_SECONDS // max(INGEST_RETRY_SECONDS, 1)),
+                         priority=ingest_priority(organization, interactive))
+
+    # from here on the slot is ours: anything that fails must still release it
+    ingest = None
     try:
-        with Session(sync_engine) as session:
-            with open(file_path, mode='r', newline='', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
-                
-                #  Count total rows for progress tracking
-                total_rows = sum(1 for _ in csvfile)
-                csvfile.seek(0)
-                reader = csv.DictReader(csvfile)
-                
-                logger.info(f"📊 Total rows to insert: {total_rows:,}")
-                
-                for i, row in enumerate(reader, 1):
-                    try:
-                        #  Validate and clean data
-                        sku = row['sku'].strip().upper() if row['sku'] else None
-                        name = row['name'].strip() if row['name'] else None
-                        description = row['description'].strip() if row['description'] else ""
-                        
-                        if not sku or not name:
-                            logger.warning(f"Row {i}: Missing SKU or name, skipping")
-                            continue
-                        
-                        #  Create Product object
-                        product = Product(
-                            sku=sku,
-                            name=name,
-                            description=description,
-                            status='active'
-                        )
-                        
-                        #  Add to batch
-                        batch_products.append(product)
-                        
-                        # Insert batch when it reaches BATCH_SIZE
-                        if len(batch_products) >= BATCH_SIZE:
-                            session.add_all(batch_products)
-                            total_inserted += len(batch_products)
-                            batch_products.clear()
-                            
-                            #  Progress update and commit
-                            if total_inserted % COMMIT_FREQUENCY == 0:
-                                session.commit()
-                                elapsed = (datetime.now() - start_time).total_seconds()
-                                rate = total_inserted / elapsed if elapsed > 0 else 0
-                                progress = (total_inserted / total_rows) * 100
-                                
-                                self.update_state(
-                                    state='PROGRESS',
-                                    meta={
-                                        'status': f'Inserting batch {total_inserted//BATCH_SIZE}',
-                                        'progress': progress,
-                                        'inserted': total_inserted,
-                                        'total': total_rows,
-                                        'rate': f'{rate:.0f} records/sec'
-                                    }
-                                )
-                                logger.info(f"📊 Inserted {total_inserted:,}/{total_rows:,} ({progress:.1f}%) - {rate:.0f} records/sec")
-                    
-                    except Exception as row_error:
-                        logger.error(f"Row {i} error: {row_error}")
-                        continue
-                
-                #  Insert remaining batch
-                if batch_products:
-                    session.add_all(batch_products)
-                    total_inserted += len(batch_products)
-                
-                #  Final commit
-                session.commit()
-        
-        # Move to processed folder
-        processed_dir = Path(file_path).parent / "processed"
-        processed_dir.mkdir(exist_ok=True)
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        processed_file = processed_dir / f"processed_{timestamp}_{Path(file_path).name}"
-        os.rename(file_path, processed_file)
-        
-        processing_time = (datetime.now() - start_time).total_seconds()
-        
-        result = {
-            "status": "completed",
-            "file_name": Path(file_path).name,
-            "total_inserted": total_inserted,
-            "processing_time_seconds": round(processing_time, 2),
-            "records_per_second": round(total_inserted / processing_time, 2) if processing_time > 0 else 0,
-            "processed_file": str(processed_file),
-            "completed_at": datetime.now().isoformat()
-        }
-        
-        logger.info(f"✅ Bulk insert completed: {result}")
-        return result
-        
-    except Exception as e:
-        error_msg = str(e)
-        logger.error(f"Bulk CSV insert failed: {error_msg}")
-        
-        # Move failed file to errors folder
+        # rows above this change_seq are the ones the ingest writes (pre-warmed afterwards)
+        after_seq = None
+        if not dry_run and prewarm.SKU_PREWARM_ENABLED:
+            after_seq = prewarm.latest_change_seq(db.get_sync_engine(), organization)
+
+        ingest = CsvIngest(self, file_path, semaphore, organization=organization, snapshot=snapshot, dry_run=dry_run)
+        result = ingest.run()
+    finally:
+        if semaphore:
+            run_sync(semaphore.release(self.request.id))
+        # batches commit as they go, so a failed ingest may have changed cached rows too
+        if ingest is not None:
+            ingest.stamp_cache()
+
+    # a large write leaves the planner statistics stale until autovacuum gets round to it
+    # (a dry run reports the rows it would write, but writes none)
+    if not dry_run and result["total_inserted"] + result["soft_deleted"] >= maintenance.ANALYZE_AFTER_INGEST_MIN_ROWS:
+        engine = db.get_sync_engine()
+        try:
+            result["maintenance"] = maintenance.analyze_tables(engine, maintenance.ingest_tables(engine, organization))
+        except Exception as e:
+            logger.warning(f"⚠️ Post-ingest ANALYZE failed: {e}")
+
+    # the tenant's cache was invalidated above: warm it in the background
+    # before the first wave of lookups misses
+    if not dry_run and result["total_inserted"] + result["soft_deleted"] and prewarm.SKU_PREWARM_ENABLED:
         try:
-            if os.path.exists(file_path):
-                error_dir = Path(file_path).parent / "errors"
-                error_dir.mkdir(exist_ok=True)
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                error_file = error_dir / f"error_{timestamp}_{Path(file_path).name}"
-                os.rename(file_path, error_file)
-                logger.info(f"📁 Moved failed file to: {error_file}")
-        except Exception as move_error:
-            logger.error(f"Failed to move error file: {move_error}")
-        
-        self.update_state(
-            state='FAILURE',
-            meta={
-                'status': 'Failed',
-                'error': error_msg,
-                'error_type': type(e).__name__,
-                'inserted_before_failure': total_inserted,
-                'failed_at': datetime.now().isoformat()
-            }
-        )
-        raise
\ No newline at end of file
+            prewarm_sku_cache.apply_async(kwargs={"organization": organization, "after_seq": after_seq},
+                                          priority=PRIORITY_SCHEDULED)
+            result["cache_prewarm"] = "scheduled"
+        except Exception as e:
+            logger.warning(f"⚠️ Could not schedule the SKU cache pre-warm: {e}")
+    return result
+
+
+@celery.task(name='cache.prewarm_skus', bind=True)
+def prewarm_sku_cache(self, organization: str = DEFAULT_ORGANIZATION, after_seq: int | None = None):
+    """Load a tenant's hottest and just-ingested SKUs into the lookup cache (see prewarm.warm_sku_cache)"""
+    return prewarm.warm_sku_cache(db.get_sync_engine(), organization, after_seq)
+
+
+@celery.task(name='dedupe_product_skus', bind=True, acks_late=True)
+def dedupe_product_skus(self, batch_size: int | None = None):
+    """
+    Online cleanup of duplicate SKUs (newest row wins). Run it before the
+    unique-SKU migration; it is safe to run again at any time.
+    """
+    options = {"batch_size": batch_size} if batch_size else {}
+    return dedupe_skus(db.get_sync_engine(), **options)
+
+
+async def _compact_status_counts() -> int:
+    async with AsyncSession(db.get_async_engine()) as session:
+        return await compact_status_counts(session)
+
+
+@celery.task(name='maintenance.database', bind=True, acks_late=True)
+def database_maintenance(self):
+    """
+    Nightly: expire change-feed tombstones past their retention, fold the facet
+    deltas, finish interrupted tenant drops, then ANALYZE (or VACUUM) what changed.
+    """
+    started = time.perf_counter()
+    engine = db.get_sync_engine()
+    report = {
+        "tombstones_purged": maintenance.purge_tombstones(engine),
+        "status_deltas_compacted": db.run_in_worker_loop(_compact_status_counts()),
+        "detaches_finished": maintenance.finish_pending_detaches(engine),
+    }
+    report.update(maintenance.analyze_tables(engine, maintenance.MAINTAINED_TABLES))
+    report["duration_seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(f"🧹 Database maintenance done: {report}")
+    return report
+
+
+@celery.task(name='maintenance.prune_archives', bind=True)
+def prune_upload_archives(self):
+    """Compress and expire processed and failed uploads (see maintenance.prune_archives)"""
+    return maintenance.prune_archives([PROCESSED_DIR, UPLOADS_DIR / "errors"])
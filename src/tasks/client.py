@@ -0,0 +1,22 @@
+# API-side access to Celery. The worker module (Celery app, broker settings,
+# ingest pipeline) is only imported the first time the API actually enqueues or
+# inspects a task, keeping it out of the API's cold start.
+
+from src.tenancy import DEFAULT_ORGANIZATION
+
+
+def get_celery():
+    from src.tasks.celery_worker import celery
+    return celery
+
+
+def enqueue_ingest(file_path: str, organization: str = DEFAULT_ORGANIZATION, interactive: bool = True,
+                   snapshot: bool = False, dry_run: bool = False):
+    from src.tasks.celery_worker import enqueue_ingest as _enqueue_ingest
+    return _enqueue_ingest(file_path, organization=organization, interactive=interactive,
+                           snapshot=snapshot, dry_run=dry_run)
+
+
+def get_task_result(task_id: str):
+    from celery.result import AsyncResult
+    return AsyncResult(task_id, app=get_celery())
@@ -0,0 +1,325 @@
+import codecs
+import csv
+import difflib
+import io
+import os
+from dataclasses import dataclass, field
+import importlib.util
+from typing import Iterator
+
+EXPECTED_COLUMNS = ("sku", "name", "description")
+INGEST_PARSER = os.getenv("INGEST_PARSER", "arrow")       # "arrow" or "python"
+ARROW_BLOCK_SIZE = 4 * 1024 * 1024                        # bytes parsed per arrow record batch
+
+# Every character str.strip() removes, so arrow trimming matches Python exactly
+PY_WHITESPACE = (
+    "\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f \x85\xa0\u1680"
+    "\u2000\u2001\u2002\u2003\u2004\u2005\u2006\u2007\u2008\u2009\u200a"
+    "\u2028\u2029\u202f\u205f\u3000"
+)
+
+# Reject reasons
+MISSING_SKU = "missing_sku"
+MISSING_NAME = "missing_name"
+MISSING_COLUMN = "missing_column"
+
+
+@dataclass
+class Reject:
+    row: int | None          # 1-based data row, None when the parser cannot tell
+    reason: str
+    values: dict
+
+
+@dataclass
+class ParsedBatch:
+    """Normalized product rows ready for insert, plus the rows that were rejected"""
+    rows: list[dict] = field(default_factory=list)
+    rejects: list[Reject] = field(default_factory=list)
+
+
+def normalize_row(row: dict) -> tuple[dict | None, str | None]:
+    """
+    Reference normalization for one CSV row. Returns (product values, None)
+    for a valid row or (None, reason) for a rejected one.
+    """
+    sku = row.get("sku")
+    name = row.get("name")
+    description = row.get("description")
+
+    sku = sku.strip().upper() if sku else None
+    name = name.strip() if name else None
+    description = description.strip() if description else ""
+
+    if not sku:
+        return None, MISSING_SKU
+    if not name:
+        return None, MISSING_NAME
+    return {"sku": sku, "name": name, "description": description, "status": "active"}, None
+
+
+def missing_columns(header: list[str] | None) -> list[str]:
+    return [column for column in EXPECTED_COLUMNS if column not in (header or [])]
+
+
+# Preview: what ingest accepts, and the delimiters the sniffer may detect
+INGEST_ENCODINGS = ("utf-8", "utf-8-sig")
+INGEST_DELIMITER = ","
+PREVIEW_DELIMITERS = ",;\t|"
+
+
+@dataclass
+class CsvSample:
+    """A parse of the first bytes of a CSV file, for checking it before ingest"""
+    encoding: str
+    delimiter: str
+    header: list[str]
+    missing_columns: list[str]
+    unknown_columns: list[str]
+    suggestions: dict[str, str]      # expected column -> header column that looks like it
+    problems: list[str]
+    rows: list[dict]
+    rejects: list[Reject]
+    rejects_by_reason: dict[str, int]
+    total_rows: int                  # data rows in the sample, parsed or rejected
+    total_bytes: int                 # bytes of the sample those rows came from
+
+
+def detect_encoding(data: bytes, complete: bool) -> str:
+    """Encoding of the file's first bytes: BOM, else UTF-8 if it decodes, else cp1252/latin-1"""
+    if data.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if data.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    try:
+        # incremental: a multi-byte character cut off at the end of the sample is fine
+        codecs.getincrementaldecoder("utf-8")().decode(data, final=complete)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    try:
+        data.decode("cp1252")
+        return "cp1252"
+    except UnicodeDecodeError:
+        return "latin-1"
+
+
+def detect_delimiter(text: str) -> str:
+    """Delimiter of the first lines; a file the sniffer cannot read is taken as comma-separated"""
+    try:
+        return csv.Sniffer().sniff("\n".join(text.splitlines()[:20]), delimiters=PREVIEW_DELIMITERS).delimiter
+    except csv.Error:
+        return INGEST_DELIMITER
+
+
+def _suggest(column: str, header: list[str]) -> str | None:
+    for name in header:
+        if name.strip().lower() == column:
+            return name
+    close = difflib.get_close_matches(column, [name.strip().lower() for name in header], n=1, cutoff=0.6)
+    return next((name for name in header if close and name.strip().lower() == close[0]), None)
+
+
+def sample_csv(data: bytes, complete: bool, sample_size: int = 10) -> CsvSample:
+    """
+    Parse the first bytes of a CSV the way ingest will: detect encoding and
+    delimiter, check the header and normalize the rows. When the sample is
+    not the whole file its last, partial line is dropped.
+    """
+    encoding = detect_encoding(data, complete)
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    text = decoder.decode(data, final=complete)
+    if not complete and "\n" in text:
+        text = text[:text.rindex("\n") + 1]
+    delimiter = detect_delimiter(text)
+
+    reader = csv.DictReader(io.StringIO(text, newline=""), delimiter=delimiter)
+    header = list(reader.fieldnames or [])
+    missing = missing_columns(header)
+    suggestions = {column: _suggest(column, header) for column in missing}
+    suggestions = {column: name for column, name in suggestions.items() if name}
+
+    rows: list[dict] = []
+    rejects: list[Reject] = []
+    by_reason: dict[str, int] = {}
+    total = 0
+    for total, row in enumerate(reader, 1):
+        values, reason = (None, MISSING_COLUMN) if missing else normalize_row(row)
+        if values is None:
+            by_reason[reason] = by_reason.get(reason, 0) + 1
+            if len(rejects) < sample_size:
+                rejects.append(Reject(total, reason, row))
+        elif len(rows) < sample_size:
+            rows.append(values)
+
+    problems = []
+    if encoding not in INGEST_ENCODINGS:
+        problems.append(f"File looks {encoding}-encoded; ingest reads UTF-8 only")
+    if delimiter != INGEST_DELIMITER:
+        problems.append(f"Values are separated by {delimiter!r}; ingest expects {INGEST_DELIMITER!r}")
+    if missing:
+        hints = ", ".join(
+            f"{column!r} (found {suggestions[column]!r}?)" if column in suggestions else repr(column) for column in missing
+        )
+        problems.append(f"Missing columns: {hints}")
+
+    return CsvSample(
+        encoding=encoding,
+        delimiter=delimiter,
+        header=header,
+        missing_columns=missing,
+        unknown_columns=[name for name in header if name not in EXPECTED_COLUMNS],
+        suggestions=suggestions,
+        problems=problems,
+        rows=rows,
+        rejects=rejects,
+        rejects_by_reason=by_reason,
+        total_rows=total,
+        total_bytes=len(data) if complete else data.rfind(b"\n") + 1,
+    )
+
+
+def iter_product_batches(file_path: str, batch_size: int = 1000) -> Iterator[ParsedBatch]:
+    """
+    Yield ParsedBatch objects whose `rows` hold at most batch_size products.
+    Uses the columnar arrow reader when pyarrow is installed, else the
+    row-by-row reader; both produce the same rows.
+    """
+    if INGEST_PARSER == "arrow" and importlib.util.find_spec("pyarrow") is not None:
+        return iter_product_batches_arrow(file_path, batch_size)
+    return iter_product_batches_python(file_path, batch_size)
+
+
+def iter_product_batches_python(file_path: str, batch_size: int = 1000, skip_rows: int = 0,
+                                batch: ParsedBatch | None = None) -> Iterator[ParsedBatch]:
+    """
+    Row-at-a-time reader built on csv.DictReader. The arrow reader hands over
+    to it mid-file: the first skip_rows data rows are passed over and `batch`
+    holds what was parsed before them but not yielded yet.
+    """
+    with open(file_path, mode="r", newline="", encoding="utf-8-sig") as csvfile:
+        reader = csv.DictReader(csvfile)
+        missing = missing_columns(reader.fieldnames)
+        batch = batch or ParsedBatch()
+
+        for i, row in enumerate(reader, 1):
+            if i <= skip_rows:
+                continue
+            if missing:
+                batch.rejects.append(Reject(i, MISSING_COLUMN, row))
+                continue
+            values, reason = normalize_row(row)
+            if values is None:
+                batch.rejects.append(Reject(i, reason, row))
+                continue
+            batch.rows.append(values)
+            if len(batch.rows) >= batch_size:
+                yield batch
+                batch = ParsedBatch()
+
+        if batch.rows or batch.rejects:
+            yield batch
+
+
+def _upper(array):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    # arrow's unicode upper uses simple case mapping ("ß" stays "ß"); Python's
+    # full mapping differs outside ASCII, so only ASCII columns take the kernel
+    if pc.all(pc.string_is_ascii(array)).as_py() is not False:
+        return pc.ascii_upper(array)
+    return pa.array([value.upper() if value is not None else None for value in array.to_pylist()], pa.string())
+
+
+def iter_product_batches_arrow(file_path: str, batch_size: int = 1000) -> Iterator[ParsedBatch]:
+    """
+    Columnar reader: parses the file in arrow record batches, normalizes SKU,
+    name and description with vectorized string kernels and filters invalid
+    rows with masks. Arrow drops rows with the wrong number of fields, so from
+    the first record batch that had one the rest of the file goes through the
+    python reader, which keeps file order and row numbers exactly.
+    """
+    # imported here so API processes that only need the reject helpers skip pyarrow
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+
+    with open(file_path, mode="r", newline="", encoding="utf-8-sig") as csvfile:
+        header = next(csv.reader(csvfile), None)
+    if header is None:
+        return
+    missing = missing_columns(header)
+
+    malformed: list[int | None] = []
+
+    def on_invalid_row(invalid_row):
+        malformed.append(invalid_row.number)
+        return "skip"
+
+    reader = pa_csv.open_csv(
+        file_path,
+        read_options=pa_csv.ReadOptions(block_size=ARROW_BLOCK_SIZE),
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True, invalid_row_handler=on_invalid_row),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={column: pa.string() for column in EXPECTED_COLUMNS},
+            include_columns=list(EXPECTED_COLUMNS),
+            include_missing_columns=True,
+            strings_can_be_null=False,
+        ),
+    )
+
+    pending: list[dict] = []
+    rejects: list[Reject] = []
+    row_offset = 0
+
+    for record_batch in reader:
+        if malformed:
+            # a block is parsed (and its bad rows reported) before its batch
+            # arrives, so every row before row_offset was clean and is emitted
+            yield from iter_product_batches_python(file_path, batch_size, row_offset, ParsedBatch(pending, rejects))
+            return
+        count = record_batch.num_rows
+        raw_sku = record_batch.column("sku")
+        raw_name = record_batch.column("name")
+        raw_description = record_batch.column("description")
+
+        sku = _upper(pc.utf8_trim(raw_sku, characters=PY_WHITESPACE))
+        name = pc.utf8_trim(raw_name, characters=PY_WHITESPACE)
+        description = pc.fill_null(pc.utf8_trim(raw_description, characters=PY_WHITESPACE), "")
+
+        has_sku = pc.fill_null(pc.not_equal(sku, ""), False)
+        has_name = pc.fill_null(pc.not_equal(name, ""), False)
+        valid = pc.and_(has_sku, has_name)
+        if missing:
+            valid = pa.array([False] * count)
+
+        if count and not pc.all(valid).as_py():
+            raw = pa.table({"sku": raw_sku, "name": raw_name, "description": raw_description})
+            invalid = pc.invert(valid)
+            positions = pc.indices_nonzero(invalid).to_pylist()
+            reasons = pc.if_else(has_sku, MISSING_NAME, MISSING_SKU)
+            reasons = pc.filter(reasons, invalid).to_pylist()
+            for position, reason, values in zip(positions, reasons, raw.filter(invalid).to_pylist()):
+                rejects.append(Reject(row_offset + position + 1, MISSING_COLUMN if missing else reason, values))
+
+        cleaned = pa.table({
+            "sku": sku, "name": name, "description": description,
+        }).filter(valid)
+        row_offset += count
+
+        for values in cleaned.to_pylist():
+            values["status"] = "active"
+            pending.append(values)
+
+        start = 0
+        while len(pending) - start >= batch_size:
+            yield ParsedBatch(pending[start:start + batch_size], rejects)
+            start += batch_size
+            rejects = []
+        del pending[:start]
+
+    if malformed:  # in a last block that produced no batch
+        yield from iter_product_batches_python(file_path, batch_size, row_offset, ParsedBatch(pending, rejects))
+    elif pending or rejects:
+        yield ParsedBatch(pending, rejects)
@@ -0,0 +1,154 @@
+import os
+import ssl
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel import create_engine
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Worker database settings. Every prefork child owns its pools; nothing is
+# created in the parent, so no connection is ever shared across a fork.
+WORKER_DB_POOL_SIZE = int(os.getenv("WORKER_DB_POOL_SIZE", "2"))
+WORKER_DB_WARM_CONNECTIONS = int(os.getenv("WORKER_DB_WARM_CONNECTIONS", "1"))
+INGEST_ASYNC_MODE = os.getenv("INGEST_ASYNC_MODE", "false").lower() == "true"
+INGEST_ASYNC_CONCURRENCY = int(os.getenv("INGEST_ASYNC_CONCURRENCY", "4"))   # chunks in flight per process
+# Workers get their own, longer statement budget than API requests (0 = none)
+WORKER_STATEMENT_TIMEOUT_MS = int(os.getenv("WORKER_STATEMENT_TIMEOUT_MS", "600000"))
+
+_sync_engine: Engine | None = None
+_async_engine: AsyncEngine | None = None
+_loop: asyncio.AbstractEventLoop | None = None
+_owner_pid: int | None = None
+
+
+def _service_url() -> str:
+    url = os.getenv("POSTGRES_SERVICE_URL")
+    if not url:
+        raise RuntimeError("POSTGRES_SERVICE_URL must be set")
+    return url
+
+
+def _check_owner() -> None:
+    """Drop pools inherited from a parent process instead of reusing its sockets"""
+    global _sync_engine, _async_engine, _loop, _owner_pid
+    if _owner_pid is not None and _owner_pid != os.getpid():
+        if _sync_engine is not None:
+            _sync_engine.dispose(close=False)
+        _sync_engine = None
+        _async_engine = None
+        _loop = None
+    _owner_pid = os.getpid()
+
+
+def get_sync_engine() -> Engine:
+    """This process's sync engine, created on first use"""
+    global _sync_engine
+    _check_owner()
+    if _sync_engine is None:
+        sync_url = _service_url().replace("postgresql+asyncpg://", "postgresql://")
+        _sync_engine = create_engine(
+            sync_url,
+            connect_args={"sslmode": "require", "options": f"-c statement_timeout={WORKER_STATEMENT_TIMEOUT_MS}"},
+            pool_size=WORKER_DB_POOL_SIZE,
+            max_overflow=0,
+            pool_pre_ping=True,
+            pool_recycle=3600,
+            echo=False,
+        )
+    return _sync_engine
+
+
+def set_sync_engine(engine: Engine | None) -> None:
+    """Install an engine for this process (tests, benchmarks, solo pools)"""
+    global _sync_engine, _owner_pid
+    _sync_engine = engine
+    _owner_pid = os.getpid()
+
+
+def get_async_engine() -> AsyncEngine:
+    """This process's asyncpg-backed pool for the async ingest mode"""
+    global _async_engine
+    _check_owner()
+    if _async_engine is None:
+        ssl_context = ssl.create_default_context()
+        ssl_context.check_hostname = False
+        ssl_context.verify_mode = ssl.CERT_NONE
+        _async_engine = create_async_engine(
+            _service_url(),
+            connect_args={"ssl": ssl_context, "server_settings": {"statement_timeout": str(WORKER_STATEMENT_TIMEOUT_MS)}},
+            pool_size=INGEST_ASYNC_CONCURRENCY,
+            max_overflow=0,
+            pool_pre_ping=True,
+            pool_recycle=3600,
+            echo=False,
+        )
+    return _async_engine
+
+
+def set_async_engine(engine: AsyncEngine | None) -> None:
+    global _async_engine, _owner_pid
+    _async_engine = engine
+    _owner_pid = os.getpid()
+
+
+def get_worker_loop() -> asyncio.AbstractEventLoop:
+    """One event loop per worker process; async pools are bound to it"""
+    global _loop
+    _check_owner()
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+    return _loop
+
+
+def run_in_worker_loop(coro):
+    """Run a coroutine to completion on the worker loop from sync task code"""
+    return get_worker_loop().run_until_complete(coro)
+
+
+def warm_up_sync(engine: Engine, connections: int) -> None:
+    """Open `connections` pooled connections up front (connect + TLS handshake)"""
+    def ping(_):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+    with ThreadPoolExecutor(max_workers=max(connections, 1)) as pool:
+        list(pool.map(ping, range(connections)))
+
+
+async def warm_up_async(engine: AsyncEngine, connections: int) -> None:
+    async def ping():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(ping() for _ in range(connections)))
+
+
+def init_process_pools() -> None:
+    """Create and warm this worker process's pools"""
+    engine = get_sync_engine()
+    warm_up_sync(engine, min(WORKER_DB_WARM_CONNECTIONS, WORKER_DB_POOL_SIZE))
+    if INGEST_ASYNC_MODE:
+        run_in_worker_loop(warm_up_async(get_async_engine(), INGEST_ASYNC_CONCURRENCY))
+    logger.info(f"🔌 Worker {os.getpid()} database pools ready")
+
+
+def dispose_process_pools() -> None:
+    """Close this worker process's connections"""
+    global _sync_engine, _async_engine, _loop
+    if _sync_engine is not None:
+        _sync_engine.dispose()
+        _sync_engine = None
+    if _async_engine is not None:
+        run_in_worker_loop(_async_engine.dispose())
+        _async_engine = None
+    if _loop is not None and not _loop.is_closed():
+        _loop.close()
+    _loop = None
+    logger.info(f"🔌 Worker {os.getpid()} database pools closed")
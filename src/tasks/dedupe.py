@@ -0,0 +1,76 @@
+import time
+import logging
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.engine import Engine
+
+from src.products.service import limit_write_transaction
+
+logger = logging.getLogger(__name__)
+
+# Settings for the online SKU cleanup
+DEDUPE_BATCH_SIZE = 1000       # rows deleted per transaction
+DEDUPE_PAUSE_SECONDS = 0.05    # breather between batches so live traffic keeps the locks
+DEDUPE_MAX_PASSES = 5          # rescans to catch duplicates written while we ran
+
+# Every row that has a newer row with the same SKU in its organization. sku is
+# CITEXT on Postgres (NOCASE on SQLite), so the partition is case-insensitive
+# like the unique index.
+DUPLICATE_IDS_SQL = text("""
+SELECT organization, id FROM (
+    SELECT organization, id, row_number() OVER (PARTITION BY organization, sku ORDER BY id DESC) AS newest
+    FROM product
+) AS ranked
+WHERE newest > 1
+ORDER BY organization, id
+""")
+
+
+# the primary key is (organization, id): naming the tenant prunes to its partition
+DELETE_IDS_SQL = text(
+    "DELETE FROM product WHERE organization = :organization AND id IN :ids"
+).bindparams(bindparam("ids", expanding=True))
+
+
+def _delete_batch(engine: Engine, organization: str, ids: list[int]) -> int:
+    # primary-key deletes in their own short transaction: row locks only
+    with engine.begin() as conn:
+        limit_write_transaction(conn, time.monotonic())
+        return conn.execute(DELETE_IDS_SQL, {"organization": organization, "ids": ids}).rowcount
+
+
+def dedupe_skus(engine: Engine, batch_size: int = DEDUPE_BATCH_SIZE, pause: float = DEDUPE_PAUSE_SECONDS,
+                max_passes: int = DEDUPE_MAX_PASSES) -> dict:
+    """
+    Delete duplicate products, keeping the newest (highest id) row per SKU
+    within each organization. One read-only scan finds the doomed ids, then
+    they are deleted by primary key in small transactions. Passes repeat until a scan finds nothing, so
+    duplicates written during the run are caught too.
+    """
+    started = time.perf_counter()
+    deleted = 0
+    passes = 0
+
+    while passes < max_passes:
+        passes += 1
+        by_organization: dict[str, list[int]] = {}
+        with engine.connect() as conn:
+            for organization, id in conn.execute(DUPLICATE_IDS_SQL):
+                by_organization.setdefault(organization, []).append(id)
+        if not by_organization:
+            break
+
+        logger.info(f"🧹 Pass {passes}: {sum(map(len, by_organization.values())):,} duplicate products to delete")
+        for organization, ids in by_organization.items():
+            for start in range(0, len(ids), batch_size):
+                deleted += _delete_batch(engine, organization, ids[start:start + batch_size])
+                if pause:
+                    time.sleep(pause)
+
+    result = {
+        "deleted": deleted,
+        "passes": passes,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+    logger.info(f"✅ SKU dedupe finished: {result}")
+    return result
@@ -0,0 +1,516 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+from datetime import datetime, timezone
+from pathlib import Path
+
+from sqlalchemy import bindparam, delete, exists, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from src.products.cache import invalidate_organization
+from src.products.model import IngestSeenSku, Product
+from src.products.service import (
+    ensure_partition, ensure_partition_sync, limit_write_transaction, product_content_hash, product_insert,
+)
+from src.redis import get_redis, run_sync
+from src.tasks import db
+from src.tasks.batching import AdaptiveBatcher, row_wal_bytes
+from src.tasks.csv_reader import iter_product_batches
+from src.tasks.memory import MemoryMonitor
+from src.tasks.rejects import RejectWriter, rejects_file_path
+from src.tasks.throughput import record_ingest_throughput
+from src.tenancy import DEFAULT_ORGANIZATION
+
+logger = logging.getLogger(__name__)
+
+# Stored hashes of one batch's SKUs, compared in bulk before anything is written
+STORED_HASHES = select(Product.sku, Product.content_hash, Product.deleted_at).where(
+    Product.organization == bindparam("organization"),
+    Product.sku.in_(bindparam("skus", expanding=True)),
+)
+
+# Full snapshots: every SKU the file lists is recorded under the run's id as it
+# is read, then the tenant's live products it does not list are soft-deleted,
+# one id range per transaction. Rows written since the ingest started are left alone.
+_UNSEEN = [
+    Product.organization == bindparam("tenant"),  # column names are reserved for SET in an UPDATE
+    Product.deleted_at.is_(None),
+    Product.updated_at < bindparam("started"),
+    ~exists().where(IngestSeenSku.run_id == bindparam("run_id"), IngestSeenSku.sku == Product.sku),
+]
+_ID_WINDOW = select(Product.id).where(
+    Product.organization == bindparam("tenant"),
+    Product.id > bindparam("after"),
+).order_by(Product.id).limit(bindparam("limit")).subquery()
+ID_WINDOW_END = select(func.max(_ID_WINDOW.c.id))
+SOFT_DELETE_UNSEEN = update(Product).where(
+    *_UNSEEN, Product.id > bindparam("after"), Product.id <= bindparam("upto"),
+).values(deleted_at=bindparam("now"))
+COUNT_UNSEEN = select(func.count()).select_from(Product).where(*_UNSEEN)
+FORGET_SEEN = delete(IngestSeenSku).where(
+    IngestSeenSku.run_id == bindparam("run_id"),
+    IngestSeenSku.sku.in_(select(IngestSeenSku.sku).where(IngestSeenSku.run_id == bindparam("run_id"))
+                          .limit(bindparam("limit"))),
+)
+
+
+def seen_insert(dialect: str = "postgresql"):
+    """Record SKUs a snapshot lists; a SKU listed twice (or also rejected) is recorded once"""
+    insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+    return insert(IngestSeenSku).on_conflict_do_nothing()
+
+
+def stamp_cached_products(organization: str) -> None:
+    """Mark every cached lookup of the tenant read so far as stale (after committed writes)"""
+    try:
+        run_sync(invalidate_organization(get_redis(), organization))
+    except Exception as e:
+        logger.warning(f"⚠️ Could not invalidate the SKU cache of {organization}: {e}")
+
+
+def dedupe_rows(rows: list[dict]) -> list[dict]:
+    """
+    Keep the last row per SKU. One statement may not upsert the same key twice,
+    so duplicates inside a batch are collapsed first (later rows win, like
+    they would if written one after another).
+    """
+    by_sku = {row["sku"]: row for row in rows}
+    return rows if len(by_sku) == len(rows) else list(by_sku.values())
+
+
+class CsvIngest:
+    """
+    One run of a CSV ingest: parses the file in batches, writes the new and
+    changed rows through this worker process's pool, streams rejects to a side
+    file and reports progress on the Celery task. A full snapshot also
+    soft-deletes the tenant's products the file does not list, tracking the
+    SKUs it lists in a staging table rather than in memory. A dry run does all
+    of the parsing, validation and comparing but writes nothing to the catalog.
+
+    Statement and transaction sizes adapt to the measured write speed (see
+    AdaptiveBatcher). Memory stays flat in the file size: rows are plain dicts that live for one
+    batch (no ORM objects, no Session identity map), and past the memory
+    ceiling the ingest stops reading until the writes in flight drain.
+    """
+
+    # Performance settings: starting sizes, adjusted by AdaptiveBatcher
+    BATCH_SIZE = 1000          # Insert 1000 records at once
+    COMMIT_FREQUENCY = 5000    # Commit every 5000 records
+
+    def __init__(self, task, file_path: str, semaphore=None, async_mode: bool | None = None,
+                 organization: str = DEFAULT_ORGANIZATION, snapshot: bool = False, dry_run: bool = False):
+        self.task = task
+        self.file_path = file_path
+        self.organization = organization
+        self.snapshot = snapshot
+        self.dry_run = dry_run
+        self.semaphore = semaphore
+        self.async_mode = db.INGEST_ASYNC_MODE if async_mode is None else async_mode
+        self.start_time = datetime.now()
+        self.started_at = datetime.now(timezone.utc)
+        self.total_rows = 0
+        self.total_inserted = 0     # rows written: new + changed
+        self.total_new = 0
+        self.total_changed = 0
+        self.total_unchanged = 0
+        self.total_duplicates = 0
+        self.total_soft_deleted = 0     # would-be count in a dry run
+        self.stamped_writes = 0         # rows written when the SKU cache was last invalidated
+        self.run_id = uuid.uuid4().hex      # keys this run's rows in the snapshot staging table
+        self.total_seen = 0                 # SKUs recorded there (a duplicate or rejected one may count twice)
+        self.rejected_skus: list[str] = []  # rejected since the last statement, recorded with the next one
+        self.mark_seen = None
+        self.memory = MemoryMonitor()
+        self.batcher = AdaptiveBatcher(self.BATCH_SIZE, self.COMMIT_FREQUENCY)
+        self.processed_dir = Path(file_path).parent / "processed"
+        self.rejects = RejectWriter(rejects_file_path(self.processed_dir, task.request.id or Path(file_path).stem))
+
+    def run(self) -> dict:
+        logger.info(f"🚀 Starting bulk CSV insert: {self.file_path}")
+        try:
+            with self.rejects, self.memory:
+                #  Count total rows for progress tracking
+                with open(self.file_path, mode='r', newline='', encoding='utf-8') as csvfile:
+                    self.total_rows = sum(1 for _ in csvfile)
+                logger.info(f"📊 Total rows to insert: {self.total_rows:,}")
+
+                try:
+                    if self.async_mode:
+                        db.run_in_worker_loop(self._write_async())
+                    else:
+                        self._write_sync()
+                finally:
+                    if self.snapshot:
+                        self._forget_seen()
+
+            return self._complete()
+        except Exception as e:
+            self._fail(e)
+            raise
+
+    def _batches(self):
+        """
+        Statements' worth of parsed rows, at the batcher's current size, with
+        rejects already streamed to the side file. The file is parsed in
+        minimum-size batches so a size change applies to the next statement.
+        """
+        pending: list[dict] = []
+        for batch in iter_product_batches(self.file_path, self.batcher.min_batch):
+            self.rejects.write(batch.rejects)
+            if self.snapshot:
+                # a rejected row still names a SKU the catalog should keep
+                self.rejected_skus.extend(
+                    reject.values["sku"].strip() for reject in batch.rejects if (reject.values.get("sku") or "").strip()
+                )
+            pending.extend(batch.rows)
+            if len(pending) >= self.batcher.batch_size:
+                yield self._prepare(pending)
+                pending = []
+        if pending:
+            yield self._prepare(pending)
+
+    def _prepare(self, rows: list[dict]) -> list[dict]:
+        unique = dedupe_rows(rows)
+        self.total_duplicates += len(rows) - len(unique)
+        for row in unique:
+            row["organization"] = self.organization
+            row["content_hash"] = product_content_hash(row["name"], row["description"], row["status"])
+        return unique
+
+    def _write_statement(self, conn, upsert, rows: list[dict], txn_started: float) -> int:
+        """Upsert the new and changed rows of one statement's worth; returns the WAL bytes written"""
+        started = time.monotonic()
+        limit_write_transaction(conn, txn_started)
+        if self.snapshot:
+            self._mark_seen(conn, [row["sku"] for row in rows])
+        changed = self._changed_rows(conn, rows)
+        nbytes = 0
+        if changed and not self.dry_run:
+            conn.execute(upsert, changed)
+            self.total_inserted += len(changed)
+            nbytes = sum(row_wal_bytes(row) for row in changed)
+        self.batcher.statement(len(rows), time.monotonic() - started)
+        return nbytes
+
+    def _changed_rows(self, conn, rows: list[dict]) -> list[dict]:
+        """The rows that are new or differ from the stored product; the rest are counted as unchanged"""
+        stored = {
+            sku.lower(): (content_hash, deleted_at)
+            for sku, content_hash, deleted_at in conn.execute(
+                STORED_HASHES, {"organization": self.organization, "skus": [row["sku"] for row in rows]}
+            )
+        }
+        changed = []
+        for row in rows:
+            current = stored.get(row["sku"].lower())
+            if current is None:
+                self.total_new += 1
+            elif current == (row["content_hash"], None):
+                self.total_unchanged += 1
+                continue
+            else:
+                self.total_changed += 1
+            changed.append(row)
+        return changed
+
+    def _mark_seen(self, conn, skus: list[str]) -> None:
+        """Record `skus`, and the SKUs rejected so far, as listed by this snapshot run"""
+        skus, self.rejected_skus = skus + self.rejected_skus, []
+        if skus:
+            conn.execute(self.mark_seen, [{"run_id": self.run_id, "sku": sku} for sku in skus])
+            self.total_seen += len(skus)
+
+    def _unseen_params(self) -> dict:
+        return {"tenant": self.organization, "started": self.started_at, "run_id": self.run_id}
+
+    def _count_unseen(self, conn) -> None:
+        self.total_soft_deleted = conn.execute(COUNT_UNSEEN, self._unseen_params()).scalar()
+
+    def _soft_delete_window(self, conn, after: int) -> int | None:
+        """Soft-delete the unlisted products among the tenant's next BATCH_SIZE ids; the last id, None when done"""
+        limit_write_transaction(conn, time.monotonic())
+        upto = conn.execute(ID_WINDOW_END, {"tenant": self.organization, "after": after, "limit": self.BATCH_SIZE}).scalar()
+        if upto is not None:
+            self.total_soft_deleted += conn.execute(SOFT_DELETE_UNSEEN, {
+                **self._unseen_params(), "after": after, "upto": upto, "now": datetime.now(timezone.utc),
+            }).rowcount
+        return upto
+
+    def _forget_seen_batch(self, conn) -> bool:
+        """Delete a batch of the run's staging rows; True while there may be more"""
+        return conn.execute(FORGET_SEEN, {"run_id": self.run_id, "limit": self.BATCH_SIZE}).rowcount == self.BATCH_SIZE
+
+    def _forget_seen(self) -> None:
+        """Remove the run's staging rows, in short transactions; a failure here only leaves unused rows behind"""
+        try:
+            if self.async_mode:
+                db.run_in_worker_loop(self._forget_seen_async())
+                return
+            more = True
+            while more:
+                with db.get_sync_engine().begin() as conn:
+                    more = self._forget_seen_batch(conn)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not remove the snapshot staging rows of run {self.run_id}: {e}")
+
+    async def _forget_seen_async(self) -> None:
+        more = True
+        while more:
+            async with db.get_async_engine().begin() as conn:
+                more = await conn.run_sync(self._forget_seen_batch)
+
+    def _should_soft_delete(self) -> bool:
+        # a file that yielded no products is far more likely broken than an empty catalog
+        return self.snapshot and self.total_seen > 0
+
+    def _write_sync(self) -> None:
+        engine = db.get_sync_engine()
+        if not self.dry_run:
+            ensure_partition_sync(engine, self.organization)
+        upsert = product_insert(engine.dialect.name, skip_unchanged=True)
+        self.mark_seen = seen_insert(engine.dialect.name)
+        with engine.connect() as conn:
+            # Parsing, cleaning and validation happen column-wise in csv_reader;
+            # each batch arrives as plain dicts ready for one multi-row upsert
+            txn_rows = txn_bytes = 0
+            txn_started = time.monotonic()
+            for rows in self._batches():
+                txn_bytes += self._write_statement(conn, upsert, rows, txn_started)
+                txn_rows += len(rows)
+
+                #  Progress update and commit; over the memory ceiling the
+                #  open transaction is the only buffer left to drain
+                over_limit = self.memory.over_limit()
+                if over_limit or self.batcher.should_commit(txn_rows, txn_bytes, time.monotonic() - txn_started):
+                    conn.commit()
+                    self.batcher.commit(txn_rows, txn_bytes, time.monotonic() - txn_started)
+                    self._report_progress()
+                    txn_rows = txn_bytes = 0
+                    txn_started = time.monotonic()
+                if over_limit:
+                    self.memory.relieve()
+
+            #  Final commit, with the SKUs rejected after the last statement
+            if self.snapshot:
+                self._mark_seen(conn, [])
+            conn.commit()
+
+        if self._should_soft_delete():
+            if self.dry_run:
+                with engine.connect() as conn:
+                    self._count_unseen(conn)
+                return
+            after = 0
+            while after is not None:
+                with engine.begin() as conn:
+                    after = self._soft_delete_window(conn, after)
+
+    async def _write_async(self) -> None:
+        """
+        Async mode: chunks of the batcher's commit size are written
+        concurrently, each in its own transaction (or several, should one hit
+        the transaction budgets), on this process's asyncpg pool. Parsing the
+        next chunk overlaps with the inserts already in flight. A chunk holding
+        a SKU that an earlier chunk is still writing waits for it first, so the
+        file's last row per SKU wins, as it does in the sync path.
+        """
+        engine = db.get_async_engine()
+        if not self.dry_run:
+            await ensure_partition(engine, self.organization)
+        upsert = product_insert(engine.dialect.name, skip_unchanged=True)
+        self.mark_seen = seen_insert(engine.dialect.name)
+        slots = asyncio.Semaphore(db.INGEST_ASYNC_CONCURRENCY)
+        in_flight: set[asyncio.Task] = set()
+        owners: dict[str, asyncio.Task] = {}   # lower-cased SKU -> the chunk in flight writing it
+        failures: list[BaseException] = []
+
+        async def wait_for_earlier(chunk: list[dict]) -> set[str]:
+            """Wait for the chunks in flight that write any of `chunk`'s SKUs; returns its SKUs"""
+            skus = {row["sku"].lower() for row in chunk}
+            earlier = {owners[sku] for sku in skus if sku in owners}
+            if earlier:
+                await asyncio.gather(*earlier)
+            return skus
+
+        def release_skus(task: asyncio.Task, skus: set[str]) -> None:
+            for sku in skus:
+                if owners.get(sku) is task:
+                    del owners[sku]
+
+        async def write_chunk(chunk: list[dict]) -> None:
+            # SKU order gives concurrent chunks the same row-lock order (no deadlocks)
+            unique = sorted(dedupe_rows(chunk), key=lambda row: row["sku"])
+            self.total_duplicates += len(chunk) - len(unique)
+            chunk = unique
+            position = 0
+            try:
+                while position < len(chunk):
+                    txn_rows = txn_bytes = 0
+                    txn_started = time.monotonic()
+                    async with engine.begin() as conn:
+                        while position < len(chunk) and not self.batcher.should_commit(
+                                txn_rows, txn_bytes, time.monotonic() - txn_started):
+                            rows = chunk[position:position + self.batcher.batch_size]
+                            position += len(rows)
+                            txn_bytes += await conn.run_sync(self._write_statement, upsert, rows, txn_started)
+                            txn_rows += len(rows)
+                    self.batcher.commit(txn_rows, txn_bytes, time.monotonic() - txn_started)
+                self._report_progress()
+            except Exception as e:
+                failures.append(e)
+            finally:
+                slots.release()
+
+        chunk: list[dict] = []
+        for rows in self._batches():
+            chunk.extend(rows)
+            if len(chunk) < self.batcher.commit_size:
+                continue
+            if self.memory.over_limit() and in_flight:
+                # backpressure: parse nothing more until the chunks in flight are written
+                await asyncio.gather(*in_flight)
+                self.memory.relieve()
+            skus = await wait_for_earlier(chunk)
+            await slots.acquire()
+            if failures:
+                break
+            task = asyncio.ensure_future(write_chunk(chunk))
+            in_flight.add(task)
+            owners.update(dict.fromkeys(skus, task))
+            task.add_done_callback(in_flight.discard)
+            task.add_done_callback(lambda done, skus=skus: release_skus(done, skus))
+            chunk = []
+            await asyncio.sleep(0)  # let the new insert hit the wire before parsing on
+
+        if chunk and not failures:
+            await wait_for_earlier(chunk)
+            await slots.acquire()
+            await write_chunk(chunk)
+        if in_flight:
+            await asyncio.gather(*in_flight)
+        if failures:
+            raise failures[0]
+
+        if self.snapshot and self.rejected_skus:
+            async with engine.begin() as conn:
+                await conn.run_sync(self._mark_seen, [])
+        if self._should_soft_delete():
+            if self.dry_run:
+                async with engine.connect() as conn:
+                    await conn.run_sync(self._count_unseen)
+                return
+            after = 0
+            while after is not None:
+                async with engine.begin() as conn:
+                    after = await conn.run_sync(self._soft_delete_window, after)
+
+    def stamp_cache(self) -> None:
+        """Invalidate the tenant's cached lookups if rows were written since the last time"""
+        writes = self.total_inserted + self.total_soft_deleted
+        if not self.dry_run and writes > self.stamped_writes:
+            self.stamped_writes = writes
+            stamp_cached_products(self.organization)
+
+    def _processed(self) -> int:
+        return self.total_new + self.total_changed + self.total_unchanged
+
+    def _report_progress(self) -> None:
+        if self.semaphore:
+            run_sync(self.semaphore.refresh(self.task.request.id))
+        self.stamp_cache()  # after each commit: lookups cached before it must not outlive it
+        self.memory.sample()
+        elapsed = (datetime.now() - self.start_time).total_seconds()
+        rate = self._processed() / elapsed if elapsed > 0 else 0
+        progress = (self._processed() / self.total_rows) * 100 if self.total_rows else 0
+
+        self.task.update_state(
+            state='PROGRESS',
+            meta={
+                'status': f'Inserting batch {self._processed()//self.BATCH_SIZE}',
+                'progress': progress,
+                'inserted': self.total_inserted,
+                'unchanged': self.total_unchanged,
+                'total': self.total_rows,
+                'rate': f'{rate:.0f} records/sec',
+                'rejected': self.rejects.total,
+                'peak_rss_mb': self.memory.summary()["peak_rss_mb"],
+                **self.batcher.sizes(),
+            }
+        )
+        logger.info(f"📊 Processed {self._processed():,}/{self.total_rows:,} ({progress:.1f}%), "
+                    f"{self.total_unchanged:,} unchanged - {rate:.0f} records/sec")
+
+    def _complete(self) -> dict:
+        if self.rejects.total:
+            logger.warning(f"⚠️ Rejected {self.rejects.total:,} rows {dict(self.rejects.counts)} -> {self.rejects.path}")
+
+        # Move to processed folder
+        self.processed_dir.mkdir(exist_ok=True)
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        processed_file = self.processed_dir / f"processed_{timestamp}_{Path(self.file_path).name}"
+        os.rename(self.file_path, processed_file)
+
+        processing_time = (datetime.now() - self.start_time).total_seconds()
+        if not self.dry_run:
+            self._record_throughput(processing_time)
+
+        result = {
+            "status": "completed",
+            "dry_run": self.dry_run,
+            "file_name": Path(self.file_path).name,
+            "organization": self.organization,
+            "total_inserted": self.total_inserted,
+            "new": self.total_new,
+            "changed": self.total_changed,
+            "unchanged": self.total_unchanged,
+            "soft_deleted": self.total_soft_deleted,
+            "duplicate_rows": self.total_duplicates,
+            "processing_time_seconds": round(processing_time, 2),
+            "records_per_second": round(self._processed() / processing_time, 2) if processing_time > 0 else 0,
+            "processed_file": str(processed_file),
+            **self.rejects.summary(),
+            **self.memory.summary(),
+            **self.batcher.sizes(),
+            "completed_at": datetime.now().isoformat()
+        }
+
+        logger.info(f"✅ Bulk insert completed: {result}")
+        return result
+
+    def _record_throughput(self, seconds: float) -> None:
+        # feeds the upload time estimates of POST /products/csv/preview
+        try:
+            run_sync(record_ingest_throughput(get_redis(), self._processed(), seconds))
+        except Exception as e:
+            logger.warning(f"⚠️ Could not record ingest throughput: {e}")
+
+    def _fail(self, e: Exception) -> None:
+        error_msg = str(e)
+        logger.error(f"Bulk CSV insert failed: {error_msg}")
+
+        # Move failed file to errors folder
+        try:
+            if os.path.exists(self.file_path):
+                error_dir = Path(self.file_path).parent / "errors"
+                error_dir.mkdir(exist_ok=True)
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                error_file = error_dir / f"error_{timestamp}_{Path(self.file_path).name}"
+                os.rename(self.file_path, error_file)
+                logger.info(f"📁 Moved failed file to: {error_file}")
+        except Exception as move_error:
+            logger.error(f"Failed to move error file: {move_error}")
+
+        self.task.update_state(
+            state='FAILURE',
+            meta={
+                'status': 'Failed',
+                'error': error_msg,
+                'error_type': type(e).__name__,
+                'inserted_before_failure': self.total_inserted,
+                **self.rejects.summary(),
+                'failed_at': datetime.now().isoformat()
+            }
+        )
@@ -0,0 +1,193 @@
+import os
+import gzip
+import time
+import shutil
+import logging
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from src.products.ddl import CHANGE_HORIZON_TABLE, STATUS_DELTA_TABLE, TOMBSTONE_TABLE
+from src.tenancy import partition_name
+
+logger = logging.getLogger(__name__)
+
+# Maintenance settings (see the beat schedule in celery_worker.py)
+MAINTENANCE_VACUUM = os.getenv("MAINTENANCE_VACUUM", "false").lower() == "true"   # VACUUM as well as ANALYZE
+ANALYZE_AFTER_INGEST_MIN_ROWS = int(os.getenv("ANALYZE_AFTER_INGEST_MIN_ROWS", "1000"))
+ARCHIVE_MAX_AGE_DAYS = float(os.getenv("ARCHIVE_MAX_AGE_DAYS", "30"))
+ARCHIVE_MAX_MB = float(os.getenv("ARCHIVE_MAX_MB", "2048"))          # processed/ and errors/ together
+ARCHIVE_COMPRESS_AFTER_DAYS = float(os.getenv("ARCHIVE_COMPRESS_AFTER_DAYS", "1"))
+TOMBSTONE_RETENTION_DAYS = float(os.getenv("TOMBSTONE_RETENTION_DAYS", "30"))  # change-feed clients must poll within this
+TOMBSTONE_PURGE_BATCH = 5000
+
+# analyzed nightly; the partitioned product table recurses into every partition
+MAINTAINED_TABLES = ["product", TOMBSTONE_TABLE, STATUS_DELTA_TABLE]
+
+# archived uploads are compressed; rejects files stay plain for the download endpoint
+COMPRESSIBLE_PREFIXES = ("processed_", "error_")
+
+PURGE_TOMBSTONES_SQL = text(f"""
+DELETE FROM {TOMBSTONE_TABLE} WHERE change_seq IN (
+    SELECT change_seq FROM {TOMBSTONE_TABLE} WHERE deleted_at < :cutoff ORDER BY change_seq LIMIT :limit
+) RETURNING organization, change_seq
+""")
+
+# in the purge's transaction, so the horizon never lags the tombstones it covers
+RAISE_CHANGE_HORIZON_SQL = text(f"""
+INSERT INTO {CHANGE_HORIZON_TABLE} (organization, purged_seq) VALUES (:organization, :purged_seq)
+ON CONFLICT (organization) DO UPDATE SET purged_seq = CASE
+    WHEN excluded.purged_seq > {CHANGE_HORIZON_TABLE}.purged_seq THEN excluded.purged_seq
+    ELSE {CHANGE_HORIZON_TABLE}.purged_seq
+END
+""")
+
+# partitions left mid-detach by an interrupted tenant drop (see drop_tenant_catalog)
+PENDING_DETACHES_SQL = text("""
+SELECT c.relname FROM pg_inherits AS i JOIN pg_class AS c ON c.oid = i.inhrelid
+WHERE i.inhparent = 'product'::regclass AND i.inhdetachpending
+""")
+
+RELATION_BYTES_SQL = text("SELECT coalesce(pg_total_relation_size(to_regclass(:name)), 0)")
+
+
+def ingest_tables(engine: Engine, organization: str) -> list[str]:
+    """The tables an ingest into `organization` writes to"""
+    product = partition_name(organization) if engine.dialect.name == "postgresql" else "product"
+    return [product, STATUS_DELTA_TABLE]
+
+
+def _database_bytes(conn: Connection, tables: list[str]) -> int:
+    if conn.dialect.name == "postgresql":
+        return sum(conn.execute(RELATION_BYTES_SQL, {"name": table}).scalar() for table in tables)
+    # SQLite: VACUUM rebuilds the whole file, so measure the whole file
+    return conn.exec_driver_sql("PRAGMA page_count").scalar() * conn.exec_driver_sql("PRAGMA page_size").scalar()
+
+
+def analyze_tables(engine: Engine, tables: list[str], vacuum: bool = MAINTENANCE_VACUUM) -> dict:
+    """
+    Refresh planner statistics of `tables` (and VACUUM them when asked). Runs
+    outside a transaction, as VACUUM requires; ANALYZE only samples the table.
+    """
+    started = time.perf_counter()
+    postgres = engine.dialect.name == "postgresql"
+    if postgres:
+        statements = [f"VACUUM (ANALYZE) {table}" if vacuum else f"ANALYZE {table}" for table in tables]
+    else:
+        statements = [f"ANALYZE {table}" for table in tables] + (["VACUUM"] if vacuum else [])
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        before = _database_bytes(conn, tables)
+        if postgres:
+            conn.exec_driver_sql("SET statement_timeout = 0")  # a VACUUM may outlast the worker budget
+        try:
+            for statement in statements:
+                conn.exec_driver_sql(statement)
+        finally:
+            if postgres:
+                conn.exec_driver_sql("RESET statement_timeout")
+        after = _database_bytes(conn, tables)
+    report = {
+        "tables": tables,
+        "vacuum": vacuum,
+        "bytes_reclaimed": max(before - after, 0),
+        "duration_seconds": round(time.perf_counter() - started, 3),
+    }
+    logger.info(f"🧹 {'Vacuumed' if vacuum else 'Analyzed'} {', '.join(tables)}: {report}")
+    return report
+
+
+def purge_tombstones(engine: Engine, retention_days: float = TOMBSTONE_RETENTION_DAYS,
+                     batch_size: int = TOMBSTONE_PURGE_BATCH) -> int:
+    """
+    Delete change-feed tombstones older than the retention, in short
+    transactions, raising each tenant's change horizon to the highest seq purged
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    purged = 0
+    while True:
+        with engine.begin() as conn:
+            horizons: dict[str, int] = {}
+            deleted = conn.execute(PURGE_TOMBSTONES_SQL, {"cutoff": cutoff, "limit": batch_size}).all()
+            for organization, change_seq in deleted:
+                horizons[organization] = max(change_seq, horizons.get(organization, 0))
+            if horizons:
+                conn.execute(RAISE_CHANGE_HORIZON_SQL, [
+                    {"organization": organization, "purged_seq": seq} for organization, seq in horizons.items()
+                ])
+        purged += len(deleted)
+        if len(deleted) < batch_size:
+            return purged
+
+
+def finish_pending_detaches(engine: Engine) -> list[str]:
+    """Complete tenant drops that were interrupted between DETACH and DROP"""
+    if engine.dialect.name != "postgresql":
+        return []
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        names = list(conn.execute(PENDING_DETACHES_SQL).scalars())
+        for name in names:
+            conn.exec_driver_sql(f"ALTER TABLE product DETACH PARTITION {name} FINALIZE")
+            conn.exec_driver_sql(f"DROP TABLE IF EXISTS {name}")
+            logger.info(f"🧹 Finished the pending detach of {name}")
+    return names
+
+
+def prune_archives(directories: list[Path], max_age_days: float = ARCHIVE_MAX_AGE_DAYS,
+                   max_bytes: float = ARCHIVE_MAX_MB * 1024 * 1024,
+                   compress_after_days: float = ARCHIVE_COMPRESS_AFTER_DAYS) -> dict:
+    """
+    Keep the upload archives bounded: gzip archived CSVs after
+    compress_after_days, delete every file after max_age_days, then delete the
+    oldest files until all directories together fit in max_bytes.
+    """
+    started = time.perf_counter()
+    now = time.time()
+    deleted = compressed = reclaimed = 0
+    files: list[tuple[float, int, Path]] = []
+
+    for directory in directories:
+        if not directory.is_dir():
+            continue
+        for path in directory.iterdir():
+            if not path.is_file():
+                continue
+            stat = path.stat()
+            age_days = (now - stat.st_mtime) / 86400
+            if age_days > max_age_days:
+                path.unlink()
+                deleted += 1
+                reclaimed += stat.st_size
+                continue
+            if age_days > compress_after_days and path.suffix == ".csv" and path.name.startswith(COMPRESSIBLE_PREFIXES):
+                target = path.with_name(path.name + ".gz")
+                with open(path, "rb") as source, gzip.open(target, "wb") as sink:
+                    shutil.copyfileobj(source, sink)
+                os.utime(target, (stat.st_atime, stat.st_mtime))  # age still counts from archiving
+                path.unlink()
+                compressed += 1
+                reclaimed += stat.st_size - target.stat().st_size
+                path, stat = target, target.stat()
+            files.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        path.unlink()
+        deleted += 1
+        reclaimed += size
+        total -= size
+
+    report = {
+        "files_deleted": deleted,
+        "files_compressed": compressed,
+        "bytes_reclaimed": reclaimed,
+        "bytes_remaining": total,
+        "duration_seconds": round(time.perf_counter() - started, 3),
+    }
+    logger.info(f"🧹 Pruned upload archives: {report}")
+    return report
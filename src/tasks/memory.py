@@ -0,0 +1,98 @@
+import gc
+import os
+import time
+import logging
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+# Ingest memory settings. Past INGEST_MEMORY_LIMIT_MB of RSS an ingest stops
+# reading ahead until its writes drain (0 disables the ceiling); the same value
+# recycles a worker child whose memory stays above it after a task.
+INGEST_MEMORY_LIMIT_MB = int(os.getenv("INGEST_MEMORY_LIMIT_MB", "0"))
+INGEST_TRACE_MEMORY = os.getenv("INGEST_TRACE_MEMORY", "false").lower() == "true"  # Python heap peak, ~2x slower
+# RSS rarely drops much after a drain, so once over the ceiling an ingest drains
+# at most this often, and reads normally again below INGEST_MEMORY_RESUME of it
+INGEST_MEMORY_RELIEVE_SECONDS = float(os.getenv("INGEST_MEMORY_RELIEVE_SECONDS", "5"))
+INGEST_MEMORY_RESUME = 0.9
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_MB = 1024 * 1024
+
+
+def current_rss() -> int | None:
+    """Resident set size of this process in bytes (None where /proc is not available)"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class MemoryMonitor:
+    """
+    Tracks the memory of one ingest: peak RSS sampled between batches and,
+    when tracing is on, the tracemalloc peak of the Python heap. over_limit()
+    samples on every call and is the backpressure check against the
+    configured ceiling, with hysteresis and a minimum interval between drains.
+    """
+
+    def __init__(self, limit_mb: int | None = None, trace: bool | None = None):
+        self.limit = (INGEST_MEMORY_LIMIT_MB if limit_mb is None else limit_mb) * _MB
+        self.trace = INGEST_TRACE_MEMORY if trace is None else trace
+        self.start_rss = current_rss()
+        self.peak_rss = self.start_rss or 0
+        self.traced_peak: int | None = None
+        self.backpressure = 0   # times the ingest had to drain before reading on
+        self.pressure = False   # over the ceiling and not yet back below INGEST_MEMORY_RESUME of it
+        self._relieved_at = float("-inf")
+        self._tracing = False
+
+    def __enter__(self) -> "MemoryMonitor":
+        if self.trace:
+            self._tracing = not tracemalloc.is_tracing()
+            if self._tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.sample()
+        if self.trace and tracemalloc.is_tracing():
+            self.traced_peak = tracemalloc.get_traced_memory()[1]
+            if self._tracing:
+                tracemalloc.stop()
+
+    def sample(self) -> int | None:
+        rss = current_rss()
+        if rss is not None:
+            self.peak_rss = max(self.peak_rss, rss)
+        return rss
+
+    def over_limit(self) -> bool:
+        """Whether the ingest should drain before reading on (samples RSS either way)"""
+        rss = self.sample()
+        if not self.limit or rss is None:
+            return False
+        if rss > self.limit:
+            self.pressure = True
+        elif rss < self.limit * INGEST_MEMORY_RESUME:
+            self.pressure = False
+        return self.pressure and time.monotonic() - self._relieved_at >= INGEST_MEMORY_RELIEVE_SECONDS
+
+    def relieve(self) -> None:
+        """Called once the ingest has drained its buffers: count it and hand freed memory back"""
+        self._relieved_at = time.monotonic()
+        self.backpressure += 1
+        gc.collect()
+        if self.backpressure == 1:
+            logger.warning(f"⚠️ Ingest RSS above {self.limit // _MB}MB: waiting for writes to drain before reading on")
+
+    def summary(self) -> dict:
+        return {
+            "peak_rss_mb": round(self.peak_rss / _MB, 1),
+            "rss_growth_mb": round((self.peak_rss - self.start_rss) / _MB, 1) if self.start_rss else None,
+            "traced_peak_mb": round(self.traced_peak / _MB, 1) if self.traced_peak is not None else None,
+            "memory_limit_mb": self.limit // _MB or None,
+            "memory_backpressure": self.backpressure,
+        }
@@ -0,0 +1,92 @@
+import os
+import time
+import logging
+
+from sqlalchemy import bindparam, func, select
+from sqlalchemy.engine import Engine
+
+from src.products.cache import cache_products, hot_skus, product_entry
+from src.products.model import Product
+from src.products.service import PRODUCT_COLUMNS
+from src.redis import get_redis, run_sync
+
+logger = logging.getLogger(__name__)
+
+# SKU cache pre-warming after an ingest (see cache.prewarm_skus in celery_worker.py).
+# Paced so that a large catalog does not crowd live lookups out of the database.
+SKU_PREWARM_ENABLED = os.getenv("SKU_PREWARM_ENABLED", "true").lower() == "true"
+SKU_PREWARM_HOT = int(os.getenv("SKU_PREWARM_HOT", "5000"))        # most looked-up SKUs, loaded first
+SKU_PREWARM_MAX = int(os.getenv("SKU_PREWARM_MAX", "20000"))       # entries per run, hot and ingested together
+SKU_PREWARM_BATCH = int(os.getenv("SKU_PREWARM_BATCH", "500"))     # rows per SELECT and per Redis pipeline
+SKU_PREWARM_RATE = float(os.getenv("SKU_PREWARM_RATE", "2000"))    # rows per second (0 = unpaced)
+
+LATEST_CHANGE_SEQ = select(func.max(Product.change_seq)).where(Product.organization == bindparam("organization"))
+
+PRODUCTS_BY_SKU = select(*PRODUCT_COLUMNS).where(
+    Product.organization == bindparam("organization"),
+    Product.sku.in_(bindparam("skus", expanding=True)),
+    Product.deleted_at.is_(None),
+)
+
+# rows written after a change_seq, in seq order (keyset over ix_product_change_seq)
+PRODUCTS_CHANGED_AFTER = select(*PRODUCT_COLUMNS).where(
+    Product.organization == bindparam("organization"),
+    Product.change_seq > bindparam("after"),
+    Product.deleted_at.is_(None),
+).order_by(Product.change_seq).limit(bindparam("limit"))
+
+
+def latest_change_seq(engine: Engine, organization: str) -> int:
+    """The tenant's newest change_seq; rows an ingest writes afterwards are above it"""
+    with engine.connect() as conn:
+        return conn.execute(LATEST_CHANGE_SEQ, {"organization": organization}).scalar() or 0
+
+
+def warm_sku_cache(engine: Engine, organization: str, after_seq: int | None = None,
+                   hot_limit: int = SKU_PREWARM_HOT, max_entries: int = SKU_PREWARM_MAX,
+                   batch_size: int = SKU_PREWARM_BATCH, rate: float = SKU_PREWARM_RATE) -> dict:
+    """
+    Load the tenant's hottest SKUs (by recent lookups), then the rows written
+    after `after_seq`, into the lookup cache: one short SELECT and one Redis
+    pipeline per batch, at most `rate` rows per second. Reads go to the
+    primary, so the entries are good as of the moment each SELECT started.
+    """
+    started = time.perf_counter()
+    redis = get_redis()
+    seen: set[str] = set()
+    report = {"organization": organization, "hot": 0, "changed": 0, "cached": 0}
+
+    def store(rows, source: str, as_of: float) -> None:
+        rows = [row for row in rows if row.sku.lower() not in seen]
+        if not rows:
+            return
+        seen.update(row.sku.lower() for row in rows)
+        entries = [product_entry(Product.model_validate(dict(row._mapping))) for row in rows]
+        report["cached"] += run_sync(cache_products(redis, organization, entries, as_of))
+        report[source] += len(rows)
+        if rate > 0:
+            time.sleep(max(0.0, started + len(seen) / rate - time.perf_counter()))
+
+    hot = run_sync(hot_skus(redis, organization, min(hot_limit, max_entries)))
+    for start in range(0, len(hot), batch_size):
+        as_of = time.time()
+        with engine.connect() as conn:
+            rows = conn.execute(PRODUCTS_BY_SKU, {"organization": organization, "skus": hot[start:start + batch_size]}).all()
+        store(rows, "hot", as_of)
+
+    after = after_seq
+    while after is not None and len(seen) < max_entries:
+        limit = min(batch_size, max_entries - len(seen))
+        as_of = time.time()
+        with engine.connect() as conn:
+            rows = conn.execute(PRODUCTS_CHANGED_AFTER, {"organization": organization, "after": after, "limit": limit}).all()
+        if not rows:
+            break
+        after = rows[-1].change_seq
+        store(rows, "changed", as_of)
+        if len(rows) < limit:
+            break
+
+    report["duration_seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(f"🔥 Pre-warmed the SKU cache: {report}")
+    return report
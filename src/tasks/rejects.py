@@ -0,0 +1,64 @@
+import csv
+from collections import Counter
+from pathlib import Path
+
+from src.tasks.csv_reader import EXPECTED_COLUMNS, Reject
+
+REJECT_COLUMNS = ("row", "reason", *EXPECTED_COLUMNS)
+REJECT_BUFFER_SIZE = 1024 * 1024   # bytes buffered before hitting the disk
+
+
+def rejects_file_path(processed_dir: Path, task_id: str) -> Path:
+    """Where the rejects of an ingest task live, next to its processed file"""
+    return Path(processed_dir) / f"rejects_{task_id}.csv"
+
+
+class RejectWriter:
+    """
+    Streams rejected rows with their reason code into a buffered CSV side file
+    and keeps per-reason counts. The file is only created once the first
+    reject arrives.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.counts: Counter = Counter()
+        self._file = None
+        self._writer = None
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def write(self, rejects: list[Reject]) -> None:
+        if not rejects:
+            return
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, mode="w", newline="", encoding="utf-8", buffering=REJECT_BUFFER_SIZE)
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(REJECT_COLUMNS)
+
+        self._writer.writerows(
+            (reject.row, reject.reason, *(reject.values.get(column) for column in EXPECTED_COLUMNS))
+            for reject in rejects
+        )
+        self.counts.update(reject.reason for reject in rejects)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def summary(self) -> dict:
+        return {
+            "rejected": self.total,
+            "rejects_by_reason": dict(self.counts),
+            "rejects_file": str(self.path) if self.total else None,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,81 @@
+import math
+import time
+import uuid
+import logging
+
+from src.redis import RedisClient, Script
+
+logger = logging.getLogger(__name__)
+
+# Drops expired leases, then takes a slot if one is free. Runs atomically in Redis.
+ACQUIRE_SCRIPT = """
+local key, token = KEYS[1], ARGV[1]
+local now, lease, limit = tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - lease)
+if redis.call('ZSCORE', key, token) then
+    redis.call('ZADD', key, now, token)
+    return 1
+end
+if redis.call('ZCARD', key) < limit then
+    redis.call('ZADD', key, now, token)
+    redis.call('EXPIRE', key, math.ceil(lease * 2))
+    return 1
+end
+return 0
+"""
+
+
+def _acquire_local(backend, keys, args):
+    """ACQUIRE_SCRIPT for the in-memory backend"""
+    key, token = keys[0], args[0]
+    now, lease, limit = float(args[1]), float(args[2]), int(args[3])
+    backend._cmd_zremrangebyscore(key, "-inf", now - lease)
+    if backend._cmd_zscore(key, token) is not None:
+        backend._cmd_zadd(key, now, token)
+        return 1
+    if backend._cmd_zcard(key) < limit:
+        backend._cmd_zadd(key, now, token)
+        backend._cmd_expire(key, math.ceil(lease * 2))
+        return 1
+    return 0
+
+
+ACQUIRE = Script(ACQUIRE_SCRIPT, _acquire_local)
+
+
+class RedisSemaphore:
+    """
+    Counting semaphore shared by every worker through a Redis sorted set.
+    Each holder is a member scored with its last heartbeat; holders that stop
+    refreshing (crashed workers) lose their slot once the lease runs out.
+    Sync callers run these coroutines through src.redis.run_sync.
+    """
+
+    def __init__(self, client: RedisClient, name: str, limit: int, lease_seconds: float):
+        self.client = client
+        self.key = f"semaphore:{name}"
+        self.limit = limit
+        self.lease_seconds = lease_seconds
+
+    async def _acquire(self, token: str) -> bool:
+        args = [token, time.time(), self.lease_seconds, self.limit]
+        return bool(await self.client.eval(ACQUIRE, keys=[self.key], args=args))
+
+    async def acquire(self, token: str | None = None) -> str | None:
+        """Take a slot; returns the holder token, or None when all slots are busy"""
+        token = token or str(uuid.uuid4())
+        return token if await self._acquire(token) else None
+
+    async def refresh(self, token: str) -> bool:
+        """Heartbeat for long holders; False if the lease was already lost"""
+        return await self._acquire(token)
+
+    async def release(self, token: str) -> None:
+        await self.client.zrem(self.key, token)
+
+    async def holders(self) -> int:
+        pipe = self.client.pipeline()
+        pipe.zremrangebyscore(self.key, "-inf", time.time() - self.lease_seconds)
+        pipe.zcard(self.key)
+        _, count = await pipe.execute()
+        return count
@@ -0,0 +1,24 @@
+from src.redis import RedisClient
+
+# Recent ingest throughput, shared through Redis so the API can estimate how long
+# an upload will take. Each completed ingest pushes "rows:seconds"; readers pool
+# the last few runs, so large files weigh more than small ones.
+INGEST_THROUGHPUT_KEY = "ingest:throughput"
+INGEST_THROUGHPUT_SAMPLES = 20
+
+
+async def record_ingest_throughput(redis: RedisClient, rows: int, seconds: float) -> None:
+    if rows <= 0 or seconds <= 0:
+        return
+    pipe = redis.pipeline()
+    pipe.lpush(INGEST_THROUGHPUT_KEY, f"{rows}:{seconds:.3f}")
+    pipe.ltrim(INGEST_THROUGHPUT_KEY, 0, INGEST_THROUGHPUT_SAMPLES - 1)
+    await pipe.execute()
+
+
+async def recent_ingest_throughput(redis: RedisClient) -> float | None:
+    """Rows per second over the last INGEST_THROUGHPUT_SAMPLES ingests (None before the first)"""
+    samples = [entry.split(":") for entry in await redis.lrange(INGEST_THROUGHPUT_KEY, 0, -1)]
+    rows = sum(int(count) for count, _ in samples)
+    seconds = sum(float(elapsed) for _, elapsed in samples)
+    return rows / seconds if seconds > 0 else None
@@ -0,0 +1,35 @@
+import hashlib
+import re
+
+from fastapi import Header, HTTPException
+
+# Every product belongs to one organization (the tenant). Requests name theirs
+# in X-Organization; rows written before tenancy belong to DEFAULT_ORGANIZATION
+# (fixed, since the migration put them in its partition).
+DEFAULT_ORGANIZATION = "default"
+
+# Organizations end up in partition bounds and names, so the alphabet is closed
+ORGANIZATION_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]{0,62}")
+
+
+def validate_organization(organization: str) -> str:
+    if not ORGANIZATION_RE.fullmatch(organization):
+        raise ValueError(f"Invalid organization: {organization!r}")
+    return organization
+
+
+def get_organization(x_organization: str | None = Header(default=None)) -> str:
+    """The request's tenant from X-Organization (DEFAULT_ORGANIZATION when absent)"""
+    if x_organization is None:
+        return DEFAULT_ORGANIZATION
+    try:
+        return validate_organization(x_organization)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def partition_name(organization: str) -> str:
+    """Postgres partition of `product` holding one organization's rows"""
+    slug = re.sub(r"[^a-z0-9]+", "_", organization.lower())[:32]
+    digest = hashlib.sha1(organization.encode()).hexdigest()[:8]  # organizations are case-sensitive
+    return f"product_p_{slug}_{digest}"
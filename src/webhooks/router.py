@@ -3,14 +3,15 @@ from sqlmodel import Session
 import asyncio
 import json
 from urllib.parse import unquote
-from src.database import get_session
+from src.database import get_read_session, get_session
 from src.products.schemas import ReceiveNumber, ResponseId
 from .model import WebhookURL
-from celery.result import AsyncResult
-from src.tasks.celery_worker import create_task, celery# Import the Celery task
+from src.tasks.client import get_task_result  # Celery is imported on first use
+from src.responses import RowsResponse
 from src.webhooks.service import (
+    WEBHOOK_COLUMNS,
+    get_all_webhook_rows as get_all_webhook_rows_service,
 
-    get_all_webhooks as get_all_webhooks_service,
     get_webhook_by_url as get_webhook_by_url_service,
     delete_webhook_by_url as delete_webhook_by_url_service,
     update_webhook_status_by_url as update_webhook_status_by_url_service,
@@ -19,19 +20,18 @@ from src.webhooks.service import (
 )
 router = APIRouter(prefix="/webhooks", tags=["Webhooks"])
 
-@router.get("/all",summary="get all webhooks",)
+@router.get("/all", response_model=list[WebhookURL], summary="get all webhooks",)
 async def get_all_webhooks(
-    session: Session = Depends(get_session)
-) -> list[WebhookURL]:
+    session: Session = Depends(get_read_session)
+) -> RowsResponse:
     """get all webhooks"""
-    print("getting all webhooks")
-    webHooks= await get_all_webhooks_service(session)
-    return webHooks
+    rows = await get_all_webhook_rows_service(session)
+    return RowsResponse([column.name for column in WEBHOOK_COLUMNS], rows)
 
 @router.get("/url/{url:path}",summary="get webhook by url",)
 async def get_webhook_by_url(
     url: str,
-    session: Session = Depends(get_session)
+    session: Session = Depends(get_read_session)
 ) -> WebhookURL:
     """get webhook by url"""
     url=unquote(url)
@@ -89,7 +89,7 @@ async def monitor_task(websocket: WebSocket, task_id: str):
 
         
         while True:
-            result = AsyncResult(task_id, app=celery)
+            result = get_task_result(task_id)
 
             status_data = {
                 "task_id": task_id,
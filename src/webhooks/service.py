@@ -1,24 +1,24 @@
-import sqlmodel
-
 from src.webhooks.model import WebhookURL
+from src.responses import model_columns
 from sqlmodel import select
+from sqlalchemy import delete, insert, update
 
 from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
 # create webhook url with status 
 async def create_webhook_url(session: AsyncSession, url: str) -> WebhookURL:
-    webhook = WebhookURL(url=url)
-    session.add(webhook)
+    result = await session.scalars(insert(WebhookURL).values(url=url).returning(WebhookURL))
+    webhook = result.one()
     await session.commit()
-    await session.refresh(webhook)
     return webhook
 
-# get all webhook urls
-async def get_all_webhooks(session: AsyncSession) -> list[WebhookURL]:
-    result = await session.execute(select(WebhookURL))
-    webhooks = result.scalars().all()
-    return webhooks
+WEBHOOK_COLUMNS = model_columns(WebhookURL)
+
+# rows for the list endpoint: plain tuples in WebhookURL field order
+async def get_all_webhook_rows(session: AsyncSession) -> list[tuple]:
+    result = await session.execute(select(*WEBHOOK_COLUMNS))
+    return result.all()
 # get webhook url by url
 async def get_webhook_by_url(session: AsyncSession, url: str) -> WebhookURL:
     statement = select(WebhookURL).where(WebhookURL.url == url)
@@ -30,41 +30,24 @@ async def get_webhook_by_url(session: AsyncSession, url: str) -> WebhookURL:
 
 # delete webhook url by url
 async def delete_webhook_by_url(session: AsyncSession, url: str) -> None:
-    statement = select(WebhookURL).where(WebhookURL.url == url)
-    result = await session.execute(statement)
-    webhook = result.scalars().first()
-    if not webhook:
+    result = await session.execute(delete(WebhookURL).where(WebhookURL.url == url).returning(WebhookURL.id))
+    if result.first() is None:
+        await session.rollback()
         raise HTTPException(status_code=404, detail="Webhook URL not found")
-    await session.delete(webhook)
     await session.commit()
 
-# update webhook url status by url and also url
+# update webhook url status by url (url is unique, so no duplicate can arise)
 async def update_webhook_status_by_url(session: AsyncSession, url: str, status: str) -> WebhookURL:
-    statement = select(WebhookURL).where(WebhookURL.url == url)
-    result = await session.execute(statement)
-    webhook = result.scalars().first()
+    statement = update(WebhookURL).where(WebhookURL.url == url).values(status=status).returning(WebhookURL)
+    result = await session.scalars(statement, execution_options={"populate_existing": True})
+    webhook = result.first()
     if not webhook:
+        await session.rollback()
         raise HTTPException(status_code=404, detail="Webhook URL not found")
-    #handle if duplicate url exists after updsation 
-    statement = select(WebhookURL).where(WebhookURL.url == url)
-    result = await session.execute(statement)
-    existing_webhook = result.scalars().first()
-    if existing_webhook and existing_webhook.id != webhook.id:
-        raise HTTPException(status_code=400, detail="Duplicate webhook URL")
-    
-    webhook.status = status
-    webhook.url = url
-    
-    session.add(webhook)
     await session.commit()
-    await session.refresh(webhook)
     return webhook
 
 # delete all webhooks
 async def delete_all_webhooks(session: AsyncSession) -> None:
-    statement = select(WebhookURL)
-    result = await session.execute(statement)
-    webhooks = result.scalars().all()
-    for webhook in webhooks:
-        await session.delete(webhook)
-    await session.commit()
\ No newline at end of file
+    await session.execute(delete(WebhookURL))
+    await session.commit()
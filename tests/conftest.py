@@ -11,10 +11,12 @@ from httpx import ASGITransport, AsyncClient
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["REDIS_BACKEND"] = "memory"  # never a real server from tests
 
 from main import app
 
 from src.database import get_session
+from src.deadlines import install_statement_timeout
 
 
 @pytest_asyncio.fixture(scope="function")
@@ -55,11 +57,12 @@ async def test_session(test_db):
 
 
 @pytest_asyncio.fixture
-async def test_app(test_db):
-    """Create a test FastAPI app with test database"""
+async def test_app(test_db, memory_redis):
+    """Create a test FastAPI app with test database (and an empty in-memory Redis)"""
     
     async def get_test_session():
         async with test_db() as session:
+            install_statement_timeout(session)
             yield session
     
     # Override the dependency
@@ -79,3 +82,56 @@ async def async_client(test_app):
         base_url="http://test"
     ) as ac:
         yield ac
+
+
+@pytest.fixture
+def ingest_engine(tmp_path, monkeypatch):
+    """Run Celery ingest tasks eagerly against a temporary SQLite database"""
+    from src.tasks import celery_worker, db
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'ingest.db'}", echo=False)
+    SQLModel.metadata.create_all(engine)
+    db.set_sync_engine(engine)
+    monkeypatch.setattr(celery_worker, "INGEST_MAX_CONCURRENT", 0)
+    celery_worker.celery.conf.update(result_backend="cache+memory://", task_always_eager=True)  # follow-up tasks run inline
+
+    yield engine
+
+    celery_worker.celery.conf.update(task_always_eager=False)
+    db.set_sync_engine(None)
+    engine.dispose()
+
+
+@pytest.fixture
+def memory_redis():
+    """Install the in-memory Redis backend as this process's client"""
+    from src import redis as redis_module
+
+    client = redis_module.RedisClient(redis_module.MemoryBackend())
+    redis_module.set_redis(client)
+    yield client
+    redis_module.set_redis(None)
+
+
+@pytest.fixture
+def admin_headers(monkeypatch):
+    """Configure an admin token and return the headers that carry it"""
+    from src.admin import router as admin_router
+
+    monkeypatch.setattr(admin_router, "ADMIN_TOKEN", "test-admin-token")
+    return {"X-Admin-Token": "test-admin-token"}
+
+
+@pytest.fixture
+def profiled(async_client):
+    """Send a request with X-Profile and return (response, its QueryLog)"""
+    from src.middlewares.profiling import PROFILE_HEADER, profile_buffer
+
+    async def send(method: str, url: str, **kwargs):
+        profile_buffer.clear()
+        headers = {**kwargs.pop("headers", {}), PROFILE_HEADER: "1"}
+        response = await async_client.request(method, url, headers=headers, **kwargs)
+        return response, profile_buffer.list()[0].queries
+
+    yield send
+    profile_buffer.clear()
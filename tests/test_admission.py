@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from src.middlewares import admission
+from src.middlewares.admission import AdmissionController, AdmissionMiddleware, Rejected
+
+
+def _slow_app(seconds: float):
+    async def app(scope, receive, send):
+        await asyncio.sleep(seconds)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+    return app
+
+
+@pytest.fixture
+def controller():
+    controller = AdmissionController(capacity=2, expensive_limit=1, queue_size=4, max_wait_ms=200)
+    admission.set_admission_controller(controller)
+    yield controller
+    admission.set_admission_controller(None)
+
+
+def test_routes_are_classified_by_cost(controller):
+    """Test that lookups are cheap, list scans and deletes expensive and the rest standard"""
+    assert controller.classify("GET", "/products/id/A-1") is controller.cheap
+    assert controller.classify("GET", "/products/all") is controller.expensive
+    assert controller.classify("DELETE", "/products/id/A-1") is controller.expensive
+    assert controller.classify("POST", "/products/new") is controller.standard
+    assert controller.classify("POST", "/products/csv") is controller.upload
+
+
+@pytest.mark.asyncio
+async def test_uploads_do_not_hold_pool_slots(controller):
+    """Test that uploads have a limit of their own and leave the capacity to database routes"""
+    controller.max_wait = 0.01
+    for _ in range(controller.upload.limit):
+        await controller.acquire(controller.upload)
+    with pytest.raises(Rejected):
+        await controller.acquire(controller.upload)
+    await controller.acquire(controller.standard)
+    await controller.acquire(controller.standard)
+    assert controller.active == controller.capacity
+    with pytest.raises(Rejected):
+        await controller.acquire(controller.cheap)
+
+    # a freed upload slot is an upload's again, and the pool stays as it was
+    controller.release(controller.upload, 10)
+    await controller.acquire(controller.upload)
+    assert (controller.active, controller.upload.active) == (controller.capacity, controller.upload.limit)
+
+
+@pytest.mark.asyncio
+async def test_freed_slots_go_to_cheap_requests_first(controller):
+    """Test that a queued lookup overtakes a queued expensive request"""
+    await controller.acquire(controller.standard)
+    await controller.acquire(controller.standard)
+    order = []
+
+    async def wait(route_class):
+        await controller.acquire(route_class)
+        order.append(route_class.name)
+
+    expensive = asyncio.ensure_future(wait(controller.expensive))
+    await asyncio.sleep(0)
+    cheap = asyncio.ensure_future(wait(controller.cheap))
+    await asyncio.sleep(0)
+    assert controller.waiting == 2
+
+    controller.release(controller.standard, 10)
+    controller.release(controller.standard, 10)
+    await asyncio.gather(expensive, cheap)
+    assert order == ["cheap", "expensive"]
+    assert controller.active == 2
+
+
+@pytest.mark.asyncio
+async def test_expensive_limit_does_not_block_other_classes(controller):
+    """Test that a full expensive class leaves the remaining capacity to other routes"""
+    controller.max_wait = 0.01
+    await controller.acquire(controller.expensive)
+    with pytest.raises(Rejected):
+        await controller.acquire(controller.expensive)
+    await controller.acquire(controller.cheap)
+    assert (controller.active, controller.waiting) == (2, 0)
+
+
+@pytest.mark.asyncio
+async def test_overload_is_shed_with_503_and_retry_after(controller):
+    """Test that requests past capacity and deadline fail fast while admitted ones stay fast"""
+    transport = ASGITransport(app=AdmissionMiddleware(_slow_app(0.1)))
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        responses = await asyncio.gather(*(client.get("/products/new") for _ in range(20)))
+
+    statuses = [response.status_code for response in responses]
+    assert statuses.count(200) >= 2
+    assert statuses.count(503) >= 10
+    shed = next(response for response in responses if response.status_code == 503)
+    assert int(shed.headers["retry-after"]) >= 1
+    assert (controller.active, controller.waiting) == (0, 0)
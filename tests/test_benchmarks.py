@@ -0,0 +1,32 @@
+from benchmarks.baseline import compare, metric
+from benchmarks.datagen import generate_products_csv
+
+
+def test_generator_is_deterministic(tmp_path):
+    """Test that the same seed produces byte-identical CSVs"""
+    first = generate_products_csv(tmp_path / "a.csv", 500, seed=7)
+    second = generate_products_csv(tmp_path / "b.csv", 500, seed=7)
+    other = generate_products_csv(tmp_path / "c.csv", 500, seed=8)
+
+    assert first.read_bytes() == second.read_bytes()
+    assert first.read_bytes() != other.read_bytes()
+    assert first.read_text().splitlines()[0] == "sku,name,description"
+    assert len(first.read_text().splitlines()) == 501
+
+
+def test_compare_flags_regressions():
+    """Test regression detection for both metric directions"""
+    baselines = {
+        "rps": metric(100, "req/s", True),
+        "p99": metric(10, "ms", False),
+        "rows": metric(1000, "rows/s", True),
+    }
+    current = {
+        "rps": metric(80, "req/s", True),      # 20% slower
+        "p99": metric(8, "ms", False),         # 20% faster
+        "rows": metric(950, "rows/s", True),   # within tolerance
+        "fresh": metric(1, "ms", False),
+    }
+
+    statuses = {row["metric"]: row["status"] for row in compare(current, baselines, tolerance=0.15)}
+    assert statuses == {"rps": "regressed", "p99": "improved", "rows": "ok", "fresh": "new"}
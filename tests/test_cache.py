@@ -0,0 +1,103 @@
+import time
+import uuid
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import update
+from sqlmodel import Session
+
+from src.products import cache
+from src.products.model import Product
+from src.tasks import prewarm
+from src.tasks.celery_worker import process_csv_task
+from src.tasks.ingest import CsvIngest
+from src.tenancy import DEFAULT_ORGANIZATION
+
+
+@pytest.mark.asyncio
+async def test_lookups_are_cached_until_a_write(async_client: AsyncClient, test_session, memory_redis):
+    """Test that a cached lookup matches the database response and writes invalidate it"""
+    test_session.add(Product(sku="AB-1", name="Widget", description="first"))
+    await test_session.commit()
+
+    first = await async_client.get("/products/id/AB-1")
+    # changed behind the API's back: only the cached copy can answer with the old name
+    await test_session.execute(update(Product).where(Product.sku == "AB-1").values(name="Unseen"))
+    await test_session.commit()
+    cached = await async_client.get("/products/id/ab-1")
+    assert cached.json() == first.json()
+    assert cached.headers["ETag"] == first.headers["ETag"]
+    assert (await async_client.get("/products/id/AB-1", headers={"If-None-Match": first.headers["ETag"]})).status_code == 304
+    assert await memory_redis.zscore(cache._hits_key(DEFAULT_ORGANIZATION, cache._window()), "ab-1") == 3
+
+    await async_client.put("/products/id/AB-1", json={"sku": "AB-1", "name": "Widget v2"})
+    assert (await async_client.get("/products/id/AB-1")).json()["name"] == "Widget v2"
+
+    await async_client.delete("/products/all")
+    assert (await async_client.get("/products/id/AB-1")).status_code == 404
+
+
+def _cached(redis, *skus: str) -> list[str]:
+    """The SKUs that would be served from the cache"""
+    return [sku for sku in skus if prewarm.run_sync(cache.cached_product(redis, DEFAULT_ORGANIZATION, sku))[1]]
+
+
+def test_ingest_invalidates_and_prewarms_the_cache(tmp_path, ingest_engine, memory_redis):
+    """Test that an ingest invalidates the tenant's entries and loads the rows it wrote"""
+    with Session(ingest_engine) as session:
+        session.add(Product(sku="OLD", name="Untouched"))
+        session.commit()
+    before = prewarm.warm_sku_cache(ingest_engine, DEFAULT_ORGANIZATION, after_seq=0)
+    assert before["cached"] == 1 and _cached(memory_redis, "OLD") == ["OLD"]
+    upload = tmp_path / "products.csv"
+    upload.write_text("sku,name,description\na1,Widget,x\nb2,Gadget,y\n", encoding="utf-8")
+
+    result = process_csv_task.apply(args=(str(upload),), task_id=str(uuid.uuid4())).get()
+
+    # OLD's entry predates the ingest, but its lookup above made it hot, so it was loaded again
+    assert _cached(memory_redis, "A1", "B2", "OLD") == ["A1", "B2", "OLD"]
+    assert result["cache_prewarm"] == "scheduled"
+    entry = prewarm.run_sync(cache.cached_product(memory_redis, DEFAULT_ORGANIZATION, "a1"))[1]
+    assert entry["name"] == "Widget"
+
+    upload.write_text("sku,name,description\na1,Widget,x\n", encoding="utf-8")
+    result = process_csv_task.apply(args=(str(upload),), task_id=str(uuid.uuid4())).get()
+    assert "cache_prewarm" not in result  # nothing written, the cache stays valid
+    assert _cached(memory_redis, "A1", "B2") == ["A1", "B2"]
+
+
+def test_failed_ingest_still_invalidates_what_it_committed(tmp_path, ingest_engine, memory_redis, monkeypatch):
+    """Test that committed batches invalidate the cache even when the ingest fails afterwards"""
+    with Session(ingest_engine) as session:
+        session.add(Product(sku="A1", name="Old"))
+        session.commit()
+    prewarm.warm_sku_cache(ingest_engine, DEFAULT_ORGANIZATION, after_seq=0)
+    assert _cached(memory_redis, "A1") == ["A1"]
+
+    def fail(self):
+        raise RuntimeError("archive move failed")
+
+    monkeypatch.setattr(CsvIngest, "_complete", fail)
+    upload = tmp_path / "products.csv"
+    upload.write_text("sku,name,description\na1,New,x\n", encoding="utf-8")
+    with pytest.raises(RuntimeError):
+        process_csv_task.apply(args=(str(upload),), task_id=str(uuid.uuid4())).get()
+    assert _cached(memory_redis, "A1") == []
+
+
+def test_prewarm_loads_hot_skus_first_at_a_bounded_rate(ingest_engine, memory_redis):
+    """Test that the most looked-up SKUs come first, the budget caps the run and the rate paces it"""
+    with Session(ingest_engine) as session:
+        session.add_all([Product(sku=f"S{i}", name=f"Product {i}") for i in range(10)])
+        session.commit()
+    pipe = memory_redis.pipeline()
+    pipe.zincrby(cache._hits_key(DEFAULT_ORGANIZATION, cache._window()), 5, "s7")
+    pipe.zincrby(cache._hits_key(DEFAULT_ORGANIZATION, cache._window() - 1), 2, "s8")
+    prewarm.run_sync(pipe.execute())
+
+    started = time.perf_counter()
+    report = prewarm.warm_sku_cache(ingest_engine, DEFAULT_ORGANIZATION, after_seq=0, max_entries=6, batch_size=2,
+                                    rate=40)
+    assert time.perf_counter() - started >= 6 / 40 * 0.9
+    assert (report["hot"], report["changed"], report["cached"]) == (2, 4, 6)
+    assert _cached(memory_redis, *(f"S{i}" for i in range(10))) == ["S0", "S1", "S2", "S3", "S7", "S8"]
@@ -0,0 +1,116 @@
+import time
+import uuid
+from types import SimpleNamespace
+
+import orjson
+import pytest
+from httpx import AsyncClient
+from sqlmodel import Session, select
+
+from src.products import constants
+from src.products.model import Product, ProductChangeHorizon
+from src.products.service import limit_write_transaction
+from src.tasks.celery_worker import process_csv_task
+from src.tenancy import DEFAULT_ORGANIZATION
+
+
+@pytest.fixture(autouse=True)
+def no_settle_window(monkeypatch):
+    monkeypatch.setattr(constants, "CHANGES_SETTLE_SECONDS", 0)
+    monkeypatch.setattr(constants, "CHANGES_PAGE_SIZE", 2)  # streams span several queries
+
+
+async def _changes(client: AsyncClient, since: int = 0, **params) -> list[dict]:
+    response = await client.get("/products/changes", params={"since": since, **params})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    return [orjson.loads(line) for line in response.content.splitlines()]
+
+
+@pytest.mark.asyncio
+async def test_change_feed_records_writes_in_order(async_client: AsyncClient):
+    """Test that inserts, real updates and deletes show up once each, in seq order"""
+    for sku in ("A1", "B2", "C3"):
+        await async_client.post("/products/new", json={"sku": sku, "name": sku})
+    changes = await _changes(async_client)
+    assert [(c["op"], c["sku"]) for c in changes] == [("upsert", "A1"), ("upsert", "B2"), ("upsert", "C3")]
+    assert changes[0]["seq"] < changes[1]["seq"] < changes[2]["seq"]
+    last = changes[-1]["seq"]
+
+    await async_client.put("/products/id/A1", json={"sku": "A1", "name": "Renamed"})
+    await async_client.put("/products/id/B2", json={"sku": "B2", "name": "B2"})  # no-op
+    await async_client.delete("/products/id/C3")
+
+    changes = await _changes(async_client, since=last)
+    assert [(c["op"], c["sku"], c["name"]) for c in changes] == [("upsert", "A1", "Renamed"), ("delete", "C3", None)]
+    assert changes[0]["seq"] > last
+    assert await _changes(async_client, since=changes[-1]["seq"]) == []
+
+    # paging by limit, and the settle window holds back fresh rows
+    assert [c["sku"] for c in await _changes(async_client, limit=1)] == ["B2"]
+    constants.CHANGES_SETTLE_SECONDS = 60
+    assert await _changes(async_client) == []
+
+
+@pytest.mark.asyncio
+async def test_cursor_behind_purged_tombstones_is_gone(async_client: AsyncClient, test_session):
+    """Test that a cursor below the tenant's purge horizon gets 410, and a fresh or current one does not"""
+    test_session.add(ProductChangeHorizon(organization=DEFAULT_ORGANIZATION, purged_seq=5))
+    await test_session.commit()
+
+    assert (await async_client.get("/products/changes", params={"since": 4})).status_code == 410
+    assert await _changes(async_client, since=5) == []
+    assert await _changes(async_client) == []
+
+
+def test_reingesting_unchanged_rows_adds_no_changes(tmp_path, ingest_engine):
+    """Test that bulk ingest stamps rows and an identical re-run leaves them alone"""
+    upload = tmp_path / "products.csv"
+    upload.write_text("sku,name,description\na1,Widget,x\nb2,Gadget,y\n", encoding="utf-8")
+
+    def stamps():
+        with Session(ingest_engine) as session:
+            return {p.sku: (p.change_seq, p.updated_at) for p in session.exec(select(Product)).all()}
+
+    process_csv_task.apply(args=(str(upload),), task_id=str(uuid.uuid4())).get()
+    first = stamps()
+    assert all(seq and updated_at for seq, updated_at in first.values())
+
+    upload.write_text("sku,name,description\na1,Widget,x\nb2,Gadget,changed\n", encoding="utf-8")
+    process_csv_task.apply(args=(str(upload),), task_id=str(uuid.uuid4())).get()
+    second = stamps()
+    assert second["A1"] == first["A1"]
+    assert second["B2"][0] > max(seq for seq, _ in first.values())
+
+
+@pytest.mark.asyncio
+async def test_delete_all_runs_in_batches_and_leaves_tombstones(async_client: AsyncClient, monkeypatch):
+    """Test that deleting a catalog larger than a batch removes every product and records every delete"""
+    monkeypatch.setattr(constants, "DELETE_ALL_BATCH_SIZE", 2)
+    for sku in ("A1", "B2", "C3", "D4", "E5"):
+        await async_client.post("/products/new", json={"sku": sku, "name": sku})
+    last = (await _changes(async_client))[-1]["seq"]
+
+    assert (await async_client.delete("/products/all")).status_code == 200
+    assert (await async_client.get("/products/all")).json() == []
+    changes = await _changes(async_client, since=last)
+    assert sorted((c["op"], c["sku"]) for c in changes) == [("delete", sku) for sku in ("A1", "B2", "C3", "D4", "E5")]
+
+
+def test_product_writes_are_bounded_below_the_settle_window(monkeypatch):
+    """Test that each statement of a product-writing transaction gets what is left of the write limit"""
+    monkeypatch.setattr(constants, "CHANGES_MAX_WRITE_SECONDS", 4)
+    executed = []
+    conn = SimpleNamespace(dialect=SimpleNamespace(name="postgresql"), exec_driver_sql=executed.append)
+
+    limit_write_transaction(conn, time.monotonic() - 1)
+    limit_write_transaction(conn, time.monotonic(), budget_ms=500)  # a request deadline that ends sooner wins
+    limit_write_transaction(conn, time.monotonic() - 10)  # spent: the next statement is canceled
+
+    timeouts = [int(sql.rsplit("=", 1)[1]) for sql in executed]
+    assert 2900 < timeouts[0] <= 3000 and 400 < timeouts[1] <= 500 and timeouts[2] == 1
+    assert executed[0].startswith("SET LOCAL statement_timeout")
+
+    sqlite_conn = SimpleNamespace(dialect=SimpleNamespace(name="sqlite"), exec_driver_sql=executed.append)
+    limit_write_transaction(sqlite_conn, time.monotonic())
+    assert len(executed) == 3
@@ -0,0 +1,82 @@
+import sys
+import pytest
+from src.tasks import csv_reader
+from src.tasks.csv_reader import (
+    PY_WHITESPACE,
+    MISSING_COLUMN,
+    iter_product_batches_arrow,
+    iter_product_batches_python,
+)
+
+TRICKY_CSV = (
+    "\ufeffsku,name,description\n"
+    " a1 ,Name 1,desc\n"
+    ",NoSku,x\n"
+    "b2,,x\n"
+    "  straße ,Ünï,  d  \n"
+    "\"multi\nline\",Quoted,\"with, comma\"\n"
+    "short,OnlyTwo\n"
+    "long,Three,d,extra\n"
+    "\x1csk\x1f,n\u3000,\n"
+    "\n"
+    "   \n"
+    "z9,name,\n"
+)
+
+
+def _collect(reader, path, batch_size=2, with_rows=False):
+    rows, reasons = [], []
+    for batch in reader(str(path), batch_size):
+        assert len(batch.rows) <= batch_size
+        rows.extend(batch.rows)
+        reasons.extend((reject.row, reject.reason) if with_rows else reject.reason for reject in batch.rejects)
+    return rows, reasons
+
+
+def test_whitespace_matches_str_strip():
+    """Test that the arrow trim set is exactly what str.strip() removes"""
+    expected = "".join(chr(c) for c in range(sys.maxunicode + 1) if chr(c).isspace())
+    assert PY_WHITESPACE == expected
+
+
+def test_arrow_reader_matches_python_reader(tmp_path):
+    """Test that both readers produce the same normalized rows and rejects"""
+    path = tmp_path / "tricky.csv"
+    path.write_text(TRICKY_CSV, encoding="utf-8")
+
+    python_rows, python_reasons = _collect(iter_product_batches_python, path)
+    arrow_rows, arrow_reasons = _collect(iter_product_batches_arrow, path)
+
+    assert arrow_rows == python_rows
+    assert arrow_reasons == python_reasons == ["missing_sku", "missing_name", "missing_sku"]
+    assert {"sku": "STRASSE", "name": "Ünï", "description": "d", "status": "active"} in arrow_rows
+    assert {"sku": "SHORT", "name": "OnlyTwo", "description": "", "status": "active"} in arrow_rows
+
+
+def test_readers_agree_after_a_malformed_line_mid_file(tmp_path, monkeypatch):
+    """Test that order, duplicate winners and reject row numbers match past a malformed line"""
+    monkeypatch.setattr(csv_reader, "ARROW_BLOCK_SIZE", 256)  # several record batches either side
+    lines = [f"s{i},Name {i},d\n" for i in range(60)]
+    lines[30] = "dup,Broken,d,extra,fields\n"
+    lines[10] = lines[45] = "dup,Clean,d\n"
+    lines[20] = lines[50] = ",no sku,d\n"
+    path = tmp_path / "malformed.csv"
+    path.write_text("sku,name,description\n" + "".join(lines), encoding="utf-8")
+
+    python_rows, python_rejects = _collect(iter_product_batches_python, path, batch_size=7, with_rows=True)
+    arrow_rows, arrow_rejects = _collect(iter_product_batches_arrow, path, batch_size=7, with_rows=True)
+
+    assert arrow_rows == python_rows
+    assert arrow_rejects == python_rejects == [(21, "missing_sku"), (51, "missing_sku")]
+    assert [row["name"] for row in arrow_rows if row["sku"] == "DUP"] == ["Clean", "Broken", "Clean"]
+
+
+@pytest.mark.parametrize("reader", [iter_product_batches_python, iter_product_batches_arrow])
+def test_missing_column_rejects_every_row(tmp_path, reader):
+    """Test that a file without a required column inserts nothing"""
+    path = tmp_path / "bad_header.csv"
+    path.write_text("SKU,name,description\nA1,Name,desc\nB2,Name,desc\n", encoding="utf-8")
+
+    rows, reasons = _collect(reader, path)
+    assert rows == []
+    assert reasons == [MISSING_COLUMN, MISSING_COLUMN]
@@ -0,0 +1,69 @@
+import orjson
+import pytest
+from httpx import AsyncClient
+from sqlmodel import SQLModel
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src import database
+from src.products import constants
+from src.products.model import Product
+
+
+@pytest.fixture
+async def replica(tmp_path, test_session):
+    """A second SQLite file as the read replica; the primary and replica disagree on AB-1"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+        await conn.execute(Product.__table__.insert(), [{"sku": "AB-1", "name": "from replica"}])
+    test_session.add(Product(sku="AB-1", name="from primary"))
+    await test_session.commit()
+
+    database.set_replica_engine(engine)
+    yield engine
+    database.set_replica_engine(None)
+    await engine.dispose()
+
+
+async def _read(client: AsyncClient) -> str:
+    return (await client.get("/products/id/AB-1")).json()["name"]
+
+
+@pytest.mark.asyncio
+async def test_reads_use_replica_until_client_writes(async_client: AsyncClient, replica):
+    """Test replica routing and read-your-writes via the recent-write cookie"""
+    assert await _read(async_client) == "from replica"
+    assert [p["name"] for p in (await async_client.get("/products/all")).json()] == ["from replica"]
+
+    response = await async_client.post("/products/new", json={"sku": "CD-1", "name": "new"})
+    assert database.RECENT_WRITE_COOKIE in response.cookies
+    assert await _read(async_client) == "from primary"
+
+    async_client.cookies.clear()
+    assert await _read(async_client) == "from replica"
+
+
+@pytest.mark.asyncio
+async def test_lagging_or_unreachable_replica_falls_back_to_primary(async_client: AsyncClient, replica, monkeypatch):
+    """Test that lag above the threshold, or a failed lag check, routes reads to the primary"""
+    async def lagging(session):
+        return database.REPLICA_MAX_LAG_SECONDS + 1
+
+    monkeypatch.setattr(database.replica_lag, "probe", lagging)
+    database.replica_lag.reset()
+    assert await _read(async_client) == "from primary"
+
+    async def unreachable(session):
+        raise ConnectionError("replica down")
+
+    monkeypatch.setattr(database.replica_lag, "probe", unreachable)
+    database.replica_lag.reset()
+    assert await _read(async_client) == "from primary"
+
+
+@pytest.mark.asyncio
+async def test_change_feed_reads_the_primary(async_client: AsyncClient, replica, monkeypatch):
+    """Test that /products/changes ignores the replica, which may lag behind a client's cursor"""
+    monkeypatch.setattr(constants, "CHANGES_SETTLE_SECONDS", 0)
+    response = await async_client.get("/products/changes")
+    assert [orjson.loads(line)["name"] for line in response.content.splitlines()] == ["from primary"]
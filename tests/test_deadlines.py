@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.exc import DBAPIError
+
+from src import deadlines
+from src.deadlines import REQUEST_TIMEOUT_MAX_MS, REQUEST_TIMEOUT_MS, database_error_response, request_budget_ms
+
+
+def test_request_budget_comes_from_header_or_route_class():
+    """Test that a valid header is used (capped) and anything else falls back to the class default"""
+    assert request_budget_ms("250", "standard") == 250
+    assert request_budget_ms(str(REQUEST_TIMEOUT_MAX_MS * 10), "cheap") == REQUEST_TIMEOUT_MAX_MS
+    assert request_budget_ms("soon", "cheap") == REQUEST_TIMEOUT_MS["cheap"]
+    assert request_budget_ms("-5", "expensive") == REQUEST_TIMEOUT_MS["expensive"]
+    assert request_budget_ms(None, "unknown") == REQUEST_TIMEOUT_MS["standard"]
+
+
+@pytest.mark.asyncio
+async def test_expired_deadline_returns_504(async_client: AsyncClient, admin_headers):
+    """Test that a request whose budget is spent before its transaction begins gets a 504 and is counted"""
+    deadlines.timeouts.clear()
+    response = await async_client.get("/products/id/A-1", headers={"X-Request-Timeout-Ms": "0.001"})
+    assert response.status_code == 504
+    assert response.json() == {"detail": "Request deadline exceeded"}
+
+    # a generous budget goes through as usual
+    response = await async_client.get("/products/id/A-1", headers={"X-Request-Timeout-Ms": "5000"})
+    assert response.status_code == 404
+
+    metrics = (await async_client.get("/admin/metrics", headers=admin_headers)).json()
+    assert metrics["deadlines"]["timeouts"] == {"cheap": 1}
+    assert set(metrics["admission"]["classes"]) == {"cheap", "standard", "expensive", "upload"}
+
+
+@pytest.mark.asyncio
+async def test_statement_timeout_maps_to_504():
+    """Test that Postgres's query_canceled error becomes a 504 and other database errors are re-raised"""
+    request = SimpleNamespace(method="GET", url=SimpleNamespace(path="/products/all"))
+    canceled = DBAPIError("SELECT 1", {}, SimpleNamespace(sqlstate="57014"))
+    response = await database_error_response(request, canceled)
+    assert response.status_code == 504
+
+    broken = DBAPIError("SELECT 1", {}, SimpleNamespace(sqlstate="08006"))
+    with pytest.raises(DBAPIError):
+        await database_error_response(request, broken)
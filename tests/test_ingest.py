@@ -0,0 +1,587 @@
+import asyncio
+import csv
+import uuid
+import pytest
+from httpx import AsyncClient
+from sqlmodel import Session, select
+
+from src.products import router as products_router
+from src.products.model import Product
+from src.tasks.celery_worker import process_csv_task
+
+
+CSV_CONTENT = (
+    "sku,name,description\n"
+    " a1 ,Widget,first\n"
+    ",No Sku,x\n"
+    "b2,,x\n"
+    "c3,Gadget,\n"
+    ",,\n"
+)
+
+
+def _write_upload(tmp_path, content=CSV_CONTENT):
+    upload_dir = tmp_path / "uploads" / "csv"
+    upload_dir.mkdir(parents=True)
+    path = upload_dir / "products.csv"
+    path.write_text(content, encoding="utf-8")
+    return path
+
+
+def test_ingest_inserts_valid_rows_and_streams_rejects(tmp_path, ingest_engine):
+    """Test that bad rows land in the rejects file with reason codes"""
+    path = _write_upload(tmp_path)
+    task_id = str(uuid.uuid4())
+
+    result = process_csv_task.apply(args=(str(path),), task_id=task_id).get()
+
+    assert result["total_inserted"] == 2
+    assert result["rejected"] == 3
+    assert result["rejects_by_reason"] == {"missing_sku": 2, "missing_name": 1}
+
+    rejects_file = tmp_path / "uploads" / "csv" / "processed" / f"rejects_{task_id}.csv"
+    assert result["rejects_file"] == str(rejects_file)
+    with open(rejects_file, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [(row["row"], row["reason"]) for row in rows] == [
+        ("2", "missing_sku"), ("3", "missing_name"), ("5", "missing_sku"),
+    ]
+    assert rows[1]["sku"] == "b2"
+
+    with Session(ingest_engine) as session:
+        skus = session.exec(select(Product.sku)).all()
+    assert sorted(skus) == ["A1", "C3"]
+
+
+def test_ingest_without_rejects_creates_no_side_file(tmp_path, ingest_engine):
+    """Test that a clean file reports zero rejects"""
+    path = _write_upload(tmp_path, "sku,name,description\na1,Widget,x\n")
+
+    result = process_csv_task.apply(args=(str(path),), task_id=str(uuid.uuid4())).get()
+
+    assert result["rejected"] == 0
+    assert result["rejects_file"] is None
+    assert not list((tmp_path / "uploads" / "csv" / "processed").glob("rejects_*"))
+
+
+@pytest.mark.asyncio
+async def test_download_rejects(async_client: AsyncClient, tmp_path, monkeypatch):
+    """Test the rejects download endpoint"""
+    monkeypatch.setattr(products_router, "PROCESSED_DIR", tmp_path)
+    task_id = str(uuid.uuid4())
+    (tmp_path / f"rejects_{task_id}.csv").write_text("row,reason,sku,name,description\n2,missing_sku,,x,\n")
+
+    response = await async_client.get(f"/products/csv/{task_id}/rejects")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert "missing_sku" in response.text
+
+    missing = await async_client.get(f"/products/csv/{uuid.uuid4()}/rejects")
+    assert missing.status_code == 404
+
+    invalid = await async_client.get("/products/csv/..%2F..%2Fetc/rejects")
+    assert invalid.status_code in (400, 404)
+
+
+def test_ingest_and_light_tasks_use_separate_queues():
+    """Test task routing to the ingest, light and webhook queues"""
+    from src.tasks.celery_worker import celery
+
+    router = celery.amqp.router
+    assert router.route({}, "process_csv_task")["queue"].name == "ingest"
+    assert router.route({}, "create_task")["queue"].name == "light"
+    assert router.route({}, "webhooks.deliver")["queue"].name == "webhooks"
+
+
+def test_ingest_priority(monkeypatch):
+    """Test interactive, scheduled and tenant-pinned priorities"""
+    from src.tasks import celery_worker
+
+    monkeypatch.setattr(celery_worker, "TENANT_PRIORITIES", {"vip": 0, "bulk": 9})
+    interactive = celery_worker.ingest_priority("acme", interactive=True)
+    scheduled = celery_worker.ingest_priority("acme", interactive=False)
+
+    assert interactive < scheduled  # lower runs first on the Redis transport
+    assert celery_worker.ingest_priority("vip", interactive=False) == 0
+    # uploads name their tenant in a header anyone can send: a pin only demotes them
+    assert celery_worker.ingest_priority("vip", interactive=True) == interactive
+    assert celery_worker.ingest_priority("bulk", interactive=True) == 9
+
+
+def test_ingest_waits_for_a_slot_a_bounded_time_at_its_priority(tmp_path, ingest_engine, monkeypatch):
+    """Test that a slot retry keeps the queued priority and stops after INGEST_MAX_WAIT_SECONDS"""
+    from src.tasks import celery_worker
+
+    class FullSemaphore:
+        limit = 1
+
+        async def acquire(self, token):
+            return False
+
+    retries = []
+
+    def retry(**options):
+        retries.append(options)
+        return RuntimeError("retry")
+
+    monkeypatch.setattr(celery_worker, "INGEST_MAX_CONCURRENT", 1)
+    monkeypatch.setattr(celery_worker, "INGEST_RETRY_SECONDS", 30)
+    monkeypatch.setattr(celery_worker, "INGEST_MAX_WAIT_SECONDS", 600)
+    monkeypatch.setattr(celery_worker, "get_ingest_semaphore", FullSemaphore)
+    monkeypatch.setattr(process_csv_task, "retry", retry)
+    path = _write_upload(tmp_path)
+    for interactive in (True, False):
+        kwargs = {"interactive": interactive}
+        with pytest.raises(RuntimeError):
+            process_csv_task.apply(args=(str(path),), kwargs=kwargs, task_id=str(uuid.uuid4())).get()
+
+    assert retries == [
+        {"countdown": 30, "max_retries": 20, "priority": celery_worker.PRIORITY_INTERACTIVE},
+        {"countdown": 30, "max_retries": 20, "priority": celery_worker.PRIORITY_SCHEDULED},
+    ]
+
+
+
+def test_ingest_releases_its_slot_when_setup_fails(tmp_path, ingest_engine, monkeypatch):
+    """Test that a failure before the ingest starts still gives the slot back"""
+    from src.tasks import celery_worker, prewarm
+
+    class Semaphore:
+        limit = 1
+        held = set()
+
+        async def acquire(self, token):
+            self.held.add(token)
+            return True
+
+        async def release(self, token):
+            self.held.discard(token)
+
+    def unreachable(engine, organization):
+        raise ConnectionError("database unreachable")
+
+    monkeypatch.setattr(celery_worker, "INGEST_MAX_CONCURRENT", 1)
+    monkeypatch.setattr(celery_worker, "get_ingest_semaphore", Semaphore)
+    monkeypatch.setattr(prewarm, "latest_change_seq", unreachable)
+    with pytest.raises(ConnectionError):
+        process_csv_task.apply(args=(str(_write_upload(tmp_path)),), task_id=str(uuid.uuid4())).get()
+    assert Semaphore.held == set()
+
+
+def test_worker_takes_settings_of_its_queues():
+    """Test per-queue prefetch and acks_late settings at worker start"""
+    from types import SimpleNamespace
+    from src.tasks.celery_worker import apply_queue_settings
+
+    conf = SimpleNamespace()
+    apply_queue_settings(conf=conf, options={"queues": "light"})
+    assert (conf.worker_prefetch_multiplier, conf.task_acks_late) == (8, False)
+
+    apply_queue_settings(conf=conf, options={"queues": ["ingest", "light"]})
+    assert (conf.worker_prefetch_multiplier, conf.task_acks_late) == (1, True)
+
+
+def test_async_mode_writes_chunks_concurrently(tmp_path, ingest_engine, monkeypatch):
+    """Test the async ingest mode on a per-process async pool"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from src.tasks import db
+    from src.tasks.ingest import CsvIngest
+
+    rows = "".join(f"sku-{i},Product {i},\n" for i in range(120))
+    path = _write_upload(tmp_path, "sku,name,description\n" + rows + ",missing,\n")
+    monkeypatch.setattr(CsvIngest, "BATCH_SIZE", 10)
+    monkeypatch.setattr(CsvIngest, "COMMIT_FREQUENCY", 25)
+    db.set_async_engine(create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'ingest.db'}"))
+
+    class FakeRequest:
+        id = str(uuid.uuid4())
+
+    class FakeTask:
+        request = FakeRequest()
+        states = []
+
+        def update_state(self, state, meta):
+            self.states.append(state)
+
+    try:
+        result = CsvIngest(FakeTask(), str(path), async_mode=True).run()
+    finally:
+        db.dispose_process_pools()
+
+    assert result["total_inserted"] == 120
+    assert result["rejected"] == 1
+    with Session(ingest_engine) as session:
+        assert len(session.exec(select(Product.sku)).all()) == 120
+
+
+
+def test_async_mode_keeps_the_last_row_of_a_sku_across_chunks(tmp_path, ingest_engine, monkeypatch):
+    """Test that a SKU repeated in a later chunk wins even when the earlier chunk commits late"""
+    from contextlib import asynccontextmanager
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from src.tasks import batching, db
+    from src.tasks.ingest import CsvIngest
+
+    rows = [f"sku-{i},Product {i},\n" for i in range(90)]
+    rows[0], rows[40], rows[75] = "dup,First,\n", "DUP,Middle,\n", "dup,Last,\n"  # chunks of 30 rows
+    path = _write_upload(tmp_path, "sku,name,description\n" + "".join(rows))
+    monkeypatch.setattr(CsvIngest, "BATCH_SIZE", 10)
+    monkeypatch.setattr(CsvIngest, "COMMIT_FREQUENCY", 25)
+    monkeypatch.setattr(batching, "INGEST_ADAPTIVE_BATCHING", False)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'ingest.db'}")
+
+    class SlowFirstTransaction:
+        """The first chunk's transaction starts late, so it would otherwise commit last"""
+        dialect = engine.dialect
+        calls = 0
+
+        @asynccontextmanager
+        async def begin(self):
+            SlowFirstTransaction.calls += 1
+            if SlowFirstTransaction.calls == 1:
+                await asyncio.sleep(0.3)
+            async with engine.begin() as conn:
+                yield conn
+
+    monkeypatch.setattr(db, "get_async_engine", SlowFirstTransaction)
+
+    class FakeRequest:
+        id = str(uuid.uuid4())
+
+    class FakeTask:
+        request = FakeRequest()
+
+        def update_state(self, state, meta):
+            pass
+
+    try:
+        CsvIngest(FakeTask(), str(path), async_mode=True).run()
+    finally:
+        db.run_in_worker_loop(engine.dispose())
+        db.dispose_process_pools()
+
+    with Session(ingest_engine) as session:
+        assert session.exec(select(Product.name).where(Product.sku == "dup")).all() == ["Last"]
+
+
+def test_pools_are_not_shared_across_fork(tmp_path, monkeypatch):
+    """Test that a child process never reuses its parent's engine"""
+    import os
+    from sqlmodel import create_engine
+    from src.tasks import db
+
+    parent_engine = create_engine(f"sqlite:///{tmp_path / 'parent.db'}")
+    db.set_sync_engine(parent_engine)
+    monkeypatch.setattr(db, "_owner_pid", os.getpid() + 1)  # as if created before a fork
+    monkeypatch.setenv("POSTGRES_SERVICE_URL", "postgresql+asyncpg://u:p@localhost:5432/db")
+
+    try:
+        child_engine = db.get_sync_engine()
+        assert child_engine is not parent_engine
+        assert db._owner_pid == os.getpid()
+    finally:
+        db.set_sync_engine(None)
+        parent_engine.dispose()
+
+
+def test_ingest_upserts_known_skus(tmp_path, ingest_engine):
+    """Test that repeated SKUs update in place and the last row in the file wins"""
+    with Session(ingest_engine) as session:
+        session.add(Product(sku="A1", name="Old", description="old"))
+        session.commit()
+
+    path = _write_upload(tmp_path, "sku,name,description\na1,First,x\nb2,Gadget,y\nA1,Last,z\n")
+    result = process_csv_task.apply(args=(str(path),), task_id=str(uuid.uuid4())).get()
+
+    assert result["duplicate_rows"] == 1
+    with Session(ingest_engine) as session:
+        products = {p.sku: p for p in session.exec(select(Product)).all()}
+    assert sorted(products) == ["A1", "B2"]
+    assert (products["A1"].name, products["A1"].description) == ("Last", "z")
+
+
+def test_dedupe_keeps_newest_row_per_sku(ingest_engine):
+    """Test the online dedupe job, then that the unique index can be built"""
+    from sqlalchemy import text
+    from src.tasks.dedupe import dedupe_skus
+
+    with ingest_engine.begin() as conn:
+        conn.execute(text("DROP INDEX ux_product_sku"))  # the state before the migration
+        conn.execute(Product.__table__.insert(), [
+            {"sku": "A1", "name": "a-old", "status": "active"},
+            {"sku": "B2", "name": "b", "status": "active"},
+            {"sku": "a1", "name": "a-mid", "status": "active"},
+            {"sku": "A1", "name": "a-new", "status": "active"},
+        ])
+        # the same SKU in another tenant's catalog is not a duplicate
+        conn.execute(Product.__table__.insert(), {"sku": "A1", "name": "a-acme", "status": "active", "organization": "acme"})
+
+    result = dedupe_skus(ingest_engine, batch_size=1, pause=0)
+
+    assert result["deleted"] == 2
+    with Session(ingest_engine) as session:
+        assert sorted(session.exec(select(Product.name)).all()) == ["a-acme", "a-new", "b"]
+    with ingest_engine.begin() as conn:
+        conn.execute(text("CREATE UNIQUE INDEX ux_product_sku ON product (organization, sku)"))
+
+
+def test_reimport_writes_only_new_and_changed_rows(tmp_path, ingest_engine):
+    """Test that rows whose content hash matches the stored one are not rewritten"""
+    path = _write_upload(tmp_path, "sku,name,description\na1,Widget,x\nb2,Gadget,y\nc3,Bolt,z\n")
+    first = process_csv_task.apply(args=(str(path),), task_id=str(uuid.uuid4())).get()
+    assert (first["new"], first["changed"], first["unchanged"]) == (3, 0, 0)
+    with Session(ingest_engine) as session:
+        before = {p.sku: p.change_seq for p in session.exec(select(Product)).all()}
+
+    path.write_text("sku,name,description\na1,Widget,x\nb2,Gadget,changed\nd4,Nut,w\n", encoding="utf-8")
+    second = process_csv_task.apply(args=(str(path),), task_id=str(uuid.uuid4())).get()
+
+    assert (second["new"], second["changed"], second["unchanged"]) == (1, 1, 1)
+    assert second["total_inserted"] == 2
+    assert second["soft_deleted"] == 0
+    with Session(ingest_engine) as session:
+        products = {p.sku: p for p in session.exec(select(Product)).all()}
+    assert products["A1"].change_seq == before["A1"]
+    assert products["B2"].description == "changed"
+    assert products["C3"].deleted_at is None  # not a snapshot: missing SKUs stay
+
+
+def test_snapshot_soft_deletes_missing_skus(tmp_path, ingest_engine):
+    """Test that a full snapshot soft-deletes unlisted SKUs and a later import revives them"""
+    from sqlalchemy import func
+    from src.products.model import ProductStatusDelta
+
+    def live_count():
+        with Session(ingest_engine) as session:
+            return session.exec(select(func.sum(ProductStatusDelta.delta))).one()
+
+    path = _write_upload(tmp_path, "sku,name,description\na1,Widget,x\nb2,Gadget,y\nc3,Bolt,z\n")
+    process_csv_task.apply(args=(str(path),), task_id=str(uuid.uuid4())).get()
+
+    path.write_text("sku,name,description\na1,Widget,x\nb2,,y\n", encoding="utf-8")  # b2 rejected, still listed
+    result = process_csv_task.apply(args=(str(path),), kwargs={"snapshot": True}, task_id=str(uuid.uuid4())).get()
+
+    assert result["soft_deleted"] == 1
+    with Session(ingest_engine) as session:
+        deleted = {p.sku: p.deleted_at is not None for p in session.exec(select(Product)).all()}
+    assert deleted == {"A1": False, "B2": False, "C3": True}
+    assert live_count() == 2
+
+    path.write_text("sku,name,description\nc3,Bolt,z\n", encoding="utf-8")
+    result = process_csv_task.apply(args=(str(path),), task_id=str(uuid.uuid4())).get()
+    assert (result["changed"], result["unchanged"]) == (1, 0)
+    with Session(ingest_engine) as session:
+        assert session.exec(select(Product.deleted_at).where(Product.sku == "C3")).one() is None
+    assert live_count() == 3
+
+
+
+@pytest.mark.parametrize("async_mode", [False, True])
+def test_snapshot_tracks_listed_skus_in_the_database(tmp_path, ingest_engine, monkeypatch, async_mode):
+    """Test that the snapshot soft delete works over several id windows and leaves no staging rows behind"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from src.products.model import IngestSeenSku
+    from src.tasks import db
+    from src.tasks.ingest import CsvIngest
+
+    path = _write_upload(tmp_path, "sku,name,description\n" + "".join(f"s{i},Product {i},\n" for i in range(25)))
+    process_csv_task.apply(args=(str(path),), task_id=str(uuid.uuid4())).get()
+
+    # every third SKU stays, listed in another case or as a rejected row
+    kept = "".join(f"S{i},Product {i},\n" if i % 2 else f"s{i},,\n" for i in range(0, 25, 3))
+    path.write_text("sku,name,description\n" + kept, encoding="utf-8")
+    monkeypatch.setattr(CsvIngest, "BATCH_SIZE", 4)
+    db.set_async_engine(create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'ingest.db'}"))
+
+    class FakeRequest:
+        id = str(uuid.uuid4())
+
+    class FakeTask:
+        request = FakeRequest()
+
+        def update_state(self, state, meta):
+            pass
+
+    try:
+        result = CsvIngest(FakeTask(), str(path), async_mode=async_mode, snapshot=True).run()
+    finally:
+        db.dispose_process_pools()
+
+    assert result["soft_deleted"] == 25 - 9
+    with Session(ingest_engine) as session:
+        live = session.exec(select(Product.sku).where(Product.deleted_at.is_(None))).all()
+        assert sorted(live, key=lambda sku: int(sku[1:])) == [f"S{i}" for i in range(0, 25, 3)]
+        assert session.exec(select(IngestSeenSku)).all() == []
+
+
+def test_dry_run_reports_changes_without_writing(tmp_path, ingest_engine):
+    """Test that a dry run counts new, changed and soft-deleted rows but writes nothing"""
+    path = _write_upload(tmp_path, "sku,name,description\na1,Widget,x\nb2,Gadget,y\n")
+    process_csv_task.apply(args=(str(path),), task_id=str(uuid.uuid4())).get()
+
+    path.write_text("sku,name,description\na1,Widget,changed\nc3,Bolt,z\n", encoding="utf-8")
+    kwargs = {"snapshot": True, "dry_run": True}
+    result = process_csv_task.apply(args=(str(path),), kwargs=kwargs, task_id=str(uuid.uuid4())).get()
+
+    assert result["dry_run"] is True
+    assert (result["new"], result["changed"], result["unchanged"], result["soft_deleted"]) == (1, 1, 0, 1)
+    assert result["total_inserted"] == 0
+    with Session(ingest_engine) as session:
+        products = {p.sku: p for p in session.exec(select(Product)).all()}
+    assert set(products) == {"A1", "B2"}
+    assert products["A1"].description == "x"
+    assert products["B2"].deleted_at is None
+
+
+@pytest.mark.asyncio
+async def test_preview_flags_misnamed_columns(async_client: AsyncClient):
+    """Test that the preview names missing columns, suggests the header that looks like them and samples rejects"""
+    content = b"SKU,Product Name,description\na1,Widget,x\n"
+    response = await async_client.post("/products/csv/preview", files={"file": ("p.csv", content, "text/csv")})
+
+    assert response.status_code == 200
+    preview = response.json()
+    assert preview["valid"] is False
+    assert preview["missing_columns"] == ["sku", "name"]
+    assert preview["suggestions"] == {"sku": "SKU"}
+    assert preview["sample_rows"] == []
+    assert preview["rejects_by_reason"] == {"missing_column": 1}
+
+
+@pytest.mark.asyncio
+async def test_preview_detects_delimiter_and_encoding(async_client: AsyncClient):
+    """Test that a semicolon-separated cp1252 file is parsed and both are reported as problems"""
+    content = "sku;name;description\na1;Café;x\nb2;Tea;y\n".encode("cp1252")
+    response = await async_client.post("/products/csv/preview", files={"file": ("p.csv", content, "text/csv")})
+
+    preview = response.json()
+    assert (preview["encoding"], preview["delimiter"]) == ("cp1252", ";")
+    assert len(preview["problems"]) == 2
+    assert [row["name"] for row in preview["sample_rows"]] == ["Café", "Tea"]
+
+
+@pytest.mark.asyncio
+async def test_preview_estimates_rows_and_time_from_the_head(async_client: AsyncClient, memory_redis):
+    """Test that a partial read extrapolates the row count and uses recent ingest throughput"""
+    from src.tasks.throughput import record_ingest_throughput
+
+    await record_ingest_throughput(memory_redis, 1000, 2.0)
+    await record_ingest_throughput(memory_redis, 3000, 2.0)
+    line = b"a0000,Widget,some description\n"
+    content = b"sku,name,description\n" + line * 4000
+    params = {"max_kb": 1, "sample": 2}
+    response = await async_client.post("/products/csv/preview", params=params, files={"file": ("p.csv", content, "text/csv")})
+
+    preview = response.json()
+    assert preview["valid"] is True
+    assert preview["file_bytes"] == len(content)
+    assert preview["sampled_bytes"] < 1024
+    assert len(preview["sample_rows"]) == 2
+    assert abs(preview["estimated_rows"] - 4000) < 100
+    assert preview["rows_per_second"] == 1000.0
+    assert preview["estimated_seconds"] == pytest.approx(preview["estimated_rows"] / 1000, abs=0.1)
+
+
+def test_ingest_reports_memory_and_applies_backpressure(tmp_path, ingest_engine, monkeypatch):
+    """Test that peak memory lands in the result and a ceiling drains instead of failing"""
+    from src.tasks import batching, memory
+    from src.tasks.ingest import CsvIngest
+
+    rows = "".join(f"sku-{i},Product {i},\n" for i in range(60))
+    path = _write_upload(tmp_path, "sku,name,description\n" + rows)
+    monkeypatch.setattr(CsvIngest, "BATCH_SIZE", 10)
+    monkeypatch.setattr(batching, "INGEST_ADAPTIVE_BATCHING", False)  # fixed 10-row batches
+    monkeypatch.setattr(memory, "INGEST_MEMORY_LIMIT_MB", 1)  # always exceeded
+    monkeypatch.setattr(memory, "INGEST_MEMORY_RELIEVE_SECONDS", 0)  # drain on every batch
+    monkeypatch.setattr(memory, "INGEST_TRACE_MEMORY", True)
+
+    result = process_csv_task.apply(args=(str(path),), task_id=str(uuid.uuid4())).get()
+
+    assert result["total_inserted"] == 60
+    assert result["memory_limit_mb"] == 1
+    assert result["memory_backpressure"] == 6
+    assert result["peak_rss_mb"] > 0
+    assert result["traced_peak_mb"] is not None
+    with Session(ingest_engine) as session:
+        assert len(session.exec(select(Product.sku)).all()) == 60
+
+
+def test_memory_monitor_samples_every_batch_and_drains_with_hysteresis(monkeypatch):
+    """Test that the peak is sampled without a ceiling, and drains are rate-limited and stop below 90%"""
+    from src.tasks import memory
+
+    rss = [100]
+    monkeypatch.setattr(memory, "current_rss", lambda: rss[0] * memory._MB)
+    unlimited = memory.MemoryMonitor(limit_mb=0)
+    rss[0] = 300
+    assert not unlimited.over_limit()
+    rss[0] = 120
+    unlimited.over_limit()
+    assert unlimited.summary()["peak_rss_mb"] == 300
+
+    monkeypatch.setattr(memory, "INGEST_MEMORY_RELIEVE_SECONDS", 60)
+    monitor = memory.MemoryMonitor(limit_mb=200)
+    rss[0] = 210
+    assert monitor.over_limit()
+    monitor.relieve()
+    assert not monitor.over_limit()  # still over, but drained a moment ago
+    monitor._relieved_at -= 60
+    rss[0] = 190
+    assert monitor.over_limit()  # between 90% and the ceiling: still under pressure
+    rss[0] = 170
+    assert not monitor.over_limit() and not monitor.pressure
+
+
+def test_adaptive_batcher_tracks_throughput_and_budgets(monkeypatch):
+    """Test that statement size follows throughput and commit size follows the transaction budgets"""
+    from src.tasks import batching
+
+    monkeypatch.setattr(batching, "INGEST_TXN_MAX_SECONDS", 1.0)
+    batcher = batching.AdaptiveBatcher(1000, 5000, adaptive=True)
+
+    batcher.statement(1000, 0.10)   # 10k rows/s
+    assert batcher.batch_size == 1500
+    batcher.statement(1500, 0.12)   # 12.5k rows/s: keep growing
+    assert batcher.batch_size == 2250
+    batcher.statement(2250, 0.30)   # 7.5k rows/s: turn around
+    assert batcher.batch_size == 1500
+    batcher.statement(100, 1.0)     # a short final batch is ignored
+    assert batcher.batch_size == 1500
+
+    batcher.commit(5000, 0, 0.2)    # well under budget: at most double
+    assert batcher.commit_size == 10000
+    batcher.commit(10000, 0, 4.0)   # 4x over the lock budget: back under it with headroom
+    assert batcher.commit_size == 2000
+    assert batcher.batch_size == 1500
+    assert batcher.should_commit(10, batcher.max_bytes, 0.0)
+    assert batcher.should_commit(10, 0, 1.0)
+    assert not batcher.should_commit(10, 0, 0.5)
+
+
+def test_progress_reports_the_chosen_batch_sizes(tmp_path, ingest_engine, monkeypatch):
+    """Test that progress meta and the result carry the adaptive statement and commit sizes"""
+    from src.tasks.ingest import CsvIngest
+
+    rows = "".join(f"sku-{i},Product {i},\n" for i in range(100))
+    path = _write_upload(tmp_path, "sku,name,description\n" + rows)
+    monkeypatch.setattr(CsvIngest, "BATCH_SIZE", 10)
+    monkeypatch.setattr(CsvIngest, "COMMIT_FREQUENCY", 20)
+
+    class FakeRequest:
+        id = str(uuid.uuid4())
+
+    class FakeTask:
+        request = FakeRequest()
+        metas = []
+
+        def update_state(self, state, meta):
+            self.metas.append(meta)
+
+    task = FakeTask()
+    result = CsvIngest(task, str(path), async_mode=False).run()
+
+    assert result["total_inserted"] == 100
+    progress = [meta for meta in task.metas if "batch_size" in meta]
+    assert progress
+    assert all(10 <= meta["batch_size"] <= meta["commit_size"] for meta in progress)
+    assert result["commit_size"] >= 20
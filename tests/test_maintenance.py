@@ -0,0 +1,89 @@
+import gzip
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlmodel import Session, select
+
+from src.products.model import ProductChangeHorizon, ProductTombstone
+from src.tasks import celery_worker, maintenance
+from src.tasks.celery_worker import process_csv_task
+
+DAY = 86400
+
+
+def _archive(directory, name, content, age_days):
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / name
+    path.write_bytes(content)
+    mtime = time.time() - age_days * DAY
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_prune_archives_compresses_expires_and_caps_size(tmp_path):
+    """Test that old archives are gzipped, expired ones deleted and the oldest go first over the size cap"""
+    processed, errors = tmp_path / "processed", tmp_path / "errors"
+    csv = b"sku,name\n" + b"a1,Widget\n" * 1000
+    compressible = _archive(processed, "processed_1_products.csv", csv, age_days=2)
+    _archive(processed, "rejects_task.csv", csv, age_days=2)
+    _archive(errors, "error_1_products.csv", csv, age_days=40)
+    fresh = _archive(processed, "processed_2_products.csv", csv, age_days=0)
+
+    report = maintenance.prune_archives([processed, errors], max_age_days=30, max_bytes=1e9, compress_after_days=1)
+
+    assert (report["files_deleted"], report["files_compressed"]) == (1, 1)
+    assert not compressible.exists()
+    with gzip.open(processed / "processed_1_products.csv.gz") as archived:
+        assert archived.read() == csv
+    assert (processed / "rejects_task.csv").exists()  # served as-is by the rejects download
+    assert report["bytes_reclaimed"] > len(csv)
+
+    report = maintenance.prune_archives([processed, errors], max_bytes=len(csv))
+    assert sorted(path.name for path in processed.iterdir()) == [fresh.name]
+    assert report["bytes_remaining"] == len(csv)
+
+
+def test_purge_tombstones_keeps_the_retention_window(ingest_engine):
+    """Test that only tombstones older than the retention are deleted, and the horizon records them"""
+    now = datetime.now(timezone.utc)
+    with Session(ingest_engine) as session:
+        for seq, age in ((1, 40), (2, 35), (3, 1)):
+            session.add(ProductTombstone(change_seq=seq, product_id=seq, sku=f"S{seq}", deleted_at=now - timedelta(days=age)))
+        session.commit()
+
+    assert maintenance.purge_tombstones(ingest_engine, retention_days=30, batch_size=1) == 2
+    with Session(ingest_engine) as session:
+        assert session.exec(select(ProductTombstone.change_seq)).all() == [3]
+        assert session.exec(select(ProductChangeHorizon.purged_seq)).all() == [2]
+
+
+def test_large_ingest_is_followed_by_analyze(tmp_path, ingest_engine, monkeypatch):
+    """Test that an ingest past the row threshold analyzes the tables it wrote and reports it"""
+    monkeypatch.setattr(maintenance, "ANALYZE_AFTER_INGEST_MIN_ROWS", 2)
+    upload = tmp_path / "products.csv"
+    upload.write_text("sku,name,description\na1,Widget,x\nb2,Gadget,y\n", encoding="utf-8")
+
+    result = process_csv_task.apply(args=(str(upload),), task_id=str(uuid.uuid4())).get()
+
+    assert result["maintenance"]["tables"] == ["product", "product_status_delta"]
+    assert result["maintenance"]["duration_seconds"] >= 0
+    with ingest_engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT count(*) FROM sqlite_stat1 WHERE tbl = 'product'").scalar() > 0
+
+    upload.write_text("sku,name,description\na1,Widget,x\n", encoding="utf-8")
+    result = process_csv_task.apply(args=(str(upload),), task_id=str(uuid.uuid4())).get()
+    assert "maintenance" not in result  # nothing written
+
+    upload.write_text("sku,name,description\nc3,Bolt,z\n", encoding="utf-8")
+    kwargs = {"snapshot": True, "dry_run": True}
+    result = process_csv_task.apply(args=(str(upload),), kwargs=kwargs, task_id=str(uuid.uuid4())).get()
+    assert result["soft_deleted"] == 2 and "maintenance" not in result  # would write, but did not
+
+
+def test_beat_schedules_registered_maintenance_tasks():
+    """Test that every beat entry names a registered task"""
+    schedule = celery_worker.celery.conf.beat_schedule
+    assert {entry["task"] for entry in schedule.values()} == {"maintenance.prune_archives", "maintenance.database"}
+    assert all(entry["task"] in celery_worker.celery.tasks for entry in schedule.values())
@@ -0,0 +1,200 @@
+import pytest
+from httpx import AsyncClient
+from pydantic import TypeAdapter
+from sqlmodel import select
+
+from src.products.model import Product
+from src.tenancy import DEFAULT_ORGANIZATION
+from src.webhooks.model import WebhookURL
+
+
+@pytest.mark.asyncio
+async def test_list_endpoints_match_model_serialization(async_client: AsyncClient, test_session):
+    """Test that the row-tuple fast path returns the same objects as the model path"""
+    test_session.add_all([
+        Product(sku="A1", name="Widget", description="first"),
+        Product(sku="B2", name="Gadget éè ☃", description=None, status="inactive"),
+        WebhookURL(url="https://hooks.example.com/1"),
+    ])
+    await test_session.commit()
+
+    products = (await test_session.execute(select(Product).order_by(Product.id))).scalars().all()
+    webhooks = (await test_session.execute(select(WebhookURL))).scalars().all()
+
+    response = await async_client.get("/products/all", params={"limit": 10})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == TypeAdapter(list[Product]).dump_python(products, mode="json")
+    assert list(response.json()[0]) == ["id", "organization", "name", "sku", "description", "status", "updated_at", "change_seq", "version", "content_hash", "deleted_at"]  # field order
+
+    response = await async_client.get("/webhooks/all")
+    assert response.json() == TypeAdapter(list[WebhookURL]).dump_python(webhooks, mode="json")
+
+
+@pytest.fixture
+async def listing(test_session):
+    test_session.add_all([
+        Product(sku="AB-1", name="Widget", status="active"),
+        Product(sku="AB-2", name="Gadget", status="inactive"),
+        Product(sku="CD-1", name="Widget Pro", status="active"),
+        Product(sku="CD_2", name="Sprocket", status="active"),
+    ])
+    await test_session.commit()
+
+
+@pytest.mark.asyncio
+async def test_list_filters_sort_and_total(async_client: AsyncClient, listing):
+    """Test filters, whitelisted sorting and the X-Total-Count header"""
+    response = await async_client.get("/products/all", params={"status": "active", "sort": "-name"})
+    assert [p["sku"] for p in response.json()] == ["CD-1", "AB-1", "CD_2"]
+    assert response.headers["X-Total-Count"] == "3"
+
+    response = await async_client.get("/products/all", params={"sku_prefix": "ab", "name_contains": "get", "exact_count": True})
+    assert [p["sku"] for p in response.json()] == ["AB-1", "AB-2"]
+    assert response.headers["X-Total-Count"] == "2"
+    assert response.headers["X-Total-Count-Exact"] == "true"
+
+    response = await async_client.get("/products/all", params={"sku_prefix": "CD_"})  # _ is literal
+    assert [p["sku"] for p in response.json()] == ["CD_2"]
+
+    response = await async_client.get("/products/all", params={"sort": "status"})
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_status_facets_follow_writes(async_client: AsyncClient, listing, test_session):
+    """Test that trigger-maintained facet counts track inserts, updates and deletes"""
+    from src.products.service import compact_status_counts
+
+    assert (await async_client.get("/products/facets")).json() == {"status": {"active": 3, "inactive": 1}}
+
+    await async_client.put("/products/id/AB-1", json={"sku": "AB-1", "name": "Widget", "status": "inactive"})
+    await async_client.delete("/products/id/CD-1")
+    assert (await async_client.get("/products/facets")).json() == {"status": {"active": 1, "inactive": 2}}
+
+    await compact_status_counts(test_session)
+    assert (await async_client.get("/products/facets")).json() == {"status": {"active": 1, "inactive": 2}}
+    response = await async_client.get("/products/all", params={"status": "inactive"})
+    assert response.headers["X-Total-Count"] == "2"
+
+
+@pytest.mark.asyncio
+async def test_etags_and_conditional_requests(async_client: AsyncClient, listing):
+    """Test 304 on a matching If-None-Match and compare-and-swap updates with If-Match"""
+    response = await async_client.get("/products/id/AB-1")
+    etag = response.headers["ETag"]
+    assert not etag.startswith("W/")
+    response = await async_client.get("/products/id/AB-1", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    page = await async_client.get("/products/all")
+    page_etag = page.headers["ETag"]
+    assert page_etag.startswith("W/")
+    assert (await async_client.get("/products/all", headers={"If-None-Match": page_etag})).status_code == 304
+
+    update = {"sku": "AB-1", "name": "Widget v2"}
+    response = await async_client.put("/products/id/AB-1", json=update, headers={"If-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["version"] == 2
+    assert response.headers["ETag"] != etag
+
+    # the stale ETag loses, and every cached copy is now invalid
+    response = await async_client.put("/products/id/AB-1", json={"sku": "AB-1", "name": "Lost"}, headers={"If-Match": etag})
+    assert response.status_code == 412
+    assert (await async_client.get("/products/id/AB-1")).json()["name"] == "Widget v2"
+    assert (await async_client.get("/products/id/AB-1", headers={"If-None-Match": etag})).status_code == 200
+    assert (await async_client.get("/products/all", headers={"If-None-Match": page_etag})).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_if_match_loses_race_to_concurrent_writer(listing, test_session):
+    """Test that the version check runs in the UPDATE, not just against the earlier read"""
+    from fastapi import HTTPException
+    from sqlalchemy import update as sql_update
+    from src.products import service
+
+    product = await service.get_product_by_sku(test_session, DEFAULT_ORGANIZATION, "AB-1")
+    etag = service.product_etag(product)
+    real_execute = test_session.execute
+
+    async def execute_after_concurrent_write(statement, *args, **kwargs):
+        if getattr(statement, "is_update", False):  # another writer commits between our read and write
+            await real_execute(sql_update(Product).where(Product.id == product.id).values(name="Theirs"))
+        return await real_execute(statement, *args, **kwargs)
+
+    test_session.execute = execute_after_concurrent_write
+    with pytest.raises(HTTPException) as error:
+        await service.update_product_by_sku(test_session, DEFAULT_ORGANIZATION, "AB-1", Product(sku="AB-1", name="Ours"), if_match=etag)
+    assert error.value.status_code == 412
+
+
+def _statements(log) -> list[str]:
+    return [statement["sql"].split(None, 1)[0].upper() for statement in log.statements]
+
+
+@pytest.mark.asyncio
+async def test_writes_take_one_statement(profiled, listing):
+    """Test that each write is a single statement with RETURNING, plus its commit"""
+    # the trailing SELECT is SQLite re-reading trigger-stamped columns; Postgres
+    # returns them from the write itself
+    for method, url, kwargs, status, statements, commits in [
+        ("POST", "/products/new", {"json": {"sku": "EF-1", "name": "New"}}, 200, ["INSERT", "SELECT"], 1),
+        ("POST", "/products/new", {"json": {"sku": "ef-1", "name": "Upserted"}}, 200, ["INSERT", "SELECT"], 1),
+        ("PUT", "/products/id/AB-1", {"json": {"sku": "AB-1", "name": "Renamed"}}, 200, ["UPDATE", "SELECT"], 1),
+        ("PUT", "/products/id/AB-2", {"json": {"sku": "AB-2", "name": "x"}, "headers": {"If-Match": '"2.1"'}}, 200, ["UPDATE", "SELECT"], 1),
+        ("PUT", "/products/id/AB-2", {"json": {"sku": "AB-2", "name": "y"}, "headers": {"If-Match": '"2.1"'}}, 412, ["UPDATE", "SELECT"], 0),
+        ("PUT", "/products/id/NOPE", {"json": {"sku": "NOPE", "name": "x"}}, 404, ["UPDATE"], 0),
+        ("DELETE", "/products/id/CD-1", {}, 200, ["DELETE"], 1),
+        ("DELETE", "/products/id/CD-1", {}, 404, ["DELETE"], 0),
+        ("DELETE", "/products/all", {}, 200, ["DELETE"], 1),
+    ]:
+        response, log = await profiled(method, url, **kwargs)
+        assert response.status_code == status, (method, url)
+        assert (_statements(log), log.commits) == (statements, commits), (method, url, response.status_code)
+
+    response, _ = await profiled("POST", "/products/new", json={"sku": "GH-1", "name": "Fresh"})
+    product = response.json()
+    assert product["version"] == 1 and product["change_seq"] and product["updated_at"]
+    assert response.headers["ETag"] == f'"{product["id"]}.1"'
+
+
+@pytest.mark.asyncio
+async def test_soft_deleted_products_are_hidden_until_recreated(async_client: AsyncClient, test_session, monkeypatch):
+    """Test that reads skip soft-deleted products, the feed reports them deleted, and a create revives them"""
+    from datetime import datetime, timezone
+    import orjson
+    from src.products import constants
+
+    monkeypatch.setattr(constants, "CHANGES_SETTLE_SECONDS", 0)
+    test_session.add_all([
+        Product(sku="LIVE", name="Live widget"),
+        Product(sku="GONE", name="Gone widget", deleted_at=datetime.now(timezone.utc)),
+    ])
+    await test_session.commit()
+
+    assert (await async_client.get("/products/id/GONE")).status_code == 404
+    assert (await async_client.put("/products/id/GONE", json={"sku": "GONE", "name": "x"})).status_code == 404
+    assert [p["sku"] for p in (await async_client.get("/products/all")).json()] == ["LIVE"]
+    assert (await async_client.get("/products/facets")).json() == {"status": {"active": 1}}
+    items = (await async_client.get("/products/search", params={"q": "widget"})).json()["items"]
+    assert [item["sku"] for item in items] == ["LIVE"]
+    changes = [orjson.loads(line) for line in (await async_client.get("/products/changes")).content.splitlines()]
+    assert [(change["sku"], change["op"]) for change in changes] == [("LIVE", "upsert"), ("GONE", "delete")]
+
+    response = await async_client.post("/products/new", json={"sku": "GONE", "name": "Back again"})
+    assert response.json()["deleted_at"] is None
+    assert (await async_client.get("/products/id/GONE")).json()["name"] == "Back again"
+    assert (await async_client.get("/products/facets")).json() == {"status": {"active": 2}}
+
+
+def test_count_estimate_keeps_filters_bound():
+    """Test that the planner-estimate EXPLAIN sends filter values as parameters, not SQL text"""
+    from sqlalchemy.dialects import postgresql
+    from src.products.service import Explain, product_filters
+
+    statement = select(Product.id).where(*product_filters(DEFAULT_ORGANIZATION, None, "a'b", "x :evil"))
+    compiled = Explain(statement).compile(dialect=postgresql.dialect())
+    assert str(compiled).startswith("EXPLAIN (FORMAT JSON) SELECT")
+    assert "evil" not in str(compiled) and "a'b" not in str(compiled)
+    assert "%x :evil%" in compiled.params.values()
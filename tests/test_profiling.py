@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from src.middlewares.profiling import ProfileBuffer, ProfilingMiddleware, StackSampler, profile_buffer
+
+
+USER_DATA = {
+    "username": "profileduser",
+    "password": "password123",
+    "client_id": "test_client_id",
+    "client_secret": "test_client_secret",
+    "token_url": "https://test.token.url",
+    "tenant_url": "https://test.tenant.url",
+    "organization": "test_org"
+}
+
+
+def _app(seconds: float):
+    async def app(scope, receive, send):
+        await asyncio.sleep(seconds)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+    return app
+
+
+class RecordingSampler(StackSampler):
+    def __init__(self):
+        super().__init__(interval_ms=1)
+        self.started = []
+
+    def start(self, profile):
+        self.started.append(profile.path)
+        super().start(profile)
+
+
+async def _get(middleware: ProfilingMiddleware, path: str = "/", **kwargs):
+    async with AsyncClient(transport=ASGITransport(app=middleware), base_url="http://test") as client:
+        return await client.get(path, **kwargs)
+
+
+@pytest.fixture(autouse=True)
+def clear_profiles():
+    profile_buffer.clear()
+    yield
+    profile_buffer.clear()
+
+
+@pytest.mark.asyncio
+async def test_profile_header_forces_capture(async_client: AsyncClient):
+    """Test that X-Profile records the request with its SQL statements"""
+    response = await async_client.post("/auth/register", json=USER_DATA, headers={"X-Profile": "1"})
+    assert response.status_code == 200
+
+    profiles = profile_buffer.list()
+    assert len(profiles) == 1
+    profile = profiles[0]
+    assert profile.forced
+    assert profile.path == "/auth/register"
+    assert profile.status_code == 200
+    assert profile.queries.statement_count >= 2  # duplicate check + insert
+    assert profile.queries.commits == 1
+    assert any("INSERT INTO user" in s["sql"] for s in profile.queries.statements)
+
+
+@pytest.mark.asyncio
+async def test_unprofiled_request_not_captured():
+    """Test that ordinary fast requests are not kept"""
+    buffer = ProfileBuffer(10)
+    response = await _get(ProfilingMiddleware(_app(0), sample_rate=0, slow_ms=1000, buffer=buffer))
+    assert response.status_code == 200
+    assert buffer.list() == []
+
+
+@pytest.mark.asyncio
+async def test_stacks_are_sampled_only_for_sampled_or_slow_requests():
+    """Test that the stack sampler skips unsampled requests until they turn slow"""
+    buffer, sampler = ProfileBuffer(10), RecordingSampler()
+    middleware = ProfilingMiddleware(_app(0.2), sample_rate=0, slow_ms=50, buffer=buffer, sampler=sampler)
+    await _get(middleware, "/slow")
+    await _get(ProfilingMiddleware(_app(0), sample_rate=0, slow_ms=1000, buffer=buffer, sampler=sampler), "/fast")
+    await _get(ProfilingMiddleware(_app(0), sample_rate=0, slow_ms=1000, buffer=buffer, sampler=sampler), "/forced",
+               headers={"X-Profile": "1"})
+
+    assert sampler.started == ["/slow", "/forced"]
+    assert [profile.path for profile in buffer.list()] == ["/forced", "/slow"]
+    slow = buffer.list()[1]
+    assert slow.samples == sum(slow.stacks.values()) > 0
+
+
+@pytest.mark.asyncio
+async def test_admin_profiles_endpoint(async_client: AsyncClient, admin_headers):
+    """Test browsing captured profiles"""
+    await async_client.post("/auth/login", json={"username": "nobody", "password": "password123"},
+                            headers={"X-Profile": "1"})
+
+    assert (await async_client.get("/admin/profiles")).status_code == 403
+    response = await async_client.get("/admin/profiles", headers=admin_headers)
+    assert response.status_code == 200
+    summaries = response.json()
+    assert len(summaries) == 1
+    assert summaries[0]["path"] == "/auth/login"
+    assert summaries[0]["status_code"] == 401
+
+    detail = await async_client.get(f"/admin/profiles/{summaries[0]['id']}", headers=admin_headers)
+    assert detail.status_code == 200
+    assert detail.json()["queries"]["statement_count"] == 1
+
+    missing = await async_client.get("/admin/profiles/999999", headers=admin_headers)
+    assert missing.status_code == 404
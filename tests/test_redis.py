@@ -0,0 +1,104 @@
+import json
+import uuid
+
+import httpx
+import pytest
+
+from src.redis import MemoryBackend, RedisClient, UpstashBackend, run_sync
+from src.tasks import celery_worker
+from src.tasks.celery_worker import process_csv_task
+from src.tasks.semaphore import RedisSemaphore
+
+
+async def test_memory_backend_basic_commands(memory_redis):
+    """Test string, counter and sorted set commands on the in-memory backend"""
+    assert await memory_redis.ping()
+    assert await memory_redis.set("a", "1")
+    assert not await memory_redis.set("a", "2", nx=True)
+    assert await memory_redis.get("a") == "1"
+    assert await memory_redis.incr("hits", 5) == 5
+    assert await memory_redis.zadd("z", {"x": 1, "y": 3}) == 2
+    assert await memory_redis.zincrby("z", 5, "x") == 6.0
+    assert await memory_redis.zrevrange("z", 0, -1, withscores=True) == [("x", 6.0), ("y", 3.0)]
+    assert await memory_redis.delete("a", "missing") == 1
+    assert await memory_redis.get("a") is None
+
+
+async def test_pipeline_and_mget_cost_one_round_trip(memory_redis):
+    """Test that many-key operations are sent as a single batch"""
+    backend = memory_redis.backend
+    await memory_redis.mset({f"sku:{i}": str(i) for i in range(100)}, ex=60)
+    assert backend.round_trips == 1
+
+    values = await memory_redis.mget([f"sku:{i}" for i in range(100)] + ["sku:missing"])
+    assert backend.round_trips == 2
+    assert values[:3] == ["0", "1", "2"] and values[-1] is None
+
+    pipe = memory_redis.pipeline()
+    pipe.incr("counter").incr("counter").get("counter").zcard("none")
+    assert await pipe.execute() == [1, 2, "2", 0]
+    assert backend.round_trips == 3
+
+
+async def test_semaphore_limits_holders_and_expires_leases(memory_redis):
+    """Test the ingest semaphore against the in-memory backend"""
+    semaphore = RedisSemaphore(memory_redis, "test", limit=2, lease_seconds=60)
+    assert await semaphore.acquire("one") == "one"
+    assert await semaphore.acquire("two") == "two"
+    assert await semaphore.acquire("three") is None
+    assert await semaphore.acquire("one") == "one"  # holders re-acquire their own slot
+    assert await semaphore.holders() == 2
+
+    await semaphore.release("one")
+    assert await semaphore.acquire("three") == "three"
+
+    stale = RedisSemaphore(memory_redis, "stale", limit=1, lease_seconds=0)
+    assert await stale.acquire("crashed")
+    assert await stale.acquire("next") == "next"  # expired lease frees the slot
+
+
+def test_ingest_task_takes_and_releases_semaphore(tmp_path, ingest_engine, memory_redis, monkeypatch):
+    """Test that the Celery task drives the async semaphore from sync code"""
+    monkeypatch.setattr(celery_worker, "INGEST_MAX_CONCURRENT", 1)
+    monkeypatch.setattr(celery_worker, "_ingest_semaphore", None)
+    path = tmp_path / "products.csv"
+    path.write_text("sku,name,description\na1,Widget,x\n", encoding="utf-8")
+
+    result = process_csv_task.apply(args=(str(path),), task_id=str(uuid.uuid4())).get()
+
+    assert result["total_inserted"] == 1
+    assert run_sync(celery_worker.get_ingest_semaphore().holders()) == 0
+
+
+async def test_upstash_pipeline_is_one_http_request():
+    """Test that an Upstash pipeline goes to /pipeline as a single request"""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        commands = json.loads(request.content)
+        return httpx.Response(200, json=[{"result": "OK"}, {"result": ["1", None]}][:len(commands)])
+
+    backend = UpstashBackend("https://example.upstash.io", "token")
+    backend.http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    client = RedisClient(backend)
+
+    pipe = client.pipeline()
+    pipe.set("a", 1, ex=10).mget(["a", "b"])
+    assert await pipe.execute() == [True, ["1", None]]
+    assert len(requests) == 1
+    assert requests[0].url.path == "/pipeline"
+    assert json.loads(requests[0].content)[0] == ["SET", "a", "1", "EX", "10"]
+    await client.close()
+
+
+def test_missing_redis_configuration_raises(monkeypatch):
+    """Test that the in-memory backend is never picked silently"""
+    from src import redis as redis_module
+
+    monkeypatch.setattr(redis_module, "REDIS_BACKEND", None)
+    monkeypatch.setattr(redis_module, "REDIS_URL", None)
+    monkeypatch.setattr(redis_module, "UPSTASH_REDIS_REST_URL", None)
+    with pytest.raises(ValueError, match="No Redis configured"):
+        redis_module.create_backend()
+    assert isinstance(redis_module.create_backend("memory"), MemoryBackend)
@@ -0,0 +1,73 @@
+import pytest
+from httpx import AsyncClient
+
+from src.products.model import Product
+
+
+@pytest.fixture
+async def catalog(test_session):
+    test_session.add_all([
+        Product(sku="WID-001", name="Blue Widget", description="A small blue widget"),
+        Product(sku="WID-002", name="Red Widget", description="Widget, red"),
+        Product(sku="GAD-100", name="Gadget", description="Pairs with any widget"),
+        Product(sku="BOLT-7", name="Hex Bolt", description="Steel"),
+    ])
+    await test_session.commit()
+
+
+@pytest.mark.asyncio
+async def test_search_ranks_name_matches_first(async_client: AsyncClient, catalog):
+    """Test that name hits outrank description-only hits"""
+    response = await async_client.get("/products/search", params={"q": "widget"})
+    assert response.status_code == 200
+    items = response.json()["items"]
+    assert {item["sku"] for item in items} == {"WID-001", "WID-002", "GAD-100"}
+    assert items[-1]["sku"] == "GAD-100"
+    assert items == sorted(items, key=lambda item: -item["rank"])
+
+
+@pytest.mark.asyncio
+async def test_search_matches_sku_fragments_and_updates(async_client: AsyncClient, catalog, test_session):
+    """Test substring SKU matches and that edits are reflected in the index"""
+    response = await async_client.get("/products/search", params={"q": "bolt"})
+    assert [item["sku"] for item in response.json()["items"]] == ["BOLT-7"]
+
+    await async_client.put("/products/id/BOLT-7", json={"sku": "BOLT-7", "name": "Carriage Screw", "description": "Steel"})
+    response = await async_client.get("/products/search", params={"q": "carriage"})
+    assert [item["sku"] for item in response.json()["items"]] == ["BOLT-7"]
+    response = await async_client.get("/products/search", params={"q": "hex"})
+    assert response.json()["items"] == []
+
+
+@pytest.mark.asyncio
+async def test_search_keyset_pagination(async_client: AsyncClient, catalog):
+    """Test that following next_cursor walks every match exactly once"""
+    seen, cursor = [], None
+    while True:
+        params = {"q": "widget", "limit": 1}
+        if cursor:
+            params["cursor"] = cursor
+        page = (await async_client.get("/products/search", params=params)).json()
+        seen += [item["id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert len(seen) == len(set(seen)) == 3
+
+    response = await async_client.get("/products/search", params={"q": "widget", "cursor": "garbage"})
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_short_search_treats_wildcards_literally(async_client: AsyncClient, catalog, test_session):
+    """Test that % and _ in a short query match themselves, not any characters"""
+    test_session.add(Product(sku="A_1", name="Underscored"))
+    await test_session.commit()
+
+    async def skus(q: str) -> list[str]:
+        return [item["sku"] for item in (await async_client.get("/products/search", params={"q": q})).json()["items"]]
+
+    assert await skus("%") == []
+    assert await skus("W_") == []
+    assert await skus("A_") == ["A_1"]
+    assert await skus("wi") == ["WID-001", "WID-002"]
@@ -0,0 +1,94 @@
+import uuid
+import orjson
+import pytest
+from httpx import AsyncClient
+from sqlmodel import Session, select
+
+from src.products import constants
+from src.products.model import Product
+from src.tasks.celery_worker import process_csv_task
+from src.tenancy import partition_name
+
+ACME = {"X-Organization": "acme"}
+
+
+@pytest.mark.asyncio
+async def test_catalogs_are_isolated_per_organization(async_client: AsyncClient, monkeypatch):
+    """Test that the same SKU lives independently in two tenants and every read is scoped"""
+    monkeypatch.setattr(constants, "CHANGES_SETTLE_SECONDS", 0)
+    await async_client.post("/products/new", json={"sku": "W-1", "name": "Default Widget"})
+    response = await async_client.post("/products/new", json={"sku": "W-1", "name": "Acme Widget", "status": "inactive"}, headers=ACME)
+    assert response.status_code == 200
+    assert response.json()["organization"] == "acme"
+
+    assert (await async_client.get("/products/id/W-1")).json()["name"] == "Default Widget"
+    assert (await async_client.get("/products/id/W-1", headers=ACME)).json()["name"] == "Acme Widget"
+    await async_client.put("/products/id/W-1", json={"sku": "W-1", "name": "Acme Gizmo"}, headers=ACME)
+    assert (await async_client.get("/products/id/W-1")).json()["name"] == "Default Widget"
+
+    response = await async_client.get("/products/all", headers=ACME)
+    assert response.headers["X-Total-Count"] == "1"
+    assert (await async_client.get("/products/facets")).json() == {"status": {"active": 1}}
+    assert (await async_client.get("/products/facets", headers=ACME)).json() == {"status": {"active": 1}}
+    items = (await async_client.get("/products/search", params={"q": "gizmo"})).json()["items"]
+    assert items == []
+    items = (await async_client.get("/products/search", params={"q": "gizmo"}, headers=ACME)).json()["items"]
+    assert [item["sku"] for item in items] == ["W-1"]
+
+    await async_client.delete("/products/id/W-1", headers=ACME)
+    assert (await async_client.get("/products/id/W-1", headers=ACME)).status_code == 404
+    assert (await async_client.get("/products/id/W-1")).status_code == 200
+    for headers, expected in (({}, [("upsert", "Default Widget")]), (ACME, [("delete", None)])):
+        response = await async_client.get("/products/changes", headers=headers)
+        changes = [orjson.loads(line) for line in response.content.splitlines()]
+        assert [(change["op"], change["name"]) for change in changes] == expected
+
+    assert (await async_client.get("/products/all", headers={"X-Organization": "../etc"})).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_admin_drops_one_tenants_catalog(async_client: AsyncClient, admin_headers):
+    """Test that dropping a tenant's catalog leaves other tenants untouched"""
+    await async_client.post("/products/new", json={"sku": "A1", "name": "Kept"})
+    await async_client.post("/products/new", json={"sku": "A1", "name": "Dropped"}, headers=ACME)
+
+    response = await async_client.delete("/admin/tenants/acme/products", headers=admin_headers)
+    assert response.status_code == 204
+
+    assert (await async_client.get("/products/id/A1", headers=ACME)).status_code == 404
+    assert (await async_client.get("/products/facets", headers=ACME)).json() == {"status": {}}
+    assert (await async_client.get("/products/id/A1")).json()["name"] == "Kept"
+    assert (await async_client.delete("/admin/tenants/a b/products", headers=admin_headers)).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_tenant_drop_requires_the_admin_token(async_client: AsyncClient, monkeypatch):
+    """Test that the irreversible catalog drop is refused without a configured and matching token"""
+    from src.admin import router as admin_router
+
+    await async_client.post("/products/new", json={"sku": "A1", "name": "Kept"}, headers=ACME)
+    monkeypatch.setattr(admin_router, "ADMIN_TOKEN", None)
+    assert (await async_client.delete("/admin/tenants/acme/products")).status_code == 404
+    monkeypatch.setattr(admin_router, "ADMIN_TOKEN", "secret")
+    assert (await async_client.delete("/admin/tenants/acme/products")).status_code == 403
+    assert (await async_client.delete("/admin/tenants/acme/products", headers={"X-Admin-Token": "wrong"})).status_code == 403
+    assert (await async_client.get("/products/id/A1", headers=ACME)).json()["name"] == "Kept"
+
+
+def test_ingest_writes_into_the_uploading_tenant(tmp_path, ingest_engine):
+    """Test that a CSV ingest lands in the organization it was queued for"""
+    upload = tmp_path / "products.csv"
+    upload.write_text("sku,name,description\na1,Widget,x\n", encoding="utf-8")
+
+    result = process_csv_task.apply(args=(str(upload),), kwargs={"organization": "acme"}, task_id=str(uuid.uuid4())).get()
+
+    assert result["organization"] == "acme"
+    with Session(ingest_engine) as session:
+        assert session.exec(select(Product.organization, Product.sku)).all() == [("acme", "A1")]
+
+
+def test_partition_names_are_safe_and_distinct():
+    """Test that partition names are plain identifiers and case-distinct organizations differ"""
+    assert partition_name("default").startswith("product_p_default_")
+    assert partition_name("Acme") != partition_name("acme")
+    assert len(partition_name("x" * 63)) <= 63
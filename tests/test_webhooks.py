@@ -0,0 +1,25 @@
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_webhook_writes_take_one_statement(profiled):
+    """Test webhook create, update and delete as single RETURNING statements, 404s included"""
+    url = "https://hooks.example.com/a"
+
+    response, log = await profiled("POST", "/webhooks/new", json={"url": url})
+    assert response.status_code == 200
+    assert response.json()["status"] == "active"
+    assert (log.statement_count, log.commits) == (1, 1)
+
+    response, log = await profiled("PUT", f"/webhooks/id/{url}/inactive")
+    assert response.json() == {"id": 1, "url": url, "status": "inactive"}
+    assert (log.statement_count, log.commits) == (1, 1)
+
+    response, log = await profiled("DELETE", f"/webhooks/url/{url}")
+    assert response.status_code == 200
+    assert (log.statement_count, log.commits) == (1, 1)
+
+    for method in ("PUT", "DELETE"):
+        response, log = await profiled(method, f"/webhooks/id/{url}/active" if method == "PUT" else f"/webhooks/url/{url}")
+        assert response.status_code == 404
+        assert (log.statement_count, log.commits) == (1, 0)